@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""本地模拟源站：提供普通/大页面/慢页面/CF过渡页，全部运行在localhost，无需外网
+
+路由：
+  /normal/{n}              普通小页面
+  /large/{n}?kb=2048       大页面（约kb千字节）
+  /slow/{n}?delay=2        延迟delay秒后响应
+  /challenge/{n}?clear=3   首次访问返回带5秒盾特征的过渡页，clear秒后写入Cookie并刷新放行
+  /blocked/{n}             带IP封禁特征的拦截页
+"""
+import asyncio
+import threading
+from typing import Optional
+from aiohttp import web
+
+_FILLER = "<p>" + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 8 + "</p>\n"
+
+def _page(title: str, body: str) -> str:
+    return f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>{title}</title></head><body>{body}</body></html>"
+
+async def normal(request: web.Request) -> web.Response:
+    n = request.match_info["n"]
+    return web.Response(text=_page(f"Normal {n}", f"<h1>page {n}</h1>" + _FILLER * 4), content_type="text/html")
+
+async def large(request: web.Request) -> web.Response:
+    n = request.match_info["n"]
+    kb = int(request.query.get("kb", 2048))
+    body = f"<h1>large {n}</h1>" + _FILLER * max(1, kb * 1024 // len(_FILLER))
+    return web.Response(text=_page(f"Large {n}", body), content_type="text/html")
+
+async def slow(request: web.Request) -> web.Response:
+    n = request.match_info["n"]
+    await asyncio.sleep(float(request.query.get("delay", 2)))
+    return web.Response(text=_page(f"Slow {n}", f"<h1>slow {n}</h1>" + _FILLER * 4), content_type="text/html")
+
+async def challenge(request: web.Request) -> web.Response:
+    """模拟CF过渡页：页面特征与CFHandler检测规则一致，延迟后写Cookie并刷新"""
+    n = request.match_info["n"]
+    cookie = f"bench_clear_{n}"
+    if request.cookies.get(cookie):
+        return web.Response(text=_page(f"Cleared {n}", f"<h1>cleared {n}</h1>" + _FILLER * 4), content_type="text/html")
+    clear = float(request.query.get("clear", 3))
+    body = (
+        "<div id='challenge-running'>Checking your browser before accessing the site.</div>"
+        "<div class='cf-browser-verification'></div>"
+        f"<script>setTimeout(function(){{document.cookie='{cookie}=1; path=/';location.reload();}}, {int(clear * 1000)});</script>"
+    )
+    return web.Response(text=_page("Just a moment...", body), status=503, content_type="text/html")
+
+async def blocked(request: web.Request) -> web.Response:
+    body = "<div id='cf-error-details'><h1>Access denied</h1><p>Your IP has been banned.</p></div>"
+    return web.Response(text=_page("Access denied", body), status=403, content_type="text/html")
+
+def build_app() -> web.Application:
+    app = web.Application()
+    app.router.add_get("/normal/{n}", normal)
+    app.router.add_get("/large/{n}", large)
+    app.router.add_get("/slow/{n}", slow)
+    app.router.add_get("/challenge/{n}", challenge)
+    app.router.add_get("/blocked/{n}", blocked)
+    return app
+
+class MockOrigin:
+    """在独立线程/事件循环中运行模拟源站，避免与被测爬虫争用事件循环"""
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._runner = web.AppRunner(build_app(), access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, self.host, self.port)
+        self._loop.run_until_complete(site.start())
+        # port=0时由系统分配端口
+        self.port = self._runner.addresses[0][1]
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+        self._loop.close()
+
+    def start(self) -> "MockOrigin":
+        self._thread = threading.Thread(target=self._serve, name="mock-origin", daemon=True)
+        self._thread.start()
+        self._ready.wait(10)
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join(10)
+
+if __name__ == "__main__":
+    web.run_app(build_app(), host="127.0.0.1", port=8765)
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""离线基准测试：对本地模拟源站按不同并发度运行爬虫，输出JSON报告并可与基线对比
+
+用法（在仓库根目录执行）：
+  python -m bench.run_bench --levels 1,4,8 --pages 40 --out bench_report.json
+  python -m bench.run_bench --baseline bench_report.json --out bench_new.json
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+from typing import List, Optional
+
+import config
+
+# 基准测试固定环境：无头、无代理、不落盘，保证结果可复现且不访问外网
+config.HEADLESS = True
+config.PROXY_ENABLE = False
+config.COOKIE_PERSIST = False
+config.RESULT_SINKS = []
+# 只测爬取链路本身，不做按host限速（模拟源站只有一个host）
+config.HOST_SCHEDULE = False
+# 封禁页只测识别与失败路径：不做长退避重试，也不因连续封禁熔断整个模拟源站
+config.RETRY_POLICY = {**config.RETRY_POLICY, "blocked": (1, 0.0, 0.0)}
+config.BREAKER_THRESHOLD = 0
+
+from bench.mock_origin import MockOrigin  # noqa: E402
+
+# 页面组合：普通/大页面/慢页面/过渡页/封禁页，按比例循环生成URL
+_MIX = [
+    ("normal", ""),
+    ("normal", ""),
+    ("normal", ""),
+    ("large", "?kb=2048"),
+    ("slow", "?delay=1.5"),
+    ("challenge", "?clear=2"),
+    ("blocked", ""),
+]
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+def _rss_mb() -> float:
+    """当前进程及其子进程（浏览器）的RSS总和；未安装psutil时仅统计本进程"""
+    if psutil is not None:
+        proc = psutil.Process()
+        total = proc.memory_info().rss
+        for child in proc.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / (1024 * 1024)
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * pct
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return round(values[lo] + (values[hi] - values[lo]) * (k - lo), 3)
+
+def build_urls(base_url: str, pages: int, run_id: int) -> List[str]:
+    # run_id区分不同并发档位，避免上一轮的过渡页Cookie影响本轮
+    return [f"{base_url}/{kind}/{run_id}-{i}{query}" for i, (kind, query) in
+            ((i, _MIX[i % len(_MIX)]) for i in range(pages))]
+
+async def run_level(base_url: str, concurrency: int, pages: int, run_id: int) -> dict:
+    from main import run_batch
+    from core.browser import BrowserCore
+    from core.proxy import ProxyPool
+    from core.cookie import CookieManager
+    from core.cf_handler import CFHandler
+    from core.sink import SinkWriter
+    from core.frontier import MemoryFrontier
+
+    browser_core = BrowserCore(ProxyPool(), concurrency=concurrency)
+    t = time.monotonic()
+    if not await browser_core.init():
+        raise RuntimeError("浏览器初始化失败")
+    startup = time.monotonic() - t
+    writer = SinkWriter([])
+    writer.start()
+
+    peak = _rss_mb()
+    stop = asyncio.Event()
+
+    async def sample_memory():
+        nonlocal peak
+        while not stop.is_set():
+            peak = max(peak, _rss_mb())
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=0.5)
+            except asyncio.TimeoutError:
+                pass
+
+    sampler = asyncio.create_task(sample_memory())
+    urls = build_urls(base_url, pages, run_id)
+    t = time.monotonic()
+    try:
+        results = await run_batch(browser_core, CookieManager(), CFHandler(), MemoryFrontier(urls), writer, concurrency)
+    finally:
+        wall = time.monotonic() - t
+        stop.set()
+        await sampler
+        await writer.close()
+        await browser_core.close()
+
+    ok = [r for r in results if r["ok"]]
+    ttc = [r["elapsed"] for r in ok]
+    by_kind = {}
+    for r in results:
+        kind = r["url"].split("/")[3]
+        by_kind.setdefault(kind, []).append(r["elapsed"])
+    return {
+        "concurrency": concurrency,
+        "pages": len(results),
+        "ok": len(ok),
+        "failed": len(results) - len(ok),
+        "startup_s": round(startup, 3),
+        "wall_s": round(wall, 3),
+        "pages_per_sec": round(len(ok) / wall, 3) if wall else None,
+        "ttc_p50_s": _percentile(ttc, 0.5),
+        "ttc_p95_s": _percentile(ttc, 0.95),
+        "ttc_by_kind_p50_s": {k: _percentile(v, 0.5) for k, v in by_kind.items()},
+        "peak_rss_mb": round(peak, 1),
+        # 进程级峰值RSS（含浏览器子进程）按并发数均摊的近似值，不是单个页面的实测内存
+        "approx_rss_per_worker_mb": round(peak / concurrency, 1),
+    }
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """与基线逐并发档位对比，返回超出容差的退化项"""
+    regressions = []
+    base_levels = {lv["concurrency"]: lv for lv in baseline.get("levels", [])}
+    print(f"\n{'并发':>4} {'指标':<16} {'基线':>10} {'本次':>10} {'变化':>8}")
+    for lv in report["levels"]:
+        base = base_levels.get(lv["concurrency"])
+        if not base:
+            continue
+        # 指标方向：pages_per_sec越大越好，其余越小越好
+        for key, higher_better in (("pages_per_sec", True), ("ttc_p50_s", False),
+                                   ("ttc_p95_s", False), ("peak_rss_mb", False)):
+            old, new = base.get(key), lv.get(key)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            print(f"{lv['concurrency']:>4} {key:<16} {old:>10} {new:>10} {change:>+7.1%}")
+            worse = -change if higher_better else change
+            if worse > tolerance:
+                regressions.append(f"并发{lv['concurrency']} {key}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+async def main():
+    parser = argparse.ArgumentParser(description="CF Bypass Crawler Pro 离线基准测试")
+    parser.add_argument("--levels", default="1,4,8", help="并发档位，逗号分隔（默认1,4,8）")
+    parser.add_argument("--pages", type=int, default=40, help="每个档位爬取的页面数（默认40）")
+    parser.add_argument("--out", default="bench_report.json", help="报告输出路径")
+    parser.add_argument("--baseline", help="基线报告路径，提供时输出对比结果")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="允许的退化比例（默认0.10）")
+    parser.add_argument("--no-human", action="store_true", help="关闭行为仿真延迟，只测爬取链路本身")
+    args = parser.parse_args()
+
+    if args.no_human:
+        config.HUMAN_EMULATE = False
+    levels = [int(x) for x in args.levels.split(",") if x.strip()]
+
+    origin = MockOrigin().start()
+    print(f"模拟源站已启动：{origin.base_url}")
+    try:
+        report = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "env": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "human_emulate": not args.no_human,
+                "fetch_profile": config.FETCH_PROFILE,
+                "pages_per_level": args.pages,
+            },
+            "levels": [],
+        }
+        for run_id, concurrency in enumerate(levels, 1):
+            print(f"并发 {concurrency}：爬取 {args.pages} 个页面...")
+            level = await run_level(origin.base_url, concurrency, args.pages, run_id)
+            report["levels"].append(level)
+            print(f"  -> {level['pages_per_sec']} 页/秒，p50 {level['ttc_p50_s']}s，p95 {level['ttc_p95_s']}s，"
+                  f"峰值内存 {level['peak_rss_mb']}MB，失败 {level['failed']}")
+    finally:
+        origin.stop()
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n报告已保存到 {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ 性能退化超出容差：")
+            for item in regressions:
+                print(f"  - {item}")
+            sys.exit(1)
+        print("\n✅ 未发现超出容差的性能退化")
+
+if __name__ == "__main__":
+    asyncio.run(main())
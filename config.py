@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 import os
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple
 
 # ==================== 基础配置 ====================
 # 目标URL
@@ -9,20 +9,54 @@ TARGET_URL: str = ""
 SAVE_PATH: str = "cf_bypassed.html"
 # Windows编码修复
 WIN_ENCODING_FIX: bool = True
+# 日志级别
+LOG_LEVEL: str = "INFO"
 
 # ==================== Cloudflare 核心配置 ====================
 # CF验证最大等待时间（秒）
 CF_MAX_WAIT: int = 45
-# CF状态检测间隔（秒）
-CF_CHECK_INTERVAL: float = 0.8
+# CF状态兜底检测间隔（秒）：导航/响应事件会立即触发检测，此间隔仅用于无事件时兜底
+CF_CHECK_INTERVAL: float = 2.0
 # 总重试次数
 MAX_RETRY: int = 4
+# CF检测只读取标题与文档前N个字符（过渡页/封禁页体积都很小）
+CF_DETECT_SLICE: int = 65536
 # 页面加载完成等待（秒）
 PAGE_LOAD_WAIT: int = 3
 
+# ==================== 人工验证配置 ====================
+# Turnstile待验证页面列表的本地网页端口（http://127.0.0.1:<端口>/，0表示不启动，只在日志中列出）
+VERIFY_PORT: int = 8791
+# 挂起页面等待人工验证的超时（秒），超时后释放页面与并发名额；
+# 挂起时间计入单URL总耗时：超过 BATCH_URL_TIMEOUT - CF_MAX_WAIT 时启动时自动下调，
+# 挂起时还会按该URL剩余时间缩短（导航/行为仿真已耗用的部分），剩余时间内未完成则记为失败，不再重试
+VERIFY_TIMEOUT: float = 120.0
+# 最多同时挂起的页面数，已满时新的验证页直接记为失败（不重试），其余worker继续爬取
+VERIFY_MAX_PARKED: int = 4
+# 有挂起页面时，日志中列出待验证页面的间隔（秒）
+VERIFY_LIST_INTERVAL: float = 30.0
+
+# ==================== 重试与熔断配置 ====================
+# 按错误类型的重试策略：(最多尝试次数, 退避基数秒, 退避上限秒)，退避按指数增长并加全抖动；总次数仍受MAX_RETRY限制
+RETRY_POLICY: Dict[str, Tuple[int, float, float]] = {
+    "navigation_timeout": (3, 2.0, 30.0),   # 导航超时
+    "browser_crash": (3, 1.0, 10.0),        # 页面/浏览器崩溃（换一个页面重试）
+    "blocked": (2, 30.0, 120.0),            # IP封禁/未知CF状态（长退避后重试，不更换代理）
+    "challenge_timeout": (2, 5.0, 60.0),    # 5秒盾/Turnstile超时未放行
+    "circuit_open": (1, 0.0, 0.0),          # host熔断中，不重试
+    "verify_aborted": (1, 0.0, 0.0),        # 人工验证被跳过/挂起数已满/URL剩余时间耗尽，不重试
+    "other": (MAX_RETRY, 1.0, 10.0),        # 其他错误
+}
+# 同一host连续失败多少次后熔断（0表示不熔断）
+BREAKER_THRESHOLD: int = 5
+# 熔断冷却时间（秒），之后放行一个探测请求
+BREAKER_COOLDOWN: float = 300.0
+
 # ==================== 浏览器防检测配置 ====================
 # 无头模式（高防护建议False）
 HEADLESS: bool = False
+# 记录上次启动成功的浏览器通道（chrome/msedge），重启时优先尝试
+BROWSER_CHANNEL_CACHE: str = ".browser_channel"
 # 视口
 VIEWPORT: dict = {"width": 1920, "height": 1080}
 # 随机UA池（Windows主流，无重复特征）
@@ -33,6 +67,47 @@ UA_POOL: List[str] = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36 OPR/115.0.0.0"
 ]
 
+# ==================== 上下文/页面池配置 ====================
+# 预热的浏览器上下文数量
+CONTEXT_POOL_SIZE: int = 2
+# 每个上下文预热的页面数（页面总数小于 -c 指定的并发数时自动按并发数补足）
+PAGES_PER_CONTEXT: int = 2
+# 单个上下文累计服务页面数上限，超过后回收重建（0表示不限制）
+CONTEXT_MAX_PAGES: int = 200
+# 单个页面渲染进程JS堆上限（MB），超过后回收其所属上下文（0表示不检测）
+CONTEXT_MAX_MEMORY_MB: int = 512
+
+# ==================== 资源拦截配置 ====================
+# 当前使用的拦截档位（对应 FETCH_PROFILES 的键）
+FETCH_PROFILE: str = "no-media"
+# 常见统计/广告追踪域名
+TRACKER_DOMAINS: List[str] = [
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "facebook.net", "connect.facebook.net", "hotjar.com", "scorecardresearch.com",
+    "hm.baidu.com", "cnzz.com", "clarity.ms"
+]
+# 拦截档位：allow/deny 分别按资源类型与域名配置
+# 判定优先级：allow_domains > deny_domains > allow_types（非空时为白名单）> deny_types
+# CF挑战资源（/cdn-cgi/ 路径、challenges.cloudflare.com）始终放行
+FETCH_PROFILES: dict = {
+    # 仅保留文档与脚本/接口请求（CF验证依赖脚本，不可拦截）
+    "html-only": {
+        "allow_types": ["document", "script", "xhr", "fetch", "other"],
+        "deny_types": [],
+        "allow_domains": ["challenges.cloudflare.com"],
+        "deny_domains": TRACKER_DOMAINS,
+    },
+    # 拦截图片/媒体/字体与追踪脚本
+    "no-media": {
+        "allow_types": [],
+        "deny_types": ["image", "media", "font"],
+        "allow_domains": ["challenges.cloudflare.com"],
+        "deny_domains": TRACKER_DOMAINS,
+    },
+    # 不拦截任何资源
+    "full": {},
+}
+
 # ==================== 代理池配置 ====================
 # 启用代理
 PROXY_ENABLE: bool = True
@@ -44,12 +119,20 @@ PROXY_CHECK_TIMEOUT: int = 4
 PROXY_MAX_FAIL: int = 2
 # 代理检测目标（用于快速验证连通性）
 PROXY_TEST_URL: str = "http://httpbin.org/ip"
+# 代理并发检测上限（共享同一个连接器）
+PROXY_CHECK_CONCURRENCY: int = 50
+# 后台定期复检间隔（秒）
+PROXY_RECHECK_INTERVAL: int = 300
+# 延迟/成功率滑动平均系数（越大越看重最近一次检测）
+PROXY_SCORE_ALPHA: float = 0.3
 
 # ==================== Cookie配置 ====================
 # 启用Cookie持久化
 COOKIE_PERSIST: bool = True
-# Cookie存储目录
+# Cookie存储目录（会话统一保存在其中的 cookies.db）
 COOKIE_DIR: str = "cookies"
+# Cookie后台批量落盘间隔（秒）
+COOKIE_FLUSH_INTERVAL: float = 5.0
 # 仅保留CF关键Cookie
 CF_COOKIE_KEYS: List[str] = ["cf_clearance", "__cf_bm", "cf_use_obf", "cf_session"]
 
@@ -62,3 +145,162 @@ MAX_DELAY: float = 3.5
 # 模拟鼠标/滚动概率
 MOUSE_MOVE_PROB: float = 0.9
 PAGE_SCROLL_PROB: float = 0.85
+
+# ==================== 批量爬取配置 ====================
+# 并发worker数（所有worker共享同一个BrowserCore）
+CONCURRENCY: int = 4
+# 单个URL总耗时上限（秒，含全部重试），超时即判定失败，避免拖慢整批任务
+BATCH_URL_TIMEOUT: int = 180
+# 批量模式结果报告路径
+BATCH_REPORT_PATH: str = "batch_report.json"
+
+# ==================== 任务队列配置 ====================
+# 持久化任务队列（SQLite），批量模式中断后可从此恢复
+FRONTIER_PATH: str = "results/frontier.db"
+# 每次事务领取的URL数
+FRONTIER_CLAIM_SIZE: int = 16
+# 结果/新增URL累计多少条批量写回一次
+FRONTIER_FLUSH_SIZE: int = 64
+# 最长写回间隔（秒），中断时最多重爬这段时间内完成的URL
+FRONTIER_FLUSH_INTERVAL: float = 5.0
+# 单个URL最多跨轮次尝试几次（每次内部仍有MAX_RETRY次重试），超过标记为failed
+FRONTIER_MAX_ATTEMPTS: int = 2
+
+# ==================== 递归爬取配置 ====================
+# 最大递归深度（0表示不递归，只爬取给定URL）
+CRAWL_MAX_DEPTH: int = 0
+# 同站规则：host（完全相同的host）/ domain（含子域名，忽略www.）/ any（不限制）
+CRAWL_SAME_SITE: str = "domain"
+# 单页最多提取链接数
+CRAWL_MAX_LINKS_PER_PAGE: int = 500
+# 已发现URL去重（布隆过滤器）的预估容量与误判率
+SEEN_CAPACITY: int = 10_000_000
+SEEN_ERROR_RATE: float = 1e-4
+
+# ==================== 主机调度配置 ====================
+# 批量模式按host限速派发（关闭后worker直接按任务队列顺序爬取）
+HOST_SCHEDULE: bool = True
+# 每个host的令牌速率（次/秒，0表示不限速）与桶容量
+HOST_RATE: float = 1.0
+HOST_BURST: int = 2
+# 每个host的在途请求上限：初始值与自适应调整范围
+HOST_START_IN_FLIGHT: int = 2
+HOST_MIN_IN_FLIGHT: int = 1
+HOST_MAX_IN_FLIGHT: int = 4
+# 单URL耗时EWMA超过该值（秒）时下调并发（0表示不按延迟调整）
+HOST_LATENCY_TARGET: float = 20.0
+# 遇到429/503后该host暂停派发的时间（秒）
+HOST_BACKOFF: float = 30.0
+# 等待派发的URL最多停放多少个（超过后暂停从任务队列领取）
+HOST_MAX_PARKED: int = 1000
+# 读取robots.txt中的Crawl-delay / Request-rate 并据此限速
+ROBOTS_ENABLE: bool = False
+ROBOTS_TIMEOUT: float = 10.0
+
+# ==================== 增量爬取配置 ====================
+# 默认启用增量爬取（也可用 --incremental 开启）
+REVISIT_ENABLE: bool = False
+# 按URL保存 ETag / Last-Modified / 源码哈希
+REVISIT_PATH: str = "results/revisit.db"
+# 校验信息累计多少条批量写回一次
+REVISIT_FLUSH_SIZE: int = 64
+
+# ==================== 多进程配置 ====================
+# worker进程数（0表示按CPU核数），每个进程独立运行一个浏览器
+WORKER_PROCESSES: int = 0
+# 各分片的输出/指标/任务队列目录，结束时合并到正常输出路径（Cookie库与增量校验信息也按分片保存在其中）
+SHARD_DIR: str = "results/shards"
+
+# ==================== 结果输出配置 ====================
+# 启用的结果输出（可多选）：jsonl / archive / sqlite
+RESULT_SINKS: List[str] = ["jsonl"]
+# JSONL记录路径（url/状态/耗时/源码，追加写入）
+RESULT_JSONL_PATH: str = "results/crawl_results.jsonl"
+# 压缩归档路径（安装zstandard时自动改用.zst，否则gzip）
+RESULT_ARCHIVE_PATH: str = "results/crawl_results.jsonl.gz"
+# SQLite数据库路径（源码按内容哈希去重存储）
+RESULT_SQLITE_PATH: str = "results/crawl_results.db"
+# 写入队列上限（写盘跟不上时爬取协程等待，限制内存占用）
+RESULT_QUEUE_SIZE: int = 64
+# 单批写盘最大记录数
+RESULT_BATCH_SIZE: int = 32
+# 单页源码最大字符数，超过部分截断（0表示不限制）
+CONTENT_MAX_CHARS: int = 20_000_000
+# 源码分块提取大小（字符）
+CONTENT_CHUNK_CHARS: int = 262_144
+# 单页源码在内存中缓冲的上限（字节），超过后转存临时文件
+CONTENT_SPOOL_MEMORY: int = 1_048_576
+
+# ==================== 结构化提取配置 ====================
+# 提取规则（为空表示不提取，只输出源码），需要安装lxml（CSS规则另需cssselect），例如：
+# {"title": {"xpath": "//title/text()"},
+#  "links": {"css": "a[href]", "attr": "href", "all": True, "absolute": True}}
+EXTRACT_RULES: Dict[str, dict] = {}
+# 提取进程数
+EXTRACT_WORKERS: int = 2
+# 最多同时在提取中的页面数，超过后爬取侧等待（背压）
+EXTRACT_MAX_PENDING: int = 8
+
+# ==================== 接口捕获配置 ====================
+# 需要捕获的响应URL正则（为空表示不启用接口捕获，也可用 --capture 指定）
+CAPTURE_PATTERNS: List[str] = []
+# 捕获的Content-Type（子串匹配，为空表示不限）
+CAPTURE_CONTENT_TYPES: List[str] = ["json"]
+# 每页捕获到多少个响应后结束（0表示等到超时）
+CAPTURE_EXPECT: int = 1
+# 等待预期响应的超时（秒）
+CAPTURE_TIMEOUT: float = 30.0
+# 单个响应体保存上限（字节），超出部分截断
+CAPTURE_MAX_BYTES: int = 20_000_000
+
+# ==================== 分级抓取配置 ====================
+# 先用轻量HTTP请求抓取，命中CF特征或页面依赖JS时才升级到浏览器（也可用 --tiered 开启）
+TIER_ENABLE: bool = False
+# HTTP请求超时（秒）
+TIER_HTTP_TIMEOUT: float = 15.0
+# HTTP连接池总连接数 / 单host连接数
+TIER_POOL_SIZE: int = 100
+TIER_POOL_PER_HOST: int = 8
+# 空闲连接保活时间（秒）
+TIER_KEEPALIVE: float = 30.0
+# 页面可见文本少于该字符数且含脚本时视为依赖JS渲染
+TIER_MIN_TEXT: int = 200
+# 已判定需要浏览器的host，间隔多久后重新尝试HTTP（秒）
+TIER_RECHECK: float = 3600.0
+# 各host抓取方式记录
+TIER_STATE_PATH: str = "results/tiers.json"
+
+# ==================== 性能指标配置 ====================
+# 启用分阶段耗时指标
+METRICS_ENABLE: bool = True
+# Prometheus文本端点端口（http://127.0.0.1:<端口>/metrics，0表示不启动）
+METRICS_PORT: int = 0
+# 指标JSON定期落盘路径（空字符串表示不落盘）
+METRICS_JSON_PATH: str = "results/metrics.json"
+# 指标JSON落盘间隔（秒）
+METRICS_DUMP_INTERVAL: float = 30.0
+
+# ==================== 性能剖析配置 ====================
+# 采集每次爬取的CDP性能指标与网络摘要（也可用 --profile 开启）
+PROFILE_ENABLE: bool = False
+# 失败或慢页面的HAR保存目录
+PROFILE_DIR: str = "results/profiles"
+# 耗时超过最近成功爬取的该分位数时视为慢页面
+PROFILE_PERCENTILE: float = 95.0
+# 样本数达到该值后才按分位数判定慢页面
+PROFILE_MIN_SAMPLES: int = 20
+# 分位数统计的滚动窗口大小
+PROFILE_WINDOW: int = 500
+# 单次爬取最多记录的请求数
+PROFILE_MAX_ENTRIES: int = 1000
+# HAR文件总占用上限（MB），超出时删除最旧的文件
+PROFILE_DISK_BUDGET_MB: float = 200.0
+
+# ==================== 守护进程配置 ====================
+# 任务API监听地址（仅本地）
+DAEMON_HOST: str = "127.0.0.1"
+DAEMON_PORT: int = 8700
+# 非空时改为监听Unix socket（仅Linux/Mac）
+DAEMON_SOCKET: str = ""
+# 接口返回的单页源码上限（字符，0表示不限制），超出部分截断并标记 html_truncated（结果输出中仍为完整源码）
+DAEMON_HTML_MAX_CHARS: int = 2_000_000
@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+# pytest 从仓库根目录收集测试时，把根目录加入 sys.path，测试中可直接 import config / core.*
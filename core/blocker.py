@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+from playwright.async_api import Page, Route
+from config import FETCH_PROFILE, FETCH_PROFILES
+import logging
+
+logger = logging.getLogger("cf_crawler.blocker")
+
+# CF挑战资源路径，任何档位都放行，避免拦截后验证无法通过
+_CF_CHALLENGE_PATH = "/cdn-cgi/"
+# 被拦截资源的体积估算（字节，按资源类型取常见均值），用于统计节省流量
+_TYPE_SIZE_ESTIMATE: Dict[str, int] = {
+    "image": 40_000,
+    "media": 500_000,
+    "font": 35_000,
+    "stylesheet": 20_000,
+    "script": 30_000,
+}
+_DEFAULT_SIZE_ESTIMATE = 5_000
+
+def _host_in(host: str, domains: List[str]) -> bool:
+    """域名匹配：完全相等或为其子域名"""
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+class RouteStats:
+    """单次爬取的拦截统计"""
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.blocked = 0
+        self.blocked_bytes = 0
+        self.blocked_by_type: Dict[str, int] = {}
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "blocked": self.blocked,
+            "blocked_bytes_est": self.blocked_bytes,
+            "blocked_by_type": dict(self.blocked_by_type),
+        }
+
+class FetchProfile:
+    """资源拦截档位：按资源类型/域名的放行与拦截名单判定请求"""
+    def __init__(self, name: str, rules: dict):
+        self.name = name
+        self.allow_types = set(rules.get("allow_types", []))
+        self.deny_types = set(rules.get("deny_types", []))
+        self.allow_domains = list(rules.get("allow_domains", []))
+        self.deny_domains = list(rules.get("deny_domains", []))
+
+    @property
+    def passthrough(self) -> bool:
+        """无任何规则时不安装路由，省去每个请求的拦截开销"""
+        return not (self.allow_types or self.deny_types or self.deny_domains)
+
+    def should_block(self, url: str, resource_type: str) -> bool:
+        """判定优先级：放行域名 > 拦截域名 > 类型白名单 > 类型黑名单"""
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or parsed.path.startswith(_CF_CHALLENGE_PATH):
+            return False
+        host = (parsed.hostname or "").lower()
+        if _host_in(host, self.allow_domains):
+            return False
+        if _host_in(host, self.deny_domains):
+            return True
+        if self.allow_types and resource_type not in self.allow_types:
+            return True
+        return resource_type in self.deny_types
+
+    @classmethod
+    def load(cls, name: Optional[str] = None) -> "FetchProfile":
+        """按名称加载config中的档位，名称不存在时降级为full（不拦截）"""
+        name = name or FETCH_PROFILE
+        rules = FETCH_PROFILES.get(name)
+        if rules is None:
+            logger.warning(f"⚠️ 资源拦截档位 {name} 不存在，降级为full")
+            return cls("full", {})
+        return cls(name, rules)
+
+class ResourceBlocker:
+    """基于page.route的资源拦截层，页面创建时安装一次，统计随每次爬取重置
+
+    同时负责给主文档请求附加一次性的条件请求头（增量爬取），不影响子资源请求
+    """
+    def __init__(self, profile: FetchProfile):
+        self.profile = profile
+        self._stats: Dict[Page, RouteStats] = {}
+        self._conditional: Dict[Page, Dict[str, str]] = {}
+
+    def set_conditional(self, page: Page, headers: Dict[str, str]):
+        """下一次主框架导航请求附加的请求头（使用一次后失效）"""
+        if headers:
+            self._conditional[page] = headers
+        else:
+            self._conditional.pop(page, None)
+
+    def _forget(self, page: Page):
+        self._stats.pop(page, None)
+        self._conditional.pop(page, None)
+
+    async def install(self, page: Page):
+        stats = RouteStats()
+        self._stats[page] = stats
+        page.once("close", lambda _page: self._forget(page))
+        if self.profile.passthrough:
+            return
+
+        async def handler(route: Route):
+            request = route.request
+            stats.requests += 1
+            try:
+                if self.profile.should_block(request.url, request.resource_type):
+                    stats.blocked += 1
+                    stats.blocked_by_type[request.resource_type] = stats.blocked_by_type.get(request.resource_type, 0) + 1
+                    stats.blocked_bytes += _TYPE_SIZE_ESTIMATE.get(request.resource_type, _DEFAULT_SIZE_ESTIMATE)
+                    await route.abort("blockedbyclient")
+                elif page in self._conditional and request.is_navigation_request() and request.frame == page.main_frame:
+                    headers = {**request.headers, **self._conditional.pop(page)}
+                    await route.continue_(headers=headers)
+                else:
+                    await route.continue_()
+            except Exception as e:
+                # 页面已关闭/跳转时路由会失效，忽略即可
+                logger.debug(f"资源拦截处理异常：{str(e)[:60]}")
+
+        await page.route("**/*", handler)
+
+    def stats(self, page: Page) -> RouteStats:
+        """获取页面的拦截统计（未安装时返回空统计）"""
+        return self._stats.get(page) or RouteStats()
@@ -1,21 +1,77 @@
 # -*- coding: utf-8 -*-
+import time
 import random
+import asyncio
 from pathlib import Path
+from typing import Dict, List, Optional, Set
+from contextlib import asynccontextmanager
 from playwright.async_api import async_playwright, Browser, BrowserContext, Page
 # 适配playwright_stealth 2.x版本（直接导入异步stealth）
 from playwright_stealth import stealth
-from config import HEADLESS, VIEWPORT, UA_POOL
+from config import (
+    HEADLESS, VIEWPORT, UA_POOL, BROWSER_CHANNEL_CACHE,
+    CONTEXT_POOL_SIZE, PAGES_PER_CONTEXT, CONTEXT_MAX_PAGES, CONTEXT_MAX_MEMORY_MB, PROFILE_ENABLE
+)
 from core.proxy import ProxyPool
+from core.blocker import FetchProfile, ResourceBlocker, RouteStats
+from core.metrics import metrics
+from core.profiler import PageProfiler
 import logging
 
 logger = logging.getLogger("cf_crawler.browser")
 
+# 浏览器启动顺序：优先系统Chrome，降级Edge
+BROWSER_CHANNELS = ("chrome", "msedge")
+_CHANNEL_NAMES = {"chrome": "Chrome", "msedge": "Edge"}
+
+# 标准请求头，模拟真实浏览器（分级抓取的HTTP层共用）
+EXTRA_HEADERS: Dict[str, str] = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
+    "Accept-Language": "zh-CN,zh;q=0.9,en-US;q=0.8",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+    "Sec-Fetch-Dest": "document",
+    "Sec-Fetch-Mode": "navigate",
+    "Sec-Fetch-Site": "none",
+    "Sec-Fetch-User": "?1"
+}
+
+# 页面归还时读取渲染进程JS堆占用（仅Chromium支持performance.memory）
+_HEAP_JS = "() => (performance.memory ? performance.memory.usedJSHeapSize : 0)"
+
+class _ContextSlot:
+    """池中的一个预热上下文，记录服务页面数与在用页面数，用于回收判定"""
+    def __init__(self, context: BrowserContext):
+        self.context = context
+        self.pages: List[Page] = []
+        self.served = 0
+        self.retired = False
+
 class BrowserCore:
-    def __init__(self, proxy_pool: ProxyPool):
+    def __init__(self, proxy_pool: ProxyPool, fetch_profile: Optional[str] = None, profile: Optional[bool] = None,
+                 concurrency: Optional[int] = None):
         self.proxy_pool = proxy_pool
         self.playwright = None
         self.browser: Browser = None
         self.context: BrowserContext = None
+        # 预热上下文/页面池
+        self._slots: List[_ContextSlot] = []
+        self._page_slot: Dict[Page, _ContextSlot] = {}
+        self._idle: asyncio.Queue = asyncio.Queue()
+        # 每个上下文的页面数：页面总数不足并发数时按并发数补足，否则多出的worker只会阻塞在租借页面上
+        self._contexts = max(1, CONTEXT_POOL_SIZE)
+        self._pages_per_context = max(1, PAGES_PER_CONTEXT)
+        if concurrency and concurrency > self._contexts * self._pages_per_context:
+            self._pages_per_context = -(-concurrency // self._contexts)
+            logger.info(f"并发数 {concurrency} 超过页面池 {self._contexts}×{max(1, PAGES_PER_CONTEXT)}，"
+                        f"每个上下文预热页面数调整为 {self._pages_per_context}")
+        # 临时改过页面级请求头（条件请求）的页面，归还时恢复
+        self._conditional_pages: Set[Page] = set()
+        # 资源拦截层（按档位过滤图片/媒体/追踪等请求）
+        self.blocker = ResourceBlocker(FetchProfile.load(fetch_profile))
+        # 可选的页面剖析（CDP性能指标 + 网络记录，离群/失败时保存HAR）
+        self.profiler: Optional[PageProfiler] = PageProfiler() if (PROFILE_ENABLE if profile is None else profile) else None
         # 读取指纹伪装脚本（兼容路径不存在的异常）
         try:
             self.fp_script = Path("assets/fingerprint.js").read_text(encoding="utf-8")
@@ -31,10 +87,29 @@ class BrowserCore:
             return default_ua
         return random.choice(UA_POOL)
 
+    def _channel_order(self) -> List[str]:
+        """读取上次启动成功的浏览器通道，排在最前，避免每次重启都先失败一次"""
+        channels = list(BROWSER_CHANNELS)
+        try:
+            cached = Path(BROWSER_CHANNEL_CACHE).read_text(encoding="utf-8").strip()
+        except OSError:
+            return channels
+        if cached in channels:
+            channels.remove(cached)
+            channels.insert(0, cached)
+        return channels
+
+    def _remember_channel(self, channel: str):
+        try:
+            Path(BROWSER_CHANNEL_CACHE).write_text(channel, encoding="utf-8")
+        except OSError as e:
+            logger.debug(f"记录浏览器通道失败：{str(e)}")
+
     async def init(self) -> bool:
         """初始化零特征浏览器（自动检测系统Chrome/Edge，无硬编码路径）"""
         try:
-            self.playwright = await async_playwright().start()
+            with metrics.timer("playwright_start"):
+                self.playwright = await async_playwright().start()
             # 启动参数：禁用所有自动化标记，最小化特征
             launch_args = [
                 f"--window-size={VIEWPORT['width']},{VIEWPORT['height']}",
@@ -60,52 +135,36 @@ class BrowserCore:
                 logger.warning(f"⚠️ 获取代理失败，禁用代理：{str(e)[:50]}")
             proxy_config = {"server": proxy} if proxy else None
 
-            # 自动检测系统浏览器（优先Chrome，降级Edge）
+            # 自动检测系统浏览器（优先上次成功的通道，其次Chrome，降级Edge），每次尝试单独计时
             browser_launched = False
-            # 1. 优先启动系统Chrome
-            try:
-                self.browser = await self.playwright.chromium.launch(
-                    headless=HEADLESS,
-                    args=launch_args,
-                    proxy=proxy_config,
-                    ignore_default_args=["--enable-automation"],
-                    channel="chrome"
-                )
-                logger.info("✅ 成功启动系统Chrome浏览器")
-                browser_launched = True
-            except Exception as e:
-                logger.warning(f"⚠️ 系统Chrome未检测到（{str(e)[:60]}），尝试启动Edge")
-                # 2. 降级启动系统Edge
+            for channel in self._channel_order():
                 try:
-                    self.browser = await self.playwright.chromium.launch(
-                        headless=HEADLESS,
-                        args=launch_args,
-                        proxy=proxy_config,
-                        ignore_default_args=["--enable-automation"],
-                        channel="msedge"
-                    )
-                    logger.info("✅ 成功启动系统Edge浏览器")
+                    with metrics.timer("browser_launch", channel):
+                        self.browser = await self.playwright.chromium.launch(
+                            headless=HEADLESS,
+                            args=launch_args,
+                            proxy=proxy_config,
+                            ignore_default_args=["--enable-automation"],
+                            channel=channel
+                        )
+                    logger.info(f"✅ 成功启动系统{_CHANNEL_NAMES[channel]}浏览器")
+                    self._remember_channel(channel)
                     browser_launched = True
-                except Exception as e2:
-                    logger.error(f"❌ 系统Chrome/Edge均未检测到：{str(e2)}")
-            
+                    break
+                except Exception as e:
+                    logger.warning(f"⚠️ 系统{_CHANNEL_NAMES[channel]}未检测到（{str(e)[:60]}）")
+
             if not browser_launched:
-                logger.error("❌ 浏览器启动失败：未安装Chrome/Edge，且无备用浏览器")
+                logger.error("❌ 浏览器启动失败：系统Chrome/Edge均未检测到，且无备用浏览器")
                 return False
 
-            # 创建上下文，设置基础指纹
-            self.context = await self.browser.new_context(
-                viewport=VIEWPORT,
-                user_agent=self._get_random_ua(),
-                ignore_https_errors=True,
-                locale="zh-CN"
-            )
-
-            # 注入深度指纹伪装脚本（兼容脚本为空）
+            # 预热上下文/页面池
+            for _ in range(self._contexts):
+                await self._add_slot()
+            self.context = self._slots[0].context
             if self.fp_script:
-                await self.context.add_init_script(self.fp_script)
                 logger.info("✅ 深度指纹伪装脚本已注入")
-            logger.info("✅ 浏览器初始化完成，全维度指纹已伪装")
+            logger.info(f"✅ 浏览器初始化完成，全维度指纹已伪装，预热页面数：{self._idle.qsize()}，资源拦截档位：{self.blocker.profile.name}")
             return True
 
         except Exception as e:
@@ -113,25 +172,173 @@ class BrowserCore:
             await self.close()
             return False
 
-    async def new_page(self) -> Page:
-        """创建新页面并应用Stealth防检测"""
+    async def _new_context(self) -> BrowserContext:
+        """创建上下文，设置基础指纹并注入深度指纹伪装脚本"""
+        with metrics.timer("context_create"):
+            context = await self.browser.new_context(
+                viewport=VIEWPORT,
+                user_agent=self._get_random_ua(),
+                ignore_https_errors=True,
+                locale="zh-CN"
+            )
+            # 兼容脚本为空
+            if self.fp_script:
+                await context.add_init_script(self.fp_script)
+        return context
+
+    async def _add_slot(self) -> _ContextSlot:
+        """新建一个上下文并预热页面，页面放入空闲队列"""
+        slot = _ContextSlot(await self._new_context())
+        self._slots.append(slot)
+        for _ in range(self._pages_per_context):
+            page = await self.new_page(slot.context)
+            slot.pages.append(page)
+            self._page_slot[page] = slot
+            self._idle.put_nowait(page)
+        return slot
+
+    async def _drop_page(self, page: Page):
+        """关闭页面；所属上下文已退役且页面全部关闭时，重建一个新上下文补位"""
+        slot = self._page_slot.pop(page, None)
+        self._conditional_pages.discard(page)
+        try:
+            await page.close()
+        except Exception:
+            pass
+        if slot is None:
+            return
+        slot.pages.remove(page)
+        if slot.retired and not slot.pages:
+            self._slots.remove(slot)
+            try:
+                await slot.context.close()
+            except Exception as e:
+                logger.warning(f"⚠️ 关闭退役上下文异常：{str(e)[:60]}")
+            try:
+                await self._add_slot()
+                self.context = self._slots[0].context
+                logger.info(f"♻️ 上下文已回收重建（累计服务 {slot.served} 个页面）")
+            except Exception as e:
+                logger.error(f"❌ 重建上下文失败：{str(e)}")
+        elif not slot.retired:
+            # 页面异常丢弃，在原上下文中补一个预热页面
+            try:
+                fresh = await self.new_page(slot.context)
+                slot.pages.append(fresh)
+                self._page_slot[fresh] = slot
+                self._idle.put_nowait(fresh)
+            except Exception as e:
+                logger.error(f"❌ 补充预热页面失败：{str(e)}")
+
+    async def _over_memory(self, page: Page) -> bool:
+        if CONTEXT_MAX_MEMORY_MB <= 0:
+            return False
+        try:
+            used = await page.evaluate(_HEAP_JS)
+        except Exception:
+            return False
+        return used / (1024 * 1024) > CONTEXT_MAX_MEMORY_MB
+
+    async def acquire_page(self) -> Page:
+        """从池中取出一个预热页面（无空闲页面时等待归还）"""
+        while True:
+            if not any(slot.pages for slot in self._slots):
+                raise RuntimeError("页面池为空，浏览器可能已崩溃")
+            page = await self._idle.get()
+            slot = self._page_slot.get(page)
+            if slot is None or slot.retired or page.is_closed():
+                # 已退役上下文的残留页面，直接关闭
+                await self._drop_page(page)
+                continue
+            slot.served += 1
+            self.blocker.stats(page).reset()
+            self.blocker.set_conditional(page, {})
+            return page
+
+    async def release_page(self, page: Page, discard: bool = False):
+        """归还页面：达到回收阈值时退役其上下文，否则清空后放回池中复用"""
+        slot = self._page_slot.get(page)
+        if slot is None:
+            await self._drop_page(page)
+            return
+        if not slot.retired:
+            if CONTEXT_MAX_PAGES and slot.served >= CONTEXT_MAX_PAGES:
+                slot.retired = True
+            elif not discard and await self._over_memory(page):
+                logger.info(f"♻️ 页面JS堆超过 {CONTEXT_MAX_MEMORY_MB}MB，回收所属上下文")
+                slot.retired = True
+        if discard or slot.retired or page.is_closed():
+            await self._drop_page(page)
+            return
+        try:
+            if page in self._conditional_pages:
+                self._conditional_pages.discard(page)
+                await page.set_extra_http_headers(EXTRA_HEADERS)
+            # 跳转空白页释放DOM，下次直接goto复用
+            await page.goto("about:blank")
+        except Exception:
+            await self._drop_page(page)
+            return
+        self._idle.put_nowait(page)
+
+    @asynccontextmanager
+    async def lease_page(self):
+        """页面租借：async with browser_core.lease_page() as page，用完自动归还"""
+        page = await self.acquire_page()
+        if self.profiler is None:
+            try:
+                yield page
+            finally:
+                await self.release_page(page)
+            return
+        start = time.monotonic()
+        error: Optional[BaseException] = None
+        await self.profiler.start(page)
+        try:
+            yield page
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            await self.profiler.finish(page, time.monotonic() - start, error)
+            await self.release_page(page)
+
+    async def set_conditional_headers(self, page: Page, headers: Dict[str, str]):
+        """为本次导航附加条件请求头（If-None-Match / If-Modified-Since）
+
+        已安装拦截路由时只改写主文档请求；full档位无路由，退回页面级请求头，归还页面时恢复
+        """
+        if not headers:
+            return
+        if self.blocker.profile.passthrough:
+            self._conditional_pages.add(page)
+            await page.set_extra_http_headers({**EXTRA_HEADERS, **headers})
+        else:
+            self.blocker.set_conditional(page, headers)
+
+    async def profile(self, page: Page) -> Optional[dict]:
+        """本次租借的剖析摘要（性能指标 + 网络摘要），未开启剖析时返回None"""
+        if self.profiler is None:
+            return None
+        return await self.profiler.collect(page)
+
+    def route_stats(self, page: Page) -> RouteStats:
+        """当前爬取的资源拦截统计（页面租出时重置）"""
+        return self.blocker.stats(page)
+
+    async def new_page(self, context: Optional[BrowserContext] = None) -> Page:
+        """创建新页面并应用Stealth防检测与资源拦截"""
         try:
-            page = await self.context.new_page()
-            # 应用stealth防检测（适配2.x版本）
-            await stealth(page)
-            # 设置标准请求头，模拟真实浏览器
-            await page.set_extra_http_headers({
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
-                "Accept-Language": "zh-CN,zh;q=0.9,en-US;q=0.8",
-                "Accept-Encoding": "gzip, deflate, br",
-                "Connection": "keep-alive",
-                "Upgrade-Insecure-Requests": "1",
-                "Sec-Fetch-Dest": "document",
-                "Sec-Fetch-Mode": "navigate",
-                "Sec-Fetch-Site": "none",
-                "Sec-Fetch-User": "?1"
-            })
-            logger.info("✅ 新页面创建完成，Stealth防检测已应用")
+            with metrics.timer("new_page"):
+                page = await (context or self.context).new_page()
+            with metrics.timer("stealth_setup"):
+                # 应用stealth防检测（适配2.x版本）
+                await stealth(page)
+                # 设置标准请求头，模拟真实浏览器
+                await page.set_extra_http_headers(EXTRA_HEADERS)
+                # 安装资源拦截路由（full档位不安装）
+                await self.blocker.install(page)
+            logger.debug("✅ 新页面创建完成，Stealth防检测已应用")
             return page
         except Exception as e:
             logger.error(f"❌ 创建新页面失败：{str(e)}")
@@ -140,8 +347,10 @@ class BrowserCore:
     async def close(self):
         """安全释放浏览器资源"""
         try:
-            if self.context:
-                await self.context.close()
+            for slot in self._slots:
+                await slot.context.close()
+            self._slots.clear()
+            self._page_slot.clear()
             if self.browser:
                 await self.browser.close()
             if self.playwright:
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import re
+import asyncio
+from typing import List, Optional, Set
+from playwright.async_api import Page, Response
+from config import CAPTURE_PATTERNS, CAPTURE_CONTENT_TYPES, CAPTURE_EXPECT, CAPTURE_MAX_BYTES
+from core.content import ContentBody
+from core.metrics import metrics, host_of
+import logging
+
+logger = logging.getLogger("cf_crawler.capture")
+
+class _PageCapture:
+    """单个页面的捕获状态：命中的响应体读取后立即交给结果输出，达到预期数量时置位done"""
+    def __init__(self, owner: "ResponseCapture", page: Page, page_url: str):
+        self.owner = owner
+        self.page = page
+        self.page_url = page_url
+        self.count = 0
+        self.done = asyncio.Event()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def on_response(self, response: Response):
+        if not self.owner.matches(response):
+            return
+        task = asyncio.create_task(self._emit(response))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _emit(self, response: Response):
+        try:
+            data = await response.body()
+        except Exception as e:
+            # 重定向/页面已跳转时响应体不可读
+            logger.debug(f"读取响应体失败 {response.url[:80]}：{str(e)[:60]}")
+            return
+        body = ContentBody()
+        body.append(data[:self.owner.max_bytes].decode("utf-8", "replace"))
+        body.truncated = len(data) > self.owner.max_bytes
+        body.finish()
+        record = {
+            "url": response.url, "page_url": self.page_url, "source": "capture", "ok": True, "error": None,
+            "http_status": response.status, "content_type": response.headers.get("content-type", ""),
+            "body": body,
+        }
+        await self.owner.sink.put(record)
+        metrics.inc("captured_responses", host_of(self.page_url))
+        self.count += 1
+        if self.owner.expect and self.count >= self.owner.expect:
+            self.done.set()
+
+    async def close(self):
+        """停止监听，等待已命中响应写出（页面归还前调用，响应体需在页面存活时读取）"""
+        self.page.remove_listener("response", self.on_response)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+class ResponseCapture:
+    """接口捕获模式：监听页面响应，按URL正则与Content-Type过滤，命中的响应体直接流式写入结果输出
+
+    单页应用的数据通常经XHR/fetch以JSON返回，捕获到预期数量后即可结束，不必等待渲染与行为仿真
+    """
+    def __init__(self, sink, patterns: Optional[List[str]] = None, content_types: Optional[List[str]] = None,
+                 expect: int = CAPTURE_EXPECT, max_bytes: int = CAPTURE_MAX_BYTES):
+        self.sink = sink
+        self.patterns = [re.compile(p) for p in (patterns if patterns is not None else CAPTURE_PATTERNS)]
+        self.content_types = [c.lower() for c in (content_types if content_types is not None else CAPTURE_CONTENT_TYPES)]
+        self.expect = max(0, expect)
+        self.max_bytes = max_bytes
+
+    def matches(self, response: Response) -> bool:
+        if not 200 <= response.status < 300:
+            return False
+        if self.patterns and not any(p.search(response.url) for p in self.patterns):
+            return False
+        if self.content_types:
+            content_type = response.headers.get("content-type", "").lower()
+            if not any(c in content_type for c in self.content_types):
+                return False
+        return True
+
+    def attach(self, page: Page, page_url: str) -> _PageCapture:
+        """导航前调用，开始捕获该页面的响应"""
+        capture = _PageCapture(self, page, page_url)
+        page.on("response", capture.on_response)
+        return capture
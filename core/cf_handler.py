@@ -1,8 +1,13 @@
 # -*- coding: utf-8 -*-
+import re
 import asyncio
 from enum import Enum
-from playwright.async_api import Page
-from config import CF_MAX_WAIT, CF_CHECK_INTERVAL
+from typing import List, Optional, Set, Tuple
+from playwright.async_api import Page, Frame, Response
+from config import CF_MAX_WAIT, CF_CHECK_INTERVAL, CF_DETECT_SLICE
+from core.metrics import metrics, host_of
+from core.verify import VerifyQueue, DONE, CHANGED, SKIPPED, FULL, EXPIRED
+from core.retry import VerificationAborted
 import logging
 
 logger = logging.getLogger("cf_crawler.cf_handler")
@@ -14,52 +19,186 @@ class CFStatus(Enum):
     IP_BLOCK = "ip_block"      # IP封禁
     UNKNOWN = "unknown"        # 未知CF状态
 
-class CFHandler:
+# 关键词规则（按优先级排列：IP封禁 > Turnstile > 5秒盾），第三项表示是否同时匹配标题
+CF_KEYWORD_RULES: List[Tuple[CFStatus, List[str], bool]] = [
+    (CFStatus.IP_BLOCK, ["Access denied", "IP blocked", "Your IP has been", "cloudflare ray id"], False),
+    (CFStatus.TURNSTILE, ["Cloudflare Challenge", "Turnstile", "Verify you are human", "cf-captcha"], True),
+    (CFStatus.FIVE_SECOND, ["Just a moment", "Checking your browser", "cf-browser-verification"], True),
+]
+
+# 页内选择器探针：命中即可直接判定，无需序列化DOM
+CF_SELECTOR_RULES: List[Tuple[CFStatus, str]] = [
+    (CFStatus.TURNSTILE, "#turnstile-wrapper, #challenge-stage iframe[src*='challenges.cloudflare.com']"),
+    (CFStatus.FIVE_SECOND, "#challenge-running, #challenge-form, #cf-challenge-running, .cf-browser-verification"),
+]
+
+# 单次evaluate完成标题+选择器探针，仅在选择器未命中时才回传文档前limit个字符
+# 按head/body子节点逐个序列化，凑够limit即停止，大页面无需整页序列化
+_PROBE_JS = """
+([selectors, limit]) => {
+    const markers = [];
+    for (let i = 0; i < selectors.length; i++) {
+        try {
+            if (document.querySelector(selectors[i])) markers.push(i);
+        } catch (e) {}
+    }
+    let html = "";
+    if (!markers.length && document.documentElement) {
+        const parts = [];
+        let size = 0;
+        outer:
+        for (const section of [document.head, document.body]) {
+            if (!section) continue;
+            for (const node of section.childNodes) {
+                const chunk = node.outerHTML || node.textContent || "";
+                parts.push(chunk);
+                size += chunk.length;
+                if (size >= limit) break outer;
+            }
+        }
+        html = parts.join("").slice(0, limit);
+    }
+    return {title: document.title || "", markers: markers, html: html};
+}
+"""
+
+class CFRuleMatcher:
+    """CF特征匹配器：所有关键词预编译为一个正则，单次扫描得出状态"""
+    _UNKNOWN_GROUPS = ("u_cf", "u_ray")
+
     def __init__(self):
+        parts = []
+        self._group_status = {}
+        self._title_groups: Set[str] = set()
+        for i, (status, keywords, match_title) in enumerate(CF_KEYWORD_RULES):
+            group = f"r{i}"
+            parts.append(f"(?P<{group}>{'|'.join(re.escape(kw) for kw in keywords)})")
+            self._group_status[group] = status
+            if match_title:
+                self._title_groups.add(group)
+        # 未知CF状态：同时出现 cloudflare 与 cf-ray（不区分大小写）
+        parts.append("(?P<u_cf>(?i:cloudflare))")
+        parts.append("(?P<u_ray>(?i:cf-ray))")
+        self._pattern = re.compile("|".join(parts))
+        self._priority = [status for status, _, _ in CF_KEYWORD_RULES]
+
+    def match(self, content: str, title: str = "") -> CFStatus:
+        hits: Set[CFStatus] = set()
+        unknown: Set[str] = set()
+        for m in self._pattern.finditer(title):
+            if m.lastgroup in self._title_groups:
+                hits.add(self._group_status[m.lastgroup])
+        for m in self._pattern.finditer(content):
+            group = m.lastgroup
+            if group in self._UNKNOWN_GROUPS:
+                unknown.add(group)
+                continue
+            status = self._group_status[group]
+            hits.add(status)
+            # 最高优先级已命中，提前结束扫描
+            if status == self._priority[0]:
+                break
+        for status in self._priority:
+            if status in hits:
+                return status
+        if len(unknown) == len(self._UNKNOWN_GROUPS):
+            return CFStatus.UNKNOWN
+        return CFStatus.NORMAL
+
+class CFHandler:
+    def __init__(self, verify: Optional[VerifyQueue] = None):
         self.max_wait = CF_MAX_WAIT
         self.check_interval = CF_CHECK_INTERVAL
+        self.detect_slice = CF_DETECT_SLICE
+        self.matcher = CFRuleMatcher()
+        self._selectors = [selector for _, selector in CF_SELECTOR_RULES]
+        # Turnstile需要人工处理时挂起到验证队列，不阻塞其他worker
+        self.verify = verify or VerifyQueue()
 
     async def _detect_status(self, page: Page) -> CFStatus:
-        """精准CF状态检测，低误判"""
+        """精准CF状态检测，低误判（页内探针 + 预编译规则单次匹配，只看标题与文档前段）"""
         try:
-            content = await page.content()
-            title = await page.title()
-            url = page.url.lower()
-
-            # 特征匹配（优先级：IP封禁 > Turnstile > 5秒盾 > 正常）
-            if any(kw in content for kw in ["Access denied", "IP blocked", "Your IP has been", "cloudflare ray id"]):
-                return CFStatus.IP_BLOCK
-            if any(kw in content or kw in title for kw in ["Cloudflare Challenge", "Turnstile", "Verify you are human", "cf-captcha"]):
-                return CFStatus.TURNSTILE
-            if any(kw in content or kw in title for kw in ["Just a moment", "Checking your browser", "cf-browser-verification"]):
-                return CFStatus.FIVE_SECOND
-            if "cloudflare" in content.lower() and "cf-ray" in content.lower():
-                return CFStatus.UNKNOWN
-            return CFStatus.NORMAL
+            probe = await page.evaluate(_PROBE_JS, [self._selectors, self.detect_slice])
+            if probe["markers"]:
+                # 选择器规则同样按优先级排列，取第一个命中项
+                return CF_SELECTOR_RULES[min(probe["markers"])][0]
+            return self.matcher.match(probe["html"], probe["title"])
         except Exception as e:
             logger.error(f"CF状态检测异常：{str(e)}")
             return CFStatus.UNKNOWN
 
     async def handle(self, page: Page) -> CFStatus:
-        """分级处理CF防护，智能等待/引导，无冗余操作"""
-        start = asyncio.get_event_loop().time()
-        while asyncio.get_event_loop().time() - start < self.max_wait:
-            status = await self._detect_status(page)
-            logger.info(f"当前CF状态：{status.value}")
-
-            if status == CFStatus.NORMAL:
-                return CFStatus.NORMAL
-            elif status == CFStatus.IP_BLOCK:
-                logger.critical("IP被Cloudflare封禁，需更换代理")
-                return CFStatus.IP_BLOCK
-            elif status == CFStatus.TURNSTILE:
-                logger.warning("检测到CF Turnstile人机验证，请在浏览器中完成验证后按Enter")
-                # 非阻塞等待用户操作
-                loop = asyncio.get_event_loop()
-                await loop.run_in_executor(None, input, "完成验证后按Enter继续...")
-                await asyncio.sleep(1)
-            elif status in [CFStatus.FIVE_SECOND, CFStatus.UNKNOWN]:
-                await asyncio.sleep(self.check_interval)
-
-        logger.error(f"CF验证超时，超过{self.max_wait}秒")
-        return CFStatus.UNKNOWN
+        """分级处理CF防护，导航/响应事件驱动检测，页面放行后立即返回
+
+        超时仍停留在5秒盾/Turnstile时返回该挑战状态（调用方据此区分挑战超时与封禁）
+        """
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+        status = CFStatus.UNKNOWN
+
+        def on_navigated(frame: Frame):
+            if frame == page.main_frame:
+                changed.set()
+
+        def on_response(response: Response):
+            if response.request.resource_type == "document" and response.frame == page.main_frame:
+                changed.set()
+
+        def on_loaded(_page: Page):
+            changed.set()
+
+        page.on("framenavigated", on_navigated)
+        page.on("response", on_response)
+        page.on("domcontentloaded", on_loaded)
+        try:
+            start = loop.time()
+            while (remaining := self.max_wait - (loop.time() - start)) > 0:
+                if changed.is_set():
+                    # 导航刚发生，等DOM就绪再检测，避免空白文档误判为正常
+                    changed.clear()
+                    try:
+                        await page.wait_for_load_state("domcontentloaded", timeout=remaining * 1000)
+                    except Exception:
+                        pass
+                with metrics.timer("cf_detect", host_of(page.url)) as t:
+                    status = await self._detect_status(page)
+                    t.outcome = status.value
+                logger.info(f"当前CF状态：{status.value}")
+
+                if status == CFStatus.NORMAL:
+                    return CFStatus.NORMAL
+                elif status == CFStatus.IP_BLOCK:
+                    logger.critical("IP被Cloudflare封禁，需更换代理")
+                    return CFStatus.IP_BLOCK
+                elif status == CFStatus.TURNSTILE:
+                    logger.warning("检测到CF Turnstile人机验证，挂起等待人工处理")
+                    parked = loop.time()
+                    outcome = await self.verify.park(page, page.url, changed)
+                    if outcome == SKIPPED:
+                        raise VerificationAborted("Turnstile人工验证已被跳过")
+                    if outcome == FULL:
+                        raise VerificationAborted("待人工验证页面已达上限，未能挂起")
+                    if outcome == EXPIRED:
+                        raise VerificationAborted("单URL剩余时间内未完成人工验证")
+                    if outcome not in (DONE, CHANGED):
+                        return CFStatus.TURNSTILE
+                    # 挂起时间不计入CF等待时间，恢复后重新检测
+                    start += loop.time() - parked
+                    changed.set()
+                elif status in [CFStatus.FIVE_SECOND, CFStatus.UNKNOWN]:
+                    # 等待下一次导航/响应事件，兜底间隔后再检测
+                    remaining = self.max_wait - (loop.time() - start)
+                    try:
+                        await asyncio.wait_for(changed.wait(), timeout=max(0.0, min(self.check_interval, remaining)))
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            page.remove_listener("framenavigated", on_navigated)
+            page.remove_listener("response", on_response)
+            page.remove_listener("domcontentloaded", on_loaded)
+
+        logger.error(f"CF验证超时，超过{self.max_wait}秒，最后状态：{status.value}")
+        return status if status in (CFStatus.FIVE_SECOND, CFStatus.TURNSTILE) else CFStatus.UNKNOWN
+
+    async def close(self):
+        await self.verify.close()
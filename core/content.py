@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import codecs
+import hashlib
+import tempfile
+from typing import Iterator
+from playwright.async_api import Page
+from config import CONTENT_MAX_CHARS, CONTENT_CHUNK_CHARS, CONTENT_SPOOL_MEMORY
+import logging
+
+logger = logging.getLogger("cf_crawler.content")
+
+# 在页面内序列化一次（含doctype），返回句柄，Python侧按块拉取，避免整页字符串经CDP一次性传输
+_SERIALIZE_JS = """
+() => (document.doctype ? new XMLSerializer().serializeToString(document.doctype) + "\\n" : "")
+      + (document.documentElement ? document.documentElement.outerHTML : "")
+"""
+# 按UTF-16下标切块：块尾落在代理对中间（高位代理项）时前移一位（块只剩一个单元时后移一位，取完整字符），
+# 避免把emoji等字符拆成孤立代理项；返回实际结束位置，Python侧据此推进（Python字符串长度与UTF-16下标不一致）
+_SLICE_JS = """
+(html, [start, end]) => {
+    if (end < html.length) {
+        const code = html.charCodeAt(end - 1);
+        if (code >= 0xD800 && code <= 0xDBFF) end += end - start > 1 ? -1 : 1;
+    }
+    return [html.slice(start, end), end];
+}
+"""
+
+class ContentBody:
+    """页面源码的分块缓冲：小页面留在内存，超过阈值自动落到临时文件，写入时增量计算哈希"""
+    def __init__(self):
+        self._spool = tempfile.SpooledTemporaryFile(max_size=CONTENT_SPOOL_MEMORY, mode="w+b")
+        self._sha = hashlib.sha256()
+        self.size = 0
+        self.truncated = False
+        self.hash = ""
+
+    @classmethod
+    def from_text(cls, text: str) -> "ContentBody":
+        body = cls()
+        body.append(text)
+        body.finish()
+        return body
+
+    def append(self, text: str):
+        data = text.encode("utf-8", "surrogatepass")
+        self._spool.write(data)
+        self._sha.update(data)
+        self.size += len(data)
+
+    def finish(self):
+        self.hash = self._sha.hexdigest()
+
+    def iter_bytes(self, chunk_size: int = 256 * 1024) -> Iterator[bytes]:
+        self._spool.seek(0)
+        while True:
+            data = self._spool.read(chunk_size)
+            if not data:
+                return
+            yield data
+
+    def iter_text(self, chunk_size: int = 256 * 1024) -> Iterator[str]:
+        """按块解码，跨块的多字节字符由增量解码器拼接"""
+        decoder = codecs.getincrementaldecoder("utf-8")("surrogatepass")
+        for data in self.iter_bytes(chunk_size):
+            text = decoder.decode(data)
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+    def read_text(self, max_chars: int = 0) -> str:
+        """读出源码文本；max_chars 不为0时读够该字符数即停止（大页面不必整页载入内存）"""
+        if not max_chars:
+            return "".join(self.iter_text())
+        parts = []
+        size = 0
+        for text in self.iter_text():
+            parts.append(text[:max_chars - size])
+            size += len(parts[-1])
+            if size >= max_chars:
+                break
+        return "".join(parts)
+
+    def preview(self, chars: int) -> str:
+        self._spool.seek(0)
+        return self._spool.read(chars * 4).decode("utf-8", "ignore")[:chars]
+
+    def close(self):
+        self._spool.close()
+
+async def extract_content(page: Page, max_chars: int = CONTENT_MAX_CHARS,
+                          chunk_chars: int = CONTENT_CHUNK_CHARS) -> ContentBody:
+    """分块提取页面源码，超过max_chars截断（0表示不限制）"""
+    handle = await page.evaluate_handle(_SERIALIZE_JS)
+    body = ContentBody()
+    try:
+        total = await handle.evaluate("html => html.length")
+        limit = min(total, max_chars) if max_chars else total
+        start = 0
+        while start < limit:
+            text, start = await handle.evaluate(_SLICE_JS, [start, min(start + chunk_chars, limit)])
+            body.append(text)
+        body.truncated = limit < total
+        if body.truncated:
+            logger.warning(f"⚠️ 页面源码 {total} 字符超过上限 {max_chars}，已截断")
+    except Exception:
+        body.close()
+        raise
+    finally:
+        try:
+            await handle.dispose()
+        except Exception:
+            pass
+    body.finish()
+    return body
@@ -1,44 +1,94 @@
 # -*- coding: utf-8 -*-
-import os
+import time
 import json
+import asyncio
+import sqlite3
+import weakref
 from pathlib import Path
 from urllib.parse import urlparse
-from typing import List
+from typing import Dict, List, Optional, Set
 from playwright.async_api import BrowserContext
-from config import COOKIE_PERSIST, COOKIE_DIR, CF_COOKIE_KEYS
+from config import COOKIE_PERSIST, COOKIE_DIR, CF_COOKIE_KEYS, COOKIE_FLUSH_INTERVAL
 import logging
 
 logger = logging.getLogger("cf_crawler.cookie")
 
 class CookieManager:
+    """CF会话Cookie存储：内存按域名索引，查询时跳过过期项，后台批量落盘到单个SQLite文件"""
     def __init__(self):
         self.enable = COOKIE_PERSIST
         self.cookie_dir = Path(COOKIE_DIR)
-        self.cookie_dir.mkdir(exist_ok=True)
+        self.db_path = self.cookie_dir / "cookies.db"
+        # 域名 -> Cookie列表；版本号用于判断上下文中的Cookie是否已是最新
+        self._index: Dict[str, List[dict]] = {}
+        self._version: Dict[str, int] = {}
+        self._dirty: Set[str] = set()
+        self._loaded: "weakref.WeakKeyDictionary[BrowserContext, Dict[str, int]]" = weakref.WeakKeyDictionary()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        if self.enable:
+            self.cookie_dir.mkdir(parents=True, exist_ok=True)
+            self._open_db()
+
+    def _open_db(self):
+        try:
+            self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (domain TEXT PRIMARY KEY, cookies TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+            for domain, raw in self._conn.execute("SELECT domain, cookies FROM sessions"):
+                self._index[domain] = json.loads(raw)
+            self._import_legacy()
+            logger.info(f"Cookie库加载完成，域名数：{len(self._index)}")
+        except Exception as e:
+            logger.error(f"打开Cookie库失败，禁用Cookie持久化：{str(e)}")
+            self.enable = False
+
+    def _import_legacy(self):
+        """一次性导入旧版 cookies/<domain>.json 文件"""
+        for path in self.cookie_dir.glob("*.json"):
+            domain = path.stem
+            if domain in self._index:
+                continue
+            try:
+                self._index[domain] = json.loads(path.read_text(encoding="utf-8"))
+                self._dirty.add(domain)
+            except Exception as e:
+                logger.warning(f"⚠️ 旧版Cookie文件 {path.name} 导入失败：{str(e)}")
 
     def _get_domain(self, url: str) -> str:
         """从URL提取根域名，作为Cookie存储标识"""
         parsed = urlparse(url)
         return parsed.netloc.replace(":", "_")
 
-    def _get_cookie_path(self, domain: str) -> Path:
-        return self.cookie_dir / f"{domain}.json"
+    @staticmethod
+    def _is_expired(cookie: dict, now: float) -> bool:
+        # expires为-1或缺失表示会话Cookie，不过期
+        expires = cookie.get("expires", -1)
+        return expires is not None and 0 < expires <= now
+
+    def get_cookies(self, url: str) -> List[dict]:
+        """查询域名下未过期的CF Cookie（纯内存操作）"""
+        now = time.time()
+        return [c for c in self._index.get(self._get_domain(url), []) if not self._is_expired(c, now)]
 
     async def load_cookies(self, context: BrowserContext, url: str) -> bool:
-        """加载对应域名的有效CF Cookie"""
+        """加载对应域名的有效CF Cookie（上下文中已是最新版本时跳过）"""
         if not self.enable:
             return False
         domain = self._get_domain(url)
-        path = self._get_cookie_path(domain)
-        if not path.exists():
-            logger.info(f"域名 {domain} 无已保存Cookie")
+        version = self._version.get(domain, 0)
+        loaded = self._loaded.setdefault(context, {})
+        if domain in loaded and loaded[domain] == version:
+            return True
+        cf_cookies = self.get_cookies(url)
+        if not cf_cookies:
+            logger.debug(f"域名 {domain} 无已保存Cookie")
             return False
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                cookies = json.load(f)
-            # 仅加载CF关键Cookie
-            cf_cookies = [c for c in cookies if c.get("name") in CF_COOKIE_KEYS]
             await context.add_cookies(cf_cookies)
+            loaded[domain] = version
             logger.info(f"成功加载 {len(cf_cookies)} 个CF Cookie，域名：{domain}")
             return True
         except Exception as e:
@@ -46,17 +96,73 @@ class CookieManager:
             return False
 
     async def save_cookies(self, context: BrowserContext, url: str):
-        """保存有效CF Cookie，自动过滤无效项"""
+        """保存有效CF Cookie，自动过滤无效/过期项（仅更新内存索引，由后台任务落盘）"""
         if not self.enable:
             return
         domain = self._get_domain(url)
-        path = self._get_cookie_path(domain)
         try:
-            all_cookies = await context.cookies()
+            all_cookies = await context.cookies(url)
+            now = time.time()
             # 只保留CF有效Cookie，剔除无用项
-            valid_cookies = [c for c in all_cookies if c.get("name") in CF_COOKIE_KEYS and c.get("value")]
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(valid_cookies, f, ensure_ascii=False, indent=2)
+            valid_cookies = [
+                c for c in all_cookies
+                if c.get("name") in CF_COOKIE_KEYS and c.get("value") and not self._is_expired(c, now)
+            ]
+            if not valid_cookies or valid_cookies == self._index.get(domain):
+                return
+            self._index[domain] = valid_cookies
+            self._version[domain] = self._version.get(domain, 0) + 1
+            # 保存方上下文已持有这批Cookie，无需重复加载
+            self._loaded.setdefault(context, {})[domain] = self._version[domain]
+            self._dirty.add(domain)
             logger.info(f"成功保存 {len(valid_cookies)} 个有效CF Cookie，域名：{domain}")
         except Exception as e:
             logger.error(f"保存Cookie失败：{str(e)}")
+
+    def start(self):
+        """启动后台落盘任务"""
+        if self.enable and self._flush_task is None:
+            self._stopping = asyncio.Event()
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        # 不直接cancel：避免落盘线程仍在写入时并发关闭连接
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=COOKIE_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                await self.flush()
+
+    def _write(self, rows: List[tuple]):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sessions(domain, cookies, updated) VALUES (?, ?, ?)", rows
+            )
+
+    async def flush(self):
+        """将有变更的域名批量写入Cookie库（线程中执行，不阻塞事件循环）"""
+        if not self.enable or not self._dirty:
+            return
+        now = time.time()
+        rows = []
+        for domain in self._dirty:
+            cookies = [c for c in self._index.get(domain, []) if not self._is_expired(c, now)]
+            rows.append((domain, json.dumps(cookies, ensure_ascii=False), now))
+        self._dirty.clear()
+        try:
+            await asyncio.to_thread(self._write, rows)
+            logger.debug(f"Cookie已落盘，域名数：{len(rows)}")
+        except Exception as e:
+            logger.error(f"Cookie落盘失败：{str(e)}")
+            self._dirty.update(row[0] for row in rows)
+
+    async def close(self):
+        """停止后台任务并最后落盘一次"""
+        if self._flush_task is not None:
+            self._stopping.set()
+            await self._flush_task
+            self._flush_task = None
+        await self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
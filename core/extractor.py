@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import urljoin
+from config import EXTRACT_RULES, EXTRACT_WORKERS, EXTRACT_MAX_PENDING
+from core.metrics import metrics, host_of
+import logging
+
+# lxml/cssselect为可选依赖，未安装时不启用结构化提取
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+try:
+    from lxml.cssselect import CSSSelector
+except ImportError:
+    CSSSelector = None
+
+logger = logging.getLogger("cf_crawler.extractor")
+
+# 编译后的规则：字段名 -> (选择器, 属性名, 是否取全部, 是否转为绝对URL)
+_Compiled = Dict[str, Tuple[Any, Optional[str], bool, bool]]
+# worker进程内的已编译规则（进程初始化时编译一次）
+_COMPILED: Optional[_Compiled] = None
+
+def compile_rules(rules: Dict[str, dict]) -> _Compiled:
+    """编译提取规则：{"字段": {"css"|"xpath": 表达式, "attr": 属性名, "all": 是否取全部, "absolute": 是否转绝对URL}}"""
+    if lxml is None:
+        raise RuntimeError("结构化提取需要安装 lxml")
+    compiled: _Compiled = {}
+    for name, rule in rules.items():
+        if "xpath" in rule:
+            selector = etree.XPath(rule["xpath"])
+        elif "css" in rule:
+            if CSSSelector is None:
+                raise RuntimeError("CSS规则需要安装 cssselect")
+            selector = CSSSelector(rule["css"])
+        else:
+            raise ValueError(f"提取规则 {name} 需要 css 或 xpath 字段")
+        compiled[name] = (selector, rule.get("attr"), bool(rule.get("all")), bool(rule.get("absolute")))
+    return compiled
+
+def _init_worker(rules: Dict[str, dict]):
+    global _COMPILED
+    _COMPILED = compile_rules(rules)
+
+def _value(node: Any, attr: Optional[str]) -> Optional[str]:
+    if isinstance(node, str):
+        # XPath 返回的文本/属性值
+        return str(node).strip()
+    if attr:
+        return node.get(attr)
+    return node.text_content().strip()
+
+def _extract(data: bytes, url: str) -> Dict[str, Any]:
+    """worker进程中执行：解析UTF-8源码并按规则提取字段"""
+    parser = lxml.html.HTMLParser(encoding="utf-8")
+    doc = lxml.html.document_fromstring(data, parser=parser)
+    out: Dict[str, Any] = {}
+    for name, (selector, attr, take_all, absolute) in _COMPILED.items():
+        found = selector(doc)
+        if not isinstance(found, list):
+            # XPath 可能返回数值/布尔/字符串等标量
+            out[name] = found
+            continue
+        values: List[Optional[str]] = []
+        for node in found:
+            value = _value(node, attr)
+            if value and absolute:
+                value = urljoin(url, value)
+            values.append(value)
+            if not take_all:
+                break
+        out[name] = values if take_all else (values[0] if values else None)
+    return out
+
+class ExtractionStage:
+    """结构化提取阶段：位于爬取与写入之间，源码交给进程池解析，不占用驱动浏览器的事件循环
+
+    最多 max_pending 页在提取中，已满时 put 等待（背压），浏览器侧不会跑在提取前面堆积内存；
+    提取完成后结果记录的 data 字段写入结构化数据，再交给写后队列
+    """
+    def __init__(self, writer, rules: Dict[str, dict] = EXTRACT_RULES, workers: int = EXTRACT_WORKERS,
+                 max_pending: int = EXTRACT_MAX_PENDING):
+        self.writer = writer
+        self.rules = rules
+        self.workers = max(1, workers)
+        self._sem = asyncio.Semaphore(max(1, max_pending))
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.extracted = 0
+        self.failed = 0
+
+    @classmethod
+    def wrap(cls, writer, rules: Optional[Dict[str, dict]] = None):
+        """配置了提取规则且依赖可用时返回提取阶段，否则原样返回writer"""
+        rules = EXTRACT_RULES if rules is None else rules
+        if not rules:
+            return writer
+        try:
+            compile_rules(rules)
+        except Exception as e:
+            logger.warning(f"⚠️ 结构化提取未启用：{str(e)}")
+            return writer
+        stage = cls(writer, rules)
+        stage.start()
+        logger.info(f"结构化提取：{len(rules)} 个字段，{stage.workers} 个进程")
+        return stage
+
+    def start(self):
+        if self._pool is None:
+            # spawn：浏览器驱动线程已运行，fork子进程不安全
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker, initargs=(self.rules,)
+            )
+
+    async def put(self, record: dict):
+        """提交一条结果：有源码的成功记录先提取再写入，其余直接交给写后队列"""
+        if not record.get("ok") or record.get("body") is None:
+            await self.writer.put(record)
+            return
+        await self._sem.acquire()
+        task = asyncio.create_task(self._run(record))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, record: dict):
+        try:
+            loop = asyncio.get_running_loop()
+            body = record["body"]
+            data = await asyncio.to_thread(lambda: b"".join(body.iter_bytes()))
+            with metrics.timer("extract", host_of(record["url"])):
+                record["data"] = await loop.run_in_executor(self._pool, _extract, data, record["url"])
+            self.extracted += 1
+        except Exception as e:
+            self.failed += 1
+            record["data"] = None
+            record["extract_error"] = str(e) or e.__class__.__name__
+            logger.warning(f"⚠️ [{record['url']}] 结构化提取失败：{record['extract_error']}")
+        try:
+            await self.writer.put(record)
+        finally:
+            self._sem.release()
+
+    async def close(self):
+        """等待提取中的记录写入队列后关闭进程池（writer由调用方关闭）"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._pool is not None:
+            await asyncio.to_thread(self._pool.shutdown)
+            self._pool = None
+        logger.info(f"✅ 结构化提取完成：成功 {self.extracted} 页，失败 {self.failed} 页")
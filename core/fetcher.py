@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+import codecs
+import random
+import asyncio
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+from urllib.parse import urljoin
+import aiohttp
+from config import (
+    UA_POOL, CF_DETECT_SLICE, CONTENT_MAX_CHARS, CRAWL_MAX_LINKS_PER_PAGE,
+    TIER_HTTP_TIMEOUT, TIER_POOL_SIZE, TIER_POOL_PER_HOST, TIER_KEEPALIVE,
+    TIER_MIN_TEXT, TIER_RECHECK, TIER_STATE_PATH
+)
+from core.browser import EXTRA_HEADERS
+from core.cf_handler import CFRuleMatcher, CFStatus
+from core.content import ContentBody
+from core.metrics import metrics, host_of
+from core.revisit import Validator
+import logging
+
+logger = logging.getLogger("cf_crawler.fetcher")
+
+HTTP = "http"
+BROWSER = "browser"
+
+# 与浏览器导航一致的请求头（UA按请求随机）；压缩格式与连接保活由aiohttp按自身能力设置（未安装Brotli时不能声明br）
+_HEADERS: Dict[str, str] = {k: v for k, v in EXTRA_HEADERS.items() if k not in ("Accept-Encoding", "Connection")}
+# aiohttp只支持HTTP(S)代理，socks代理的请求直接交给浏览器
+_PROXY_SCHEMES = ("http://", "https://")
+# CF拦截页常见的状态码（命中时无论内容如何都交给浏览器）
+_CHALLENGE_CODES = {403, 429, 503}
+# HTTP层可直接作为结果的内容类型（其余如PDF/图片交给浏览器按原流程处理）
+_TEXT_TYPES = ("html", "xml", "text/", "json")
+# 读取响应体的块大小（字节）
+_CHUNK_BYTES = 64 * 1024
+
+class _PageScanner(HTMLParser):
+    """流式扫描HTML：标题、可见文本量、脚本数、链接（与浏览器侧一样只保留http(s)并去掉片段）"""
+    _SKIP = {"script", "style", "noscript", "template"}
+
+    def __init__(self, base_url: str, link_limit: int):
+        super().__init__()
+        self.base_url = base_url
+        self.link_limit = link_limit
+        self.links: Dict[str, None] = {}
+        self.title = ""
+        self.text = 0
+        self.scripts = 0
+        self._in_title = False
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a" and len(self.links) < self.link_limit:
+            href = dict(attrs).get("href")
+            if href:
+                url = urljoin(self.base_url, href.strip()).split("#")[0]
+                if url.startswith(("http:", "https:")):
+                    self.links[url] = None
+        elif tag == "title":
+            self._in_title = True
+        elif tag in self._SKIP:
+            self._skip += 1
+            self.scripts += tag == "script"
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        elif tag in self._SKIP and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif not self._skip:
+            self.text += len(data.strip())
+
+    def satisfied(self, collect_links: bool) -> bool:
+        """可见文本已足够且链接已收满时，剩余部分无需再解析"""
+        return self.text >= TIER_MIN_TEXT and (not collect_links or len(self.links) >= self.link_limit)
+
+class _HostTier:
+    def __init__(self, tier: str = HTTP, since: float = 0.0):
+        self.tier = tier
+        self.since = since
+
+class TieredFetcher:
+    """分级抓取：对未知需要浏览器的host先发轻量HTTP请求（连接池保活复用），
+    响应经与CFHandler相同的规则检测，命中CF特征或页面依赖JS渲染时才升级到浏览器；按host记住哪一级可用
+    """
+    def __init__(self, proxy_pool=None, state_path: str = TIER_STATE_PATH):
+        self.proxy_pool = proxy_pool
+        self.state_path = Path(state_path)
+        self.matcher = CFRuleMatcher()
+        self._hosts: Dict[str, _HostTier] = {}
+        # host -> 沿用的代理（代理池每次选取都会记日志，HTTP层请求频繁，按host选取一次）
+        self._proxies: Dict[str, Optional[str]] = {}
+        self._unsupported: Set[str] = set()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.served = 0
+        self.escalated = 0
+        self._load()
+        if proxy_pool is not None and proxy_pool.enable and proxy_pool.proxies and \
+                not any(p.lower().startswith(_PROXY_SCHEMES) for p in proxy_pool.proxies):
+            logger.warning("⚠️ 代理池中没有HTTP(S)代理（aiohttp不支持socks），分级抓取的HTTP层不可用，全部使用浏览器")
+
+    def _load(self):
+        try:
+            data = json.loads(self.state_path.read_text(encoding="utf-8"))
+            self._hosts = {host: _HostTier(v["tier"], v.get("since", 0.0)) for host, v in data.items()}
+            logger.info(f"已加载 {len(self._hosts)} 个host的抓取方式记录")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"⚠️ 抓取方式记录读取失败，重新探测：{str(e)}")
+
+    def _session_get(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=TIER_POOL_SIZE, limit_per_host=TIER_POOL_PER_HOST,
+                keepalive_timeout=TIER_KEEPALIVE, ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=TIER_HTTP_TIMEOUT),
+                headers=_HEADERS, cookie_jar=aiohttp.DummyCookieJar()
+            )
+        return self._session
+
+    def tier_of(self, host: str) -> str:
+        """host当前应使用的抓取方式：需要浏览器的记录超过 TIER_RECHECK 后重新尝试HTTP"""
+        state = self._hosts.get(host)
+        if state is None or state.tier == HTTP:
+            return HTTP
+        return HTTP if time.time() - state.since > TIER_RECHECK else BROWSER
+
+    def _remember(self, host: str, tier: str, reason: str = ""):
+        state = self._hosts.get(host)
+        if state is None or state.tier != tier:
+            logger.info(f"[{host}] 抓取方式：{tier}" + (f"（{reason}）" if reason else ""))
+            self._hosts[host] = _HostTier(tier, time.time())
+        elif tier == BROWSER:
+            state.since = time.time()
+
+    async def _proxy_for(self, host: str) -> Optional[str]:
+        """host沿用的代理：首次请求时从代理池选取，请求出错后重新选取"""
+        if host not in self._proxies:
+            self._proxies[host] = await self.proxy_pool.get_valid_proxy() if self.proxy_pool is not None else None
+        return self._proxies[host]
+
+    def _escalate(self, host: str, reason: str, remember: bool):
+        self.escalated += 1
+        metrics.inc("tier_escalate", host, reason)
+        if remember:
+            self._remember(host, BROWSER, reason)
+        else:
+            logger.debug(f"[{host}] HTTP抓取未成功（{reason}），本次使用浏览器")
+
+    async def fetch(self, url: str, collect_links: bool = False,
+                    validator: Optional[Validator] = None) -> Optional[dict]:
+        """尝试HTTP抓取：成功返回与浏览器爬取相同结构的结果（含 headers 供增量记录），需要浏览器时返回None"""
+        host = host_of(url)
+        if self.tier_of(host) != HTTP:
+            return None
+        headers = {"User-Agent": random.choice(UA_POOL)} if UA_POOL else {}
+        if validator is not None:
+            headers.update(validator.headers())
+        proxy = await self._proxy_for(host)
+        if proxy is not None and not proxy.lower().startswith(_PROXY_SCHEMES):
+            if proxy not in self._unsupported:
+                self._unsupported.add(proxy)
+                logger.warning(f"⚠️ HTTP层不支持代理 {proxy}（aiohttp只支持HTTP(S)代理），使用该代理的请求交给浏览器")
+            self._escalate(host, "proxy_scheme", remember=False)
+            return None
+        body: Optional[ContentBody] = None
+        try:
+            with metrics.timer("http_fetch", host) as t:
+                async with self._session_get().get(url, headers=headers, proxy=proxy) as resp:
+                    if resp.status == 304:
+                        t.outcome = "not_modified"
+                        result = self._result(resp, None, [])
+                    elif resp.status in _CHALLENGE_CODES:
+                        t.outcome = "challenge"
+                        cf = "cloudflare" in resp.headers.get("server", "").lower() or "cf-ray" in resp.headers
+                        self._escalate(host, f"http_{resp.status}", remember=cf)
+                        return None
+                    elif not any(k in resp.headers.get("content-type", "text/html").lower() for k in _TEXT_TYPES):
+                        t.outcome = "binary"
+                        self._escalate(host, "content_type", remember=False)
+                        return None
+                    else:
+                        body, scanner, status = await self._read(resp, collect_links)
+                        if status != CFStatus.NORMAL:
+                            t.outcome = "challenge"
+                            self._escalate(host, status.value, remember=True)
+                            body.close()
+                            return None
+                        if not body.size:
+                            t.outcome = "empty"
+                            self._escalate(host, "empty", remember=False)
+                            body.close()
+                            return None
+                        if scanner.scripts and scanner.text < TIER_MIN_TEXT:
+                            t.outcome = "needs_js"
+                            self._escalate(host, "needs_js", remember=True)
+                            body.close()
+                            return None
+                        t.outcome = "ok"
+                        result = self._result(resp, body, list(scanner.links))
+        except asyncio.CancelledError:
+            if body is not None:
+                body.close()
+            raise
+        except Exception as e:
+            # 网络错误不代表host需要浏览器，本次升级但不记入；代理可能已失效，下次重新选取
+            if body is not None:
+                body.close()
+            self._proxies.pop(host, None)
+            self._escalate(host, "error", remember=False)
+            logger.debug(f"[{url}] HTTP抓取失败：{str(e) or e.__class__.__name__}")
+            return None
+        result["timings"]["http"] = round(t.elapsed, 3)
+        self._remember(host, HTTP)
+        self.served += 1
+        return result
+
+    async def _read(self, resp: aiohttp.ClientResponse, collect_links: bool):
+        """流式读取并解码响应体：逐块写入ContentBody，同时扫描页面结构；读满检测片段后先做一次CF规则匹配"""
+        try:
+            decoder = codecs.getincrementaldecoder(resp.charset or "utf-8")(errors="replace")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        scanner = _PageScanner(str(resp.url), CRAWL_MAX_LINKS_PER_PAGE if collect_links else 0)
+        body = ContentBody()
+        head = ""
+        chars = 0
+        status: Optional[CFStatus] = None
+        scanning = True
+        try:
+            async for chunk in resp.content.iter_chunked(_CHUNK_BYTES):
+                text = decoder.decode(chunk)
+                if CONTENT_MAX_CHARS and chars + len(text) > CONTENT_MAX_CHARS:
+                    text = text[:CONTENT_MAX_CHARS - chars]
+                    body.truncated = True
+                chars += len(text)
+                body.append(text)
+                if scanning:
+                    scanner.feed(text)
+                    scanning = not scanner.satisfied(collect_links)
+                if status is None:
+                    head += text[:CF_DETECT_SLICE - len(head)]
+                    if len(head) >= CF_DETECT_SLICE:
+                        status = self.matcher.match(head, scanner.title.strip())
+                        if status != CFStatus.NORMAL:
+                            # 拦截页无需读完
+                            break
+                if body.truncated:
+                    logger.warning(f"⚠️ 页面源码超过上限 {CONTENT_MAX_CHARS} 字符，已截断")
+                    break
+            else:
+                tail = decoder.decode(b"", final=True)
+                body.append(tail)
+                if scanning:
+                    scanner.feed(tail)
+            if status is None or status == CFStatus.NORMAL:
+                # 短页面未读满检测片段；标题也可能在检测片段之后才结束，按完整标题再匹配一次
+                status = self.matcher.match(head, scanner.title.strip())
+            scanner.close()
+        except Exception:
+            body.close()
+            raise
+        body.finish()
+        return body, scanner, status
+
+    def _result(self, resp: aiohttp.ClientResponse, body: Optional[ContentBody], links: List[str]) -> dict:
+        return {
+            "body": body,
+            "http_status": resp.status,
+            "cf_status": CFStatus.NORMAL.value,
+            "timings": {},
+            "blocked": None,
+            "links": links,
+            "unchanged": body is None,
+            "profile": None,
+            "tier": HTTP,
+            "headers": {k.lower(): v for k, v in resp.headers.items() if k.lower() in ("etag", "last-modified")},
+        }
+
+    def _save(self):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        data = {host: {"tier": s.tier, "since": s.since} for host, s in self._hosts.items()}
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(self.state_path)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        try:
+            await asyncio.to_thread(self._save)
+        except Exception as e:
+            logger.warning(f"⚠️ 抓取方式记录保存失败：{str(e)}")
+        browser_hosts = sum(1 for s in self._hosts.values() if s.tier == BROWSER)
+        logger.info(f"✅ 分级抓取：HTTP直接完成 {self.served} 页，升级浏览器 {self.escalated} 次，"
+                    f"需要浏览器的host {browser_hosts}/{len(self._hosts)} 个")
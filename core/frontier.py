@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+import time
+import heapq
+import asyncio
+import sqlite3
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+from config import FRONTIER_PATH, FRONTIER_CLAIM_SIZE, FRONTIER_FLUSH_SIZE, FRONTIER_FLUSH_INTERVAL, FRONTIER_MAX_ATTEMPTS
+import logging
+
+logger = logging.getLogger("cf_crawler.frontier")
+
+# 任务状态
+PENDING = "pending"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+
+# 不再重新入队的失败类型：人工验证被跳过/挂起数已满（再次领取只会重复挂起同一验证页）
+_NO_REQUEUE = {"verify_aborted"}
+# 延后派发的失败类型：host熔断时URL未被实际爬取，不计入尝试次数，冷却结束后再派发
+_DEFER = "circuit_open"
+
+def _pop_due(deferred: List[Tuple[float, str]]) -> Optional[str]:
+    """取出一个已到期的延后URL"""
+    if deferred and deferred[0][0] <= time.monotonic():
+        return heapq.heappop(deferred)[1]
+    return None
+
+async def _wait_changed(changed: asyncio.Event, deferred: List[Tuple[float, str]]):
+    """等待在途任务完成；有延后的URL时最多等到最早的一个到期"""
+    delay = deferred[0][0] - time.monotonic() if deferred else None
+    try:
+        await asyncio.wait_for(changed.wait(), timeout=delay)
+    except asyncio.TimeoutError:
+        pass
+
+class MemoryFrontier:
+    """内存任务队列：与Frontier接口一致，不持久化（单次运行/基准测试使用）
+
+    初始URL去重；递归发现的链接由调用方（LinkScope）去重后再加入
+    """
+    def __init__(self, urls: Iterable[str] = ()):
+        self._queue: Deque[Tuple[str, int]] = deque((url, 0) for url in dict.fromkeys(urls))
+        self._depth: Dict[str, int] = {}
+        self._deferred: List[Tuple[float, str]] = []
+        self._changed = asyncio.Event()
+
+    async def add(self, urls: Iterable[str], depth: int = 0) -> int:
+        before = len(self._queue)
+        self._queue.extend((url, depth) for url in urls)
+        if len(self._queue) > before:
+            self._changed.set()
+        return len(self._queue) - before
+
+    def depth_of(self, url: str) -> int:
+        return self._depth.get(url, 0)
+
+    @property
+    def active(self) -> int:
+        """已取出尚未complete的URL数（含延后派发的）"""
+        return len(self._depth)
+
+    async def poll(self) -> Optional[str]:
+        """不等待：有到期的延后URL或队列中有URL时返回，否则返回None"""
+        url = _pop_due(self._deferred)
+        if url is not None:
+            return url
+        if not self._queue:
+            return None
+        url, depth = self._queue.popleft()
+        self._depth[url] = depth
+        return url
+
+    async def next(self) -> Optional[str]:
+        """取下一个URL；队列空且无在途任务时返回None（在途任务可能追加新URL）"""
+        while True:
+            # 先清除再领取，领取期间完成的任务不会漏掉唤醒
+            self._changed.clear()
+            url = await self.poll()
+            if url is not None:
+                return url
+            if not self._depth:
+                return None
+            await _wait_changed(self._changed, self._deferred)
+
+    async def complete(self, url: str, ok: bool, error: Optional[str] = None, kind: Optional[str] = None,
+                       retry_after: float = 0.0):
+        if not ok and kind == _DEFER:
+            heapq.heappush(self._deferred, (time.monotonic() + max(0.0, retry_after), url))
+        else:
+            self._depth.pop(url, None)
+        self._changed.set()
+
+    async def close(self):
+        pass
+
+class Frontier:
+    """SQLite持久化任务队列：每个URL记录状态/重试次数/最后错误，事务领取，批量写回
+
+    中断后重新打开时，上次在途（in_flight）的任务恢复为pending，从中断处继续
+    """
+    def __init__(self, path: str = FRONTIER_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                url TEXT PRIMARY KEY,
+                state TEXT NOT NULL DEFAULT 'pending',
+                retries INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated REAL NOT NULL,
+                depth INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs(state);
+        """)
+        # 旧版任务队列无depth列
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "depth" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN depth INTEGER NOT NULL DEFAULT 0")
+        with self._conn:
+            recovered = self._conn.execute(
+                "UPDATE jobs SET state = ? WHERE state = ?", (PENDING, IN_FLIGHT)
+            ).rowcount
+        if recovered:
+            logger.info(f"♻️ 恢复上次中断的在途任务 {recovered} 个")
+        self._lock = asyncio.Lock()
+        self._claimed: Deque[str] = deque()
+        # 已领取URL的 (重试次数, 深度)
+        self._meta: Dict[str, Tuple[int, int]] = {}
+        self._in_flight = 0
+        # 延后派发的URL (可派发时间, url)，仍计入在途数，数据库中保持in_flight
+        self._deferred: List[Tuple[float, str]] = []
+        self._changed = asyncio.Event()
+        # 待批量写回的操作
+        self._adds: List[Tuple[str, float, int]] = []
+        self._results: List[Tuple[str, str, Optional[str], int]] = []
+        self._last_flush = time.monotonic()
+
+    def stats(self) -> dict:
+        rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return {state: count for state, count in rows}
+
+    def seeds(self) -> List[str]:
+        """初始URL（深度0），--resume 时用于还原递归爬取范围"""
+        return [row[0] for row in self._conn.execute("SELECT url FROM jobs WHERE depth = 0")]
+
+    def depth_of(self, url: str) -> int:
+        return self._meta.get(url, (0, 0))[1]
+
+    def reset(self):
+        """清空任务队列（重新开始一次全新爬取）"""
+        with self._conn:
+            self._conn.execute("DELETE FROM jobs")
+
+    async def add(self, urls: Iterable[str], depth: int = 0) -> int:
+        """追加URL（已存在的忽略），随下一次批量写回落盘"""
+        now = time.time()
+        before = len(self._adds)
+        self._adds.extend((url, now, depth) for url in urls)
+        if len(self._adds) >= FRONTIER_FLUSH_SIZE:
+            await self.flush()
+        return len(self._adds) - before
+
+    def _claim(self, limit: int) -> List[Tuple[str, int, int]]:
+        with self._conn:
+            rows = self._conn.execute(
+                "SELECT url, retries, depth FROM jobs WHERE state = ? ORDER BY rowid LIMIT ?", (PENDING, limit)
+            ).fetchall()
+            if rows:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE jobs SET state = ?, updated = ? WHERE url = ?",
+                    [(IN_FLIGHT, now, url) for url, _, _ in rows]
+                )
+        return rows
+
+    @property
+    def active(self) -> int:
+        """已取出尚未complete的URL数（含延后派发的）"""
+        return self._in_flight
+
+    async def poll(self) -> Optional[str]:
+        """不等待在途任务：有到期的延后URL、本地缓存或数据库中有待爬URL时领取一个，否则返回None"""
+        url = _pop_due(self._deferred)
+        if url is not None:
+            # 延后的URL一直计入在途数
+            return url
+        if not self._claimed:
+            # 领取前先写回，确保新增/重新入队的URL可见
+            await self.flush()
+            async with self._lock:
+                rows = await asyncio.to_thread(self._claim, FRONTIER_CLAIM_SIZE)
+            for url, retries, depth in rows:
+                self._claimed.append(url)
+                self._meta[url] = (retries, depth)
+        if not self._claimed:
+            return None
+        self._in_flight += 1
+        return self._claimed.popleft()
+
+    async def next(self) -> Optional[str]:
+        """领取下一个URL（按批事务领取后本地缓存）；无待爬且无在途任务时返回None"""
+        while True:
+            # 先清除再领取，领取期间完成的任务不会漏掉唤醒
+            self._changed.clear()
+            url = await self.poll()
+            if url is not None:
+                return url
+            if self._in_flight == 0:
+                return None
+            await _wait_changed(self._changed, self._deferred)
+
+    async def complete(self, url: str, ok: bool, error: Optional[str] = None, kind: Optional[str] = None,
+                       retry_after: float = 0.0):
+        """记录结果：失败未超过最大次数时重新入队，否则标记failed；kind 为失败类型，不可重试的类型直接标记failed
+
+        host熔断（circuit_open）的URL不计入尝试次数，retry_after 秒后重新派发
+        """
+        if not ok and kind == _DEFER:
+            heapq.heappush(self._deferred, (time.monotonic() + max(0.0, retry_after), url))
+            self._changed.set()
+            return
+        retries = self._meta.pop(url, (0, 0))[0]
+        if ok:
+            state = DONE
+        else:
+            retries += 1
+            state = PENDING if retries < FRONTIER_MAX_ATTEMPTS and kind not in _NO_REQUEUE else FAILED
+        self._results.append((url, state, error, retries))
+        self._in_flight -= 1
+        self._changed.set()
+        if len(self._results) >= FRONTIER_FLUSH_SIZE or time.monotonic() - self._last_flush >= FRONTIER_FLUSH_INTERVAL:
+            await self.flush()
+
+    def _write(self, adds: List[Tuple[str, float, int]], results: List[Tuple[str, str, Optional[str], int]]):
+        now = time.time()
+        with self._conn:
+            if adds:
+                self._conn.executemany("INSERT OR IGNORE INTO jobs(url, updated, depth) VALUES (?, ?, ?)", adds)
+            if results:
+                self._conn.executemany(
+                    "UPDATE jobs SET state = ?, last_error = ?, retries = ?, updated = ? WHERE url = ?",
+                    [(state, error, retries, now, url) for url, state, error, retries in results]
+                )
+
+    async def flush(self):
+        """批量写回新增URL与爬取结果（单个事务，线程中执行）"""
+        if not self._adds and not self._results:
+            return
+        adds, self._adds = self._adds, []
+        results, self._results = self._results, []
+        async with self._lock:
+            await asyncio.to_thread(self._write, adds, results)
+        self._last_flush = time.monotonic()
+
+    async def close(self):
+        """写回剩余结果；本地已领取未开始与延后派发的URL退回pending"""
+        pending = list(self._claimed) + [url for _, url in self._deferred]
+        if pending:
+            self._results.extend((url, PENDING, None, self._meta.pop(url, (0, 0))[0]) for url in pending)
+            self._claimed.clear()
+            self._deferred.clear()
+        await self.flush()
+        self._conn.close()
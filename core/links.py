@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+import math
+import hashlib
+from typing import Iterable, List, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from playwright.async_api import Page
+from config import CRAWL_MAX_DEPTH, CRAWL_SAME_SITE, CRAWL_MAX_LINKS_PER_PAGE, SEEN_CAPACITY, SEEN_ERROR_RATE
+import logging
+
+logger = logging.getLogger("cf_crawler.links")
+
+# 页面内一次性收集链接：a.href 已由浏览器解析为绝对地址，只保留http(s)并去掉片段
+_LINKS_JS = """
+(limit) => {
+    const out = new Set();
+    for (const a of document.querySelectorAll("a[href]")) {
+        const href = a.href;
+        if (!href || !(href.startsWith("http:") || href.startsWith("https:"))) continue;
+        out.add(href.split("#")[0]);
+        if (out.size >= limit) break;
+    }
+    return [...out];
+}
+"""
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def normalize_url(url: str) -> Optional[str]:
+    """URL规范化：scheme/host小写、去默认端口、去片段、查询参数排序；非http(s)或无法解析返回None"""
+    try:
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or "").lower()
+        port = parts.port
+    except ValueError:
+        return None
+    if scheme not in _DEFAULT_PORTS or not host:
+        return None
+    netloc = host if port in (None, _DEFAULT_PORTS[scheme]) else f"{host}:{port}"
+    if parts.username or parts.password:
+        netloc = f"{parts.netloc.rsplit('@', 1)[0]}@{netloc}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
+
+def site_of(host: str) -> str:
+    """站点标识：去掉开头的www.，子域名视为同站"""
+    host = host.lower()
+    return host[4:] if host.startswith("www.") else host
+
+async def extract_links(page: Page, limit: int = CRAWL_MAX_LINKS_PER_PAGE) -> List[str]:
+    """单次evaluate提取页面链接（未规范化）"""
+    try:
+        return await page.evaluate(_LINKS_JS, limit)
+    except Exception as e:
+        logger.warning(f"⚠️ 链接提取失败：{str(e)}")
+        return []
+
+class BloomFilter:
+    """布隆过滤器：按容量/误判率计算位数组大小，双重哈希生成k个位置
+
+    1000万URL、万分之一误判率约占24MB，不保存URL字符串
+    """
+    def __init__(self, capacity: int = SEEN_CAPACITY, error_rate: float = SEEN_ERROR_RATE):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> bool:
+        """加入集合，返回此前是否（可能）已存在"""
+        existed = True
+        for pos in self._positions(item):
+            byte, bit = divmod(pos, 8)
+            if not self._bits[byte] & (1 << bit):
+                existed = False
+                self._bits[byte] |= 1 << bit
+        if not existed:
+            self.count += 1
+        return existed
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos // 8] & (1 << (pos % 8)) for pos in self._positions(item))
+
+class LinkScope:
+    """递归爬取范围：深度限制 + 同站过滤 + 布隆过滤器去重"""
+    def __init__(self, seeds: Iterable[str], max_depth: int = CRAWL_MAX_DEPTH, same_site: str = CRAWL_SAME_SITE):
+        self.max_depth = max_depth
+        self.same_site = same_site
+        self.seen = BloomFilter()
+        self._sites = set()
+        for url in seeds:
+            url = normalize_url(url)
+            if url is None:
+                continue
+            self.seen.add(url)
+            host = urlsplit(url).hostname
+            self._sites.add(host if same_site == "host" else site_of(host))
+
+    def in_scope(self, url: str) -> bool:
+        host = urlsplit(url).hostname or ""
+        if self.same_site == "host":
+            return host in self._sites
+        if self.same_site == "domain":
+            site = site_of(host)
+            return any(site == s or site.endswith("." + s) for s in self._sites)
+        return True
+
+    def admit(self, links: Iterable[str], depth: int) -> List[str]:
+        """筛选出需要入队的新链接（depth为链接所在页面的深度）"""
+        if depth >= self.max_depth:
+            return []
+        admitted = []
+        for link in links:
+            url = normalize_url(link)
+            if url is None or not self.in_scope(url):
+                continue
+            if not self.seen.add(url):
+                admitted.append(url)
+        return admitted
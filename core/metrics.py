@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+import asyncio
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from aiohttp import web
+from config import METRICS_ENABLE, METRICS_PORT, METRICS_JSON_PATH, METRICS_DUMP_INTERVAL
+import logging
+
+logger = logging.getLogger("cf_crawler.metrics")
+
+# 直方图桶上限（秒）
+BUCKETS: Tuple[float, ...] = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[str, str, str]  # (phase, host, outcome)
+
+def host_of(url: str) -> str:
+    """从URL提取host作为指标标签，无法解析时返回 -"""
+    try:
+        return urlparse(url).hostname or "-"
+    except Exception:
+        return "-"
+
+class _Timer:
+    """阶段计时器：with metrics.timer("navigate", host) as t: ...
+
+    正常结束记为 ok，抛异常记为 error，也可在块内手动设置 t.outcome
+    """
+    def __init__(self, registry: "MetricsRegistry", phase: str, host: str):
+        self.registry = registry
+        self.phase = phase
+        self.host = host
+        self.outcome: Optional[str] = None
+        self.elapsed = 0.0
+        self._start = 0.0
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.elapsed = time.monotonic() - self._start
+        outcome = self.outcome or ("error" if exc_type else "ok")
+        self.registry.observe(self.phase, self.elapsed, self.host, outcome)
+        return False
+
+class MetricsRegistry:
+    """进程内指标注册表：按 阶段/host/结果 记录耗时直方图与计数器"""
+    def __init__(self):
+        self.enable = METRICS_ENABLE
+        # key -> [各桶计数..., +Inf计数]，以及 sum
+        self._hist: Dict[LabelKey, List[int]] = {}
+        self._sum: Dict[LabelKey, float] = {}
+        self._counters: Dict[LabelKey, int] = {}
+        self.started = time.time()
+
+    def timer(self, phase: str, host: str = "-", outcome: Optional[str] = None) -> _Timer:
+        t = _Timer(self, phase, host)
+        t.outcome = outcome
+        return t
+
+    def observe(self, phase: str, seconds: float, host: str = "-", outcome: str = "ok"):
+        if not self.enable:
+            return
+        key = (phase, host, outcome)
+        counts = self._hist.get(key)
+        if counts is None:
+            counts = self._hist[key] = [0] * (len(BUCKETS) + 1)
+            self._sum[key] = 0.0
+        for i, le in enumerate(BUCKETS):
+            if seconds <= le:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+        self._sum[key] += seconds
+
+    def inc(self, name: str, host: str = "-", outcome: str = "ok", value: int = 1):
+        if not self.enable:
+            return
+        key = (name, host, outcome)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def snapshot(self) -> dict:
+        """导出为JSON友好的结构（桶计数为非累计值）"""
+        return {
+            "started": self.started,
+            "ts": time.time(),
+            "buckets": list(BUCKETS),
+            "histograms": [
+                {"phase": k[0], "host": k[1], "outcome": k[2], "counts": list(v),
+                 "count": sum(v), "sum": round(self._sum[k], 6)}
+                for k, v in self._hist.items()
+            ],
+            "counters": [
+                {"name": k[0], "host": k[1], "outcome": k[2], "value": v}
+                for k, v in self._counters.items()
+            ],
+        }
+
+    def merge(self, snapshot: dict):
+        """合并其他进程导出的快照（snapshot() 的输出，桶边界须一致）"""
+        if list(snapshot.get("buckets", [])) != list(BUCKETS):
+            raise ValueError("直方图桶边界不一致，无法合并")
+        for h in snapshot.get("histograms", []):
+            key = (h["phase"], h["host"], h["outcome"])
+            counts = self._hist.setdefault(key, [0] * (len(BUCKETS) + 1))
+            for i, c in enumerate(h["counts"]):
+                counts[i] += c
+            self._sum[key] = self._sum.get(key, 0.0) + h["sum"]
+        for c in snapshot.get("counters", []):
+            key = (c["name"], c["host"], c["outcome"])
+            self._counters[key] = self._counters.get(key, 0) + c["value"]
+        self.started = min(self.started, snapshot.get("started", self.started))
+
+    def render_prometheus(self) -> str:
+        """Prometheus文本格式"""
+        lines = [
+            "# HELP cf_crawler_phase_seconds Wall-clock time spent per crawl phase",
+            "# TYPE cf_crawler_phase_seconds histogram",
+        ]
+        for (phase, host, outcome), counts in self._hist.items():
+            base = _fmt_labels(phase=phase, host=host, outcome=outcome)
+            cumulative = 0
+            for le, c in zip(BUCKETS, counts):
+                cumulative += c
+                lines.append(f"cf_crawler_phase_seconds_bucket{{{base},le=\"{le}\"}} {cumulative}")
+            cumulative += counts[-1]
+            lines.append(f"cf_crawler_phase_seconds_bucket{{{base},le=\"+Inf\"}} {cumulative}")
+            lines.append(f"cf_crawler_phase_seconds_sum{{{base}}} {self._sum[(phase, host, outcome)]:.6f}")
+            lines.append(f"cf_crawler_phase_seconds_count{{{base}}} {cumulative}")
+        lines.append("# HELP cf_crawler_events_total Crawl event counters")
+        lines.append("# TYPE cf_crawler_events_total counter")
+        for (name, host, outcome), value in self._counters.items():
+            lines.append(f"cf_crawler_events_total{{{_fmt_labels(name=name, host=host, outcome=outcome)}}} {value}")
+        return "\n".join(lines) + "\n"
+
+def _fmt_labels(**labels: str) -> str:
+    return ",".join(
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels.items()
+    )
+
+# 全局注册表，各模块直接导入使用
+metrics = MetricsRegistry()
+
+class MetricsExporter:
+    """指标导出：本地HTTP端点（/metrics 为Prometheus文本，/metrics.json 为JSON）+ 定期JSON落盘"""
+    def __init__(self, registry: MetricsRegistry = metrics, port: int = METRICS_PORT,
+                 json_path: str = METRICS_JSON_PATH, interval: float = METRICS_DUMP_INTERVAL):
+        self.registry = registry
+        self.port = port
+        self.json_path = json_path
+        self.interval = interval
+        self._runner = None
+        self._dump_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if not self.registry.enable:
+            return
+        if self.port:
+            try:
+                app = web.Application()
+                app.router.add_get("/metrics", self._handle_prometheus)
+                app.router.add_get("/metrics.json", self._handle_json)
+                self._runner = web.AppRunner(app, access_log=None)
+                await self._runner.setup()
+                await web.TCPSite(self._runner, "127.0.0.1", self.port).start()
+                logger.info(f"📊 指标端点已启动：http://127.0.0.1:{self.port}/metrics")
+            except Exception as e:
+                logger.warning(f"⚠️ 指标端点启动失败：{str(e)}")
+                self._runner = None
+        if self.json_path and self.interval > 0:
+            self._dump_task = asyncio.create_task(self._dump_loop())
+
+    async def _handle_prometheus(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.registry.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+    async def _handle_json(self, request: web.Request) -> web.Response:
+        return web.json_response(self.registry.snapshot())
+
+    def _write_json(self, data: dict):
+        path = Path(self.json_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(path)
+
+    async def dump(self):
+        if self.json_path:
+            try:
+                await asyncio.to_thread(self._write_json, self.registry.snapshot())
+            except Exception as e:
+                logger.warning(f"⚠️ 指标落盘失败：{str(e)}")
+
+    async def _dump_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.dump()
+
+    async def close(self):
+        if self._dump_task is not None:
+            self._dump_task.cancel()
+            try:
+                await self._dump_task
+            except asyncio.CancelledError:
+                pass
+            self._dump_task = None
+        if self.registry.enable:
+            await self.dump()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+import asyncio
+import hashlib
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+from playwright.async_api import Page, Request, Response
+from config import (
+    PROFILE_DIR, PROFILE_PERCENTILE, PROFILE_MIN_SAMPLES, PROFILE_WINDOW,
+    PROFILE_MAX_ENTRIES, PROFILE_DISK_BUDGET_MB
+)
+from core.metrics import metrics, host_of
+import logging
+
+logger = logging.getLogger("cf_crawler.profiler")
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat().replace("+00:00", "Z")
+
+def _span(timing: dict, start: str, end: str) -> float:
+    """Playwright request.timing 中两个时间点的差（毫秒），缺失时为-1"""
+    a, b = timing.get(start, -1), timing.get(end, -1)
+    return round(b - a, 3) if a >= 0 and b >= 0 else -1
+
+class _Capture:
+    """单次页面租借期间的采集：CDP性能指标 + 逐请求网络记录（HAR格式，仅离群时落盘）"""
+    def __init__(self, page: Page):
+        self.page = page
+        self.started = time.time()
+        self.entries: Dict[Request, dict] = {}
+        self.dropped = 0
+        self.cdp = None
+        self.perf: Dict[str, float] = {}
+        self.summary: Optional[dict] = None
+
+    def on_request(self, request: Request):
+        if len(self.entries) >= PROFILE_MAX_ENTRIES:
+            self.dropped += 1
+            return
+        self.entries[request] = {
+            "ts": time.time(), "url": request.url, "method": request.method,
+            "type": request.resource_type, "status": 0, "size": -1, "mime": "",
+            "timing": None, "failure": None,
+        }
+
+    def on_response(self, response: Response):
+        entry = self.entries.get(response.request)
+        if entry is not None:
+            entry["status"] = response.status
+            entry["mime"] = response.headers.get("content-type", "")
+            length = response.headers.get("content-length")
+            entry["size"] = int(length) if length and length.isdigit() else -1
+
+    def on_finished(self, request: Request):
+        entry = self.entries.get(request)
+        if entry is not None:
+            entry["timing"] = request.timing
+
+    def on_failed(self, request: Request):
+        entry = self.entries.get(request)
+        if entry is not None:
+            entry["timing"] = request.timing
+            entry["failure"] = request.failure or "failed"
+
+    def listen(self, on: bool):
+        method = self.page.on if on else self.page.remove_listener
+        method("request", self.on_request)
+        method("response", self.on_response)
+        method("requestfinished", self.on_finished)
+        method("requestfailed", self.on_failed)
+
+    def network_summary(self) -> dict:
+        by_type: Dict[str, int] = {}
+        failed = 0
+        total_bytes = 0
+        durations: List[Tuple[float, str, str]] = []
+        for entry in self.entries.values():
+            by_type[entry["type"]] = by_type.get(entry["type"], 0) + 1
+            failed += entry["failure"] is not None
+            total_bytes += max(0, entry["size"])
+            timing = entry["timing"] or {}
+            duration = _span(timing, "requestStart", "responseEnd")
+            if duration >= 0:
+                durations.append((duration, entry["type"], entry["url"][:200]))
+        durations.sort(reverse=True)
+        return {
+            "requests": len(self.entries) + self.dropped,
+            "failed": failed,
+            "bytes": total_bytes,
+            "by_type": by_type,
+            "slowest": [{"ms": d, "type": t, "url": u} for d, t, u in durations[:5]],
+        }
+
+    def har(self, crawl: dict) -> dict:
+        entries = []
+        for entry in self.entries.values():
+            timing = entry["timing"] or {}
+            wait = _span(timing, "requestStart", "responseStart")
+            receive = _span(timing, "responseStart", "responseEnd")
+            total = _span(timing, "requestStart", "responseEnd")
+            entries.append({
+                "startedDateTime": _iso(entry["ts"]),
+                "time": max(0, total),
+                "request": {"method": entry["method"], "url": entry["url"], "httpVersion": "",
+                            "headers": [], "queryString": [], "cookies": [], "headersSize": -1, "bodySize": -1},
+                "response": {"status": entry["status"], "statusText": entry["failure"] or "", "httpVersion": "",
+                             "headers": [], "cookies": [], "redirectURL": "", "headersSize": -1,
+                             "bodySize": entry["size"], "content": {"size": entry["size"], "mimeType": entry["mime"]}},
+                "cache": {},
+                "timings": {
+                    "blocked": -1,
+                    "dns": _span(timing, "domainLookupStart", "domainLookupEnd"),
+                    "connect": _span(timing, "connectStart", "connectEnd"),
+                    "ssl": _span(timing, "secureConnectionStart", "connectEnd"),
+                    "send": 0,
+                    "wait": wait,
+                    "receive": receive,
+                },
+                "_resourceType": entry["type"],
+            })
+        return {"log": {
+            "version": "1.2",
+            "creator": {"name": "cf_crawler", "version": "1.0"},
+            "pages": [{"startedDateTime": _iso(self.started), "id": "page_1", "title": crawl.get("url", ""),
+                       "pageTimings": {}}],
+            "entries": entries,
+            "_crawl": crawl,
+            "_performance": self.perf,
+            "_network": self.summary,
+        }}
+
+class PageProfiler:
+    """可选的页面剖析：每次爬取采集CDP性能指标与网络摘要，
+    只有失败或耗时超过滚动分位数阈值的爬取才把完整请求记录（HAR）写入磁盘，总占用受预算限制
+    """
+    def __init__(self, out_dir: str = PROFILE_DIR, percentile: float = PROFILE_PERCENTILE,
+                 budget_mb: float = PROFILE_DISK_BUDGET_MB):
+        self.out_dir = Path(out_dir)
+        self.percentile = percentile
+        self.budget = int(budget_mb * 1024 * 1024)
+        self._captures: Dict[Page, _Capture] = {}
+        self._window: Deque[float] = deque(maxlen=PROFILE_WINDOW)
+        self._files: Optional[Deque[Tuple[Path, int]]] = None
+        self._disk_used = 0
+        self._lock = asyncio.Lock()
+        self.saved = 0
+
+    async def start(self, page: Page):
+        capture = _Capture(page)
+        self._captures[page] = capture
+        capture.listen(True)
+        try:
+            capture.cdp = await page.context.new_cdp_session(page)
+            await capture.cdp.send("Performance.enable")
+        except Exception as e:
+            # 非Chromium内核或会话创建失败时只保留网络记录
+            logger.debug(f"CDP性能指标不可用：{str(e)[:60]}")
+            capture.cdp = None
+
+    async def collect(self, page: Page) -> Optional[dict]:
+        """结束采集并返回摘要（性能指标 + 网络摘要），重复调用返回同一结果"""
+        capture = self._captures.get(page)
+        if capture is None:
+            return None
+        if capture.summary is None:
+            capture.listen(False)
+            if capture.cdp is not None:
+                try:
+                    result = await capture.cdp.send("Performance.getMetrics")
+                    capture.perf = {m["name"]: round(m["value"], 4) for m in result.get("metrics", [])}
+                except Exception as e:
+                    logger.debug(f"读取CDP性能指标失败：{str(e)[:60]}")
+            capture.summary = capture.network_summary()
+        return {"performance": capture.perf, "network": capture.summary}
+
+    def _threshold(self) -> Optional[float]:
+        if len(self._window) < PROFILE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._window)
+        return ordered[int((len(ordered) - 1) * self.percentile / 100)]
+
+    async def finish(self, page: Page, elapsed: float, error: Optional[BaseException]):
+        """租借结束：失败或耗时超过分位数阈值时保存HAR，随后释放CDP会话"""
+        capture = self._captures.get(page)
+        if capture is None:
+            return
+        try:
+            await self.collect(page)
+            threshold = self._threshold()
+            slow = threshold is not None and elapsed > threshold
+            if error is None:
+                self._window.append(elapsed)
+            if error is not None or slow:
+                crawl = {
+                    "url": page.url, "elapsed": round(elapsed, 3),
+                    "reason": "failed" if error is not None else f"slow>p{self.percentile:g}({threshold:.2f}s)",
+                    "error": str(error) if error is not None else None,
+                }
+                await self._save(capture.har(crawl), crawl)
+        except Exception as e:
+            logger.warning(f"⚠️ 剖析数据处理失败：{str(e)}")
+        finally:
+            self._captures.pop(page, None)
+            if capture.cdp is not None:
+                try:
+                    await capture.cdp.detach()
+                except Exception:
+                    pass
+
+    def _scan(self):
+        files = []
+        if self.out_dir.exists():
+            for path in self.out_dir.glob("*.har"):
+                stat = path.stat()
+                files.append((stat.st_mtime, path, stat.st_size))
+        files.sort()
+        self._files = deque((path, size) for _, path, size in files)
+        self._disk_used = sum(size for _, size in self._files)
+
+    def _write(self, har: dict, crawl: dict) -> Path:
+        if self._files is None:
+            self._scan()
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha1(crawl["url"].encode("utf-8", "ignore")).hexdigest()[:8]
+        path = self.out_dir / f"{time.strftime('%Y%m%d-%H%M%S')}-{self.saved:06d}-{host_of(crawl['url'])}-{digest}.har"
+        data = json.dumps(har, ensure_ascii=False).encode("utf-8")
+        path.write_bytes(data)
+        self._files.append((path, len(data)))
+        self._disk_used += len(data)
+        # 超出磁盘预算时从最旧的文件开始删除
+        while self._disk_used > self.budget and len(self._files) > 1:
+            old, size = self._files.popleft()
+            old.unlink(missing_ok=True)
+            self._disk_used -= size
+        return path
+
+    async def _save(self, har: dict, crawl: dict):
+        async with self._lock:
+            path = await asyncio.to_thread(self._write, har, crawl)
+        self.saved += 1
+        metrics.inc("profile_saved", host_of(crawl["url"]), "failed" if crawl["error"] else "slow")
+        logger.info(f"🔬 已保存剖析记录（{crawl['reason']}）：{path}")
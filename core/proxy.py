@@ -1,17 +1,71 @@
 # -*- coding: utf-8 -*-
+import time
 import aiohttp
 import random
-from typing import Optional, List
-from config import PROXY_ENABLE, PROXY_FILE, PROXY_CHECK_TIMEOUT, PROXY_MAX_FAIL, PROXY_TEST_URL
+import asyncio
+from typing import Dict, Optional, List
+from config import (
+    PROXY_ENABLE, PROXY_FILE, PROXY_CHECK_TIMEOUT, PROXY_MAX_FAIL, PROXY_TEST_URL,
+    PROXY_CHECK_CONCURRENCY, PROXY_RECHECK_INTERVAL, PROXY_SCORE_ALPHA
+)
 import logging
 
 logger = logging.getLogger("cf_crawler.proxy")
 
+class ProxyStat:
+    """单个代理的滚动健康度：延迟与成功率均为指数滑动平均"""
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.success = 1.0
+        self.fails = 0
+
+    def update(self, ok: bool, latency: float):
+        self.success = (1 - PROXY_SCORE_ALPHA) * self.success + PROXY_SCORE_ALPHA * (1.0 if ok else 0.0)
+        if ok:
+            self.fails = 0
+            self.latency = latency if self.latency is None else \
+                (1 - PROXY_SCORE_ALPHA) * self.latency + PROXY_SCORE_ALPHA * latency
+        else:
+            self.fails += 1
+
+    @property
+    def weight(self) -> float:
+        """选择权重：成功率越高、延迟越低越优先"""
+        return self.success / max(self.latency or PROXY_CHECK_TIMEOUT, 0.05)
+
+class _AliasTable:
+    """Walker别名表：按权重O(1)随机抽样，每轮检测后重建"""
+    def __init__(self, items: List[str], weights: List[float]):
+        n = len(items)
+        self.items = items
+        self.prob = [0.0] * n
+        self.alias = [0] * n
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        small = [i for i, w in enumerate(scaled) if w < 1.0]
+        large = [i for i, w in enumerate(scaled) if w >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def sample(self) -> str:
+        i = random.randrange(len(self.items))
+        return self.items[i] if random.random() < self.prob[i] else self.items[self.alias[i]]
+
 class ProxyPool:
     def __init__(self):
         self.enable = PROXY_ENABLE
         self.proxies: List[str] = []
-        self.proxy_failures: dict = {}
+        self.stats: Dict[str, ProxyStat] = {}
+        self._table: Optional[_AliasTable] = None
+        self._checked = False
+        self._check_lock = asyncio.Lock()
+        self._recheck_task: Optional[asyncio.Task] = None
         self._load_proxies()
 
     def _load_proxies(self):
@@ -22,38 +76,83 @@ class ProxyPool:
         try:
             with open(PROXY_FILE, "r", encoding="utf-8") as f:
                 raw = [line.strip() for line in f if line.strip() and not line.startswith("#")]
-            self.proxies = list(set(raw))
+            self.proxies = list(dict.fromkeys(raw))
+            self.stats = {p: ProxyStat() for p in self.proxies}
             logger.info(f"代理池加载完成，有效代理数：{len(self.proxies)}")
         except FileNotFoundError:
             logger.error(f"代理文件 {PROXY_FILE} 不存在，已禁用代理")
             self.enable = False
 
-    async def _check_proxy(self, proxy: str) -> bool:
-        """高速代理连通性检测"""
-        try:
-            timeout = aiohttp.ClientTimeout(total=PROXY_CHECK_TIMEOUT)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
+    async def _check_proxy(self, session: aiohttp.ClientSession, sem: asyncio.Semaphore, proxy: str):
+        """高速代理连通性检测，结果计入滚动评分"""
+        async with sem:
+            start = time.monotonic()
+            try:
                 async with session.get(PROXY_TEST_URL, proxy=proxy) as resp:
-                    return resp.status == 200
-        except Exception:
-            return False
+                    ok = resp.status == 200
+            except Exception:
+                ok = False
+            self.stats[proxy].update(ok, time.monotonic() - start)
 
-    async def get_valid_proxy(self) -> Optional[str]:
-        """获取可用代理，失败自动移除，秒级切换"""
+    async def check_all(self):
+        """并发检测全部代理（共享连接器，限制并发），剔除连续失败超限的代理并重建选择表"""
         if not self.enable or not self.proxies:
-            return None
+            return
+        async with self._check_lock:
+            start = time.monotonic()
+            timeout = aiohttp.ClientTimeout(total=PROXY_CHECK_TIMEOUT)
+            connector = aiohttp.TCPConnector(limit=PROXY_CHECK_CONCURRENCY)
+            sem = asyncio.Semaphore(PROXY_CHECK_CONCURRENCY)
+            async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+                await asyncio.gather(*(self._check_proxy(session, sem, p) for p in list(self.proxies)))
 
-        random.shuffle(self.proxies)
-        for proxy in self.proxies:
-            if await self._check_proxy(proxy):
-                self.proxy_failures[proxy] = 0
-                logger.info(f"选中有效代理：{proxy}")
-                return proxy
             # 累计失败次数，超阈值移除
-            self.proxy_failures[proxy] = self.proxy_failures.get(proxy, 0) + 1
-            if self.proxy_failures[proxy] >= PROXY_MAX_FAIL:
-                self.proxies.remove(proxy)
-                logger.warning(f"代理 {proxy} 失败次数超限，已移除，剩余代理：{len(self.proxies)}")
+            for proxy in list(self.proxies):
+                if self.stats[proxy].fails >= PROXY_MAX_FAIL:
+                    self.proxies.remove(proxy)
+                    del self.stats[proxy]
+                    logger.warning(f"代理 {proxy} 失败次数超限，已移除，剩余代理：{len(self.proxies)}")
+            self._rebuild()
+            self._checked = True
+            healthy = len(self._table.items) if self._table else 0
+            logger.info(f"代理检测完成：可用 {healthy}/{len(self.proxies)}，耗时 {time.monotonic() - start:.1f}s")
+
+    def _rebuild(self):
+        """仅最近一次检测成功的代理进入可用集合"""
+        healthy = [p for p in self.proxies if self.stats[p].fails == 0 and self.stats[p].latency is not None]
+        self._table = _AliasTable(healthy, [self.stats[p].weight for p in healthy]) if healthy else None
+
+    def start(self):
+        """启动后台定期复检"""
+        if self.enable and self.proxies and self._recheck_task is None:
+            self._recheck_task = asyncio.create_task(self._recheck_loop())
+
+    async def _recheck_loop(self):
+        while True:
+            await asyncio.sleep(PROXY_RECHECK_INTERVAL)
+            try:
+                await self.check_all()
+            except Exception as e:
+                logger.error(f"代理复检异常：{str(e)}")
 
-        logger.error("代理池已无可用代理")
-        return None
+    async def close(self):
+        if self._recheck_task is not None:
+            self._recheck_task.cancel()
+            try:
+                await self._recheck_task
+            except asyncio.CancelledError:
+                pass
+            self._recheck_task = None
+
+    async def get_valid_proxy(self) -> Optional[str]:
+        """获取可用代理：首次调用时并发检测，之后从可用集合按延迟加权O(1)抽取"""
+        if not self.enable or not self.proxies:
+            return None
+        if not self._checked:
+            await self.check_all()
+        if self._table is None:
+            logger.error("代理池已无可用代理")
+            return None
+        proxy = self._table.sample()
+        logger.info(f"选中有效代理：{proxy}")
+        return proxy
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+import time
+import random
+import asyncio
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from config import RETRY_POLICY, BREAKER_THRESHOLD, BREAKER_COOLDOWN
+from core.metrics import metrics
+import logging
+
+logger = logging.getLogger("cf_crawler.retry")
+
+class CrawlError(RuntimeError):
+    """可分类的爬取错误，kind 决定重试策略；http_status 为导航响应的状态码（失败记录据此让调度器识别限流）"""
+    kind = "other"
+
+    def __init__(self, message: str = "", http_status: Optional[int] = None):
+        super().__init__(message)
+        self.http_status = http_status
+
+class NavigationTimeout(CrawlError):
+    kind = "navigation_timeout"
+
+class BrowserCrash(CrawlError):
+    kind = "browser_crash"
+
+class BlockedError(CrawlError):
+    """IP封禁/未知CF状态"""
+    kind = "blocked"
+
+class ChallengeTimeout(CrawlError):
+    """5秒盾/Turnstile 在等待时间内未放行"""
+    kind = "challenge_timeout"
+
+class VerificationAborted(CrawlError):
+    """Turnstile人工验证被操作员跳过、待验证页面已达上限未能挂起，或单URL剩余时间内未完成"""
+    kind = "verify_aborted"
+
+class CircuitOpenError(CrawlError):
+    """host熔断中，未占用浏览器直接失败；retry_after 为距离熔断器可能放行的秒数"""
+    kind = "circuit_open"
+
+    def __init__(self, message: str = "", retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+# 当前URL总超时（BATCH_URL_TIMEOUT）的截止时间（time.monotonic()），由 crawl_record 设置；
+# 人工验证挂起据此计算还能等待多久，避免挂起中的页面被整体超时取消
+url_deadline: ContextVar[Optional[float]] = ContextVar("url_deadline", default=None)
+
+# 半开探测进行中时，其余请求多久后再询问熔断器（秒）
+_PROBE_RECHECK = 5.0
+
+# 页面/上下文/浏览器崩溃或被关闭时Playwright的报错特征
+_CRASH_MARKERS = (
+    "target closed", "has been closed", "page crashed", "browser closed",
+    "connection closed", "target crashed",
+)
+
+def classify(exc: BaseException) -> str:
+    """把异常归类为重试策略中的错误类型"""
+    if isinstance(exc, CrawlError):
+        return exc.kind
+    if isinstance(exc, (PlaywrightTimeoutError, asyncio.TimeoutError)):
+        return "navigation_timeout"
+    msg = str(exc).lower()
+    if any(marker in msg for marker in _CRASH_MARKERS):
+        return "browser_crash"
+    if "net::err_timed_out" in msg or "net::err_connection_timed_out" in msg:
+        return "navigation_timeout"
+    return "other"
+
+def retry_policy(kind: str) -> Tuple[int, float, float]:
+    """(最多尝试次数, 退避基数, 退避上限)，未配置的类型按 other 处理"""
+    return RETRY_POLICY.get(kind) or RETRY_POLICY["other"]
+
+def backoff_delay(kind: str, attempt: int) -> float:
+    """指数退避 + 全抖动：在 [0, min(上限, 基数*2^(n-1))] 内均匀取值，避免多个worker同时重试"""
+    _, base, cap = retry_policy(kind)
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+class _HostCircuit:
+    def __init__(self):
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+
+class CircuitBreaker:
+    """按host熔断：连续失败达到阈值后熔断一段时间，冷却后只放行一个探测请求，成功即恢复"""
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._hosts: Dict[str, _HostCircuit] = {}
+
+    def allow(self, host: str) -> bool:
+        circuit = self._hosts.get(host)
+        if circuit is None or self.threshold <= 0 or circuit.failures < self.threshold:
+            return True
+        if time.monotonic() < circuit.open_until or circuit.probing:
+            return False
+        # 半开：放行一个探测请求
+        circuit.probing = True
+        return True
+
+    def retry_after(self, host: str) -> float:
+        """被拒绝的请求多久后再尝试：冷却中为剩余冷却时间，探测进行中为固定的复查间隔"""
+        circuit = self._hosts.get(host)
+        if circuit is None:
+            return 0.0
+        return max(circuit.open_until - time.monotonic(), _PROBE_RECHECK if circuit.probing else 0.0)
+
+    def record(self, host: str, ok: Optional[bool]):
+        """记录一次尝试结果；ok 为 None 表示与host无关（浏览器崩溃/取消），只释放探测名额"""
+        if ok:
+            if self._hosts.pop(host, None) is not None:
+                logger.debug(f"[{host}] 熔断计数已清零")
+            return
+        circuit = self._hosts.setdefault(host, _HostCircuit())
+        was_probing, circuit.probing = circuit.probing, False
+        if ok is None:
+            return
+        circuit.failures += 1
+        if self.threshold > 0 and circuit.failures >= self.threshold:
+            circuit.open_until = time.monotonic() + self.cooldown
+            if circuit.failures == self.threshold or was_probing:
+                metrics.inc("circuit_open", host)
+                logger.warning(f"⚠️ [{host}] 连续失败 {circuit.failures} 次，熔断 {self.cooldown:.0f}s")
+
+# 全局熔断器，所有worker共享
+breaker = CircuitBreaker()
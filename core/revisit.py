@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import time
+import asyncio
+import sqlite3
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+from config import REVISIT_PATH, REVISIT_FLUSH_SIZE
+import logging
+
+logger = logging.getLogger("cf_crawler.revisit")
+
+class Validator(NamedTuple):
+    """上次爬取的缓存校验信息"""
+    etag: Optional[str]
+    last_modified: Optional[str]
+    hash: Optional[str]
+
+    def headers(self) -> Dict[str, str]:
+        """条件请求头：源站未变化时返回304"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+class RevisitStore:
+    """增量爬取：按URL持久化 ETag / Last-Modified / 源码哈希，复访时判断页面是否变化
+
+    查询按需走SQLite主键（不整表载入内存），更新先缓存再批量写回
+    """
+    def __init__(self, path: str = REVISIT_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS validators (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                hash TEXT,
+                updated REAL NOT NULL
+            )
+        """)
+        self._lock = asyncio.Lock()
+        self._pending: Dict[str, Validator] = {}
+        self.unchanged = 0
+
+    def _get(self, url: str) -> Optional[Validator]:
+        row = self._conn.execute(
+            "SELECT etag, last_modified, hash FROM validators WHERE url = ?", (url,)
+        ).fetchone()
+        return Validator(*row) if row else None
+
+    async def get(self, url: str) -> Optional[Validator]:
+        """上次爬取的校验信息（未写回的更新优先）"""
+        if url in self._pending:
+            return self._pending[url]
+        try:
+            async with self._lock:
+                return await asyncio.to_thread(self._get, url)
+        except Exception as e:
+            logger.warning(f"⚠️ 读取增量校验信息失败：{str(e)}")
+            return None
+
+    async def put(self, url: str, etag: Optional[str], last_modified: Optional[str], body_hash: Optional[str]):
+        self._pending[url] = Validator(etag, last_modified, body_hash)
+        if len(self._pending) >= REVISIT_FLUSH_SIZE:
+            await self.flush()
+
+    def _write(self, pending: Dict[str, Validator]):
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO validators(url, etag, last_modified, hash, updated) VALUES (?, ?, ?, ?, ?)",
+                [(url, v.etag, v.last_modified, v.hash, now) for url, v in pending.items()]
+            )
+
+    async def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        try:
+            async with self._lock:
+                await asyncio.to_thread(self._write, pending)
+        except Exception as e:
+            logger.error(f"❌ 增量校验信息写入失败（{len(pending)}条）：{str(e)}")
+
+    async def close(self):
+        await self.flush()
+        self._conn.close()
+        if self.unchanged:
+            logger.info(f"✅ 增量爬取：{self.unchanged} 个页面未变化，已跳过提取与输出")
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from typing import Optional
+from core.browser import BrowserCore
+from core.proxy import ProxyPool
+from core.cookie import CookieManager
+from core.cf_handler import CFHandler
+from core.sink import SinkWriter
+from core.metrics import MetricsExporter
+from core.revisit import RevisitStore
+from core.extractor import ExtractionStage
+from core.fetcher import TieredFetcher
+import logging
+
+logger = logging.getLogger("cf_crawler.runtime")
+
+class CrawlerRuntime:
+    """一次运行的核心组件：单URL/批量模式、多进程分片与守护进程共用同一套创建、启动与释放顺序
+
+    frontier 不为空时由本对象关闭（先写完结果，再写回任务状态）
+    """
+    def __init__(self, concurrency: int, profile: Optional[bool] = None, incremental: bool = False,
+                 tiered: bool = False, frontier=None):
+        self.frontier = frontier
+        self.proxy_pool = ProxyPool()
+        self.browser_core = BrowserCore(self.proxy_pool, profile=profile, concurrency=concurrency)
+        self.cookie_mgr = CookieManager()
+        self.cf_handler = CFHandler()
+        self.revisit = RevisitStore() if incremental else None
+        self.fetcher = TieredFetcher(self.proxy_pool) if tiered else None
+        self.exporter = MetricsExporter()
+        self.writer: Optional[SinkWriter] = None
+        # 结果入口：配置了提取规则时为包装writer的结构化提取阶段，否则即writer
+        self.output = None
+
+    async def start(self) -> bool:
+        """初始化浏览器并启动后台任务；浏览器初始化失败时返回False（调用方仍需close）"""
+        if not await self.browser_core.init():
+            return False
+        await self.exporter.start()
+        self.proxy_pool.start()
+        self.cookie_mgr.start()
+        self.writer = SinkWriter.from_config()
+        self.writer.start()
+        self.output = ExtractionStage.wrap(self.writer)
+        return True
+
+    async def close(self):
+        """写完剩余结果并释放资源（先清空提取与写入队列，再写回任务状态）"""
+        if self.output is not None and self.output is not self.writer:
+            await self.output.close()
+        if self.writer is not None:
+            await self.writer.close()
+        if self.frontier is not None:
+            await self.frontier.close()
+        if self.revisit is not None:
+            await self.revisit.close()
+        if self.fetcher is not None:
+            await self.fetcher.close()
+        await self.cf_handler.close()
+        await self.cookie_mgr.close()
+        await self.proxy_pool.close()
+        await self.browser_core.close()
+        await self.exporter.close()
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+import time
+import asyncio
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional
+from urllib.robotparser import RobotFileParser
+import aiohttp
+from config import (
+    HOST_RATE, HOST_BURST, HOST_MIN_IN_FLIGHT, HOST_MAX_IN_FLIGHT, HOST_START_IN_FLIGHT,
+    HOST_LATENCY_TARGET, HOST_BACKOFF, HOST_MAX_PARKED, ROBOTS_ENABLE, ROBOTS_TIMEOUT
+)
+from core.metrics import metrics, host_of
+import logging
+
+logger = logging.getLogger("cf_crawler.scheduler")
+
+# 源站限流信号：429总是限流；503只在最终失败时计入（CF过渡页首个响应也是503）
+_THROTTLE_STATUS = 429
+_OVERLOAD_STATUS = 503
+
+class _HostState:
+    """单个host的令牌桶 + 自适应并发上限（AIMD）"""
+    def __init__(self):
+        self.rate = HOST_RATE
+        self.tokens = float(HOST_BURST)
+        self.refilled = time.monotonic()
+        self.limit = max(HOST_MIN_IN_FLIGHT, min(HOST_START_IN_FLIGHT, HOST_MAX_IN_FLIGHT))
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.latency = 0.0
+        self.successes = 0
+        # robots.txt 尚未取回时不派发
+        self.robots_pending = ROBOTS_ENABLE
+
+    def _refill(self, now: float):
+        if self.rate > 0:
+            self.tokens = min(float(HOST_BURST), self.tokens + (now - self.refilled) * self.rate)
+        self.refilled = now
+
+    def wait_time(self, now: float) -> Optional[float]:
+        """距离可派发还需等待的秒数；0表示立即可派发，None表示需等待在途请求完成"""
+        if self.robots_pending or self.in_flight >= self.limit:
+            return None
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.in_flight += 1
+        if self.rate > 0:
+            self.tokens -= 1
+
+    def observe(self, latency: float, throttled: bool):
+        self.in_flight -= 1
+        if throttled:
+            # 乘性减：并发减半，清空令牌并暂停一段时间
+            self.limit = max(HOST_MIN_IN_FLIGHT, self.limit // 2)
+            self.tokens = 0.0
+            self.paused_until = time.monotonic() + HOST_BACKOFF
+            self.successes = 0
+            return
+        self.latency = latency if not self.latency else 0.7 * self.latency + 0.3 * latency
+        if HOST_LATENCY_TARGET > 0 and self.latency > HOST_LATENCY_TARGET:
+            self.limit = max(HOST_MIN_IN_FLIGHT, self.limit - 1)
+            self.successes = 0
+            return
+        # 加性增：每连续成功 limit 次，并发上限+1
+        self.successes += 1
+        if self.successes >= self.limit:
+            self.limit = min(HOST_MAX_IN_FLIGHT, self.limit + 1)
+            self.successes = 0
+
+class HostScheduler:
+    """按host限速的派发器：从任务队列取URL，暂不可派发的host先停放，优先派发其他host的URL
+
+    每个host一个令牌桶（HOST_RATE，可被robots.txt的Crawl-delay收紧）和一个自适应并发上限：
+    延迟超过目标或遇到429/503时下调，持续正常时逐步上调
+    """
+    def __init__(self):
+        self._hosts: Dict[str, _HostState] = {}
+        # host -> 停放的URL，OrderedDict轮转保证各host交替派发
+        self._parked: "OrderedDict[str, Deque[str]]" = OrderedDict()
+        self._parked_count = 0
+        self._ready: Optional[asyncio.Queue] = None
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._robots_tasks: Dict[str, asyncio.Task] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _state(self, url: str) -> _HostState:
+        host = host_of(url)
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState()
+            if state.robots_pending:
+                self._robots_tasks[host] = asyncio.create_task(self._load_robots(url, host, state))
+        return state
+
+    async def _load_robots(self, url: str, host: str, state: _HostState):
+        """读取robots.txt的Crawl-delay / Request-rate，收紧该host的令牌速率（失败时忽略）"""
+        try:
+            if self._session is None:
+                self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=ROBOTS_TIMEOUT))
+            scheme = "http" if url.startswith("http://") else "https"
+            async with self._session.get(f"{scheme}://{host}/robots.txt") as resp:
+                if resp.status == 200:
+                    parser = RobotFileParser()
+                    parser.parse((await resp.text(errors="ignore")).splitlines())
+                    delay = parser.crawl_delay("*")
+                    rate = parser.request_rate("*")
+                    limits = [1 / float(delay)] if delay else []
+                    if rate and rate.seconds:
+                        limits.append(rate.requests / rate.seconds)
+                    if limits:
+                        allowed = min(limits)
+                        state.rate = min(state.rate, allowed) if state.rate > 0 else allowed
+                        logger.info(f"🤖 [{host}] robots.txt 限速：每秒 {state.rate:.3f} 次")
+        except Exception as e:
+            logger.debug(f"读取 {host} robots.txt 失败：{str(e)[:60]}")
+        finally:
+            state.robots_pending = False
+            self._robots_tasks.pop(host, None)
+            self._wake.set()
+
+    def _pop_ready(self, now: float):
+        """取出一个可派发的停放URL，并返回最短等待时间（无可派发时）"""
+        soonest: Optional[float] = None
+        for host in list(self._parked):
+            state = self._hosts[host]
+            wait = state.wait_time(now)
+            if wait == 0:
+                queue = self._parked[host]
+                url = queue.popleft()
+                self._parked_count -= 1
+                if queue:
+                    self._parked.move_to_end(host)
+                else:
+                    del self._parked[host]
+                state.take()
+                return url, None
+            if wait is not None:
+                soonest = wait if soonest is None else min(soonest, wait)
+        return None, soonest
+
+    def _park(self, url: str):
+        host = host_of(url)
+        self._parked.setdefault(host, deque()).append(url)
+        self._parked_count += 1
+
+    async def _dispatch(self, frontier, workers: int):
+        exhausted = False
+        while True:
+            self._wake.clear()
+            url, soonest = self._pop_ready(time.monotonic())
+            if url is not None:
+                await self._ready.put(url)
+                continue
+            if self._parked_count < HOST_MAX_PARKED:
+                url = await frontier.poll()
+                if url is not None:
+                    state = self._state(url)
+                    if not self._parked.get(host_of(url)) and state.wait_time(time.monotonic()) == 0:
+                        state.take()
+                        await self._ready.put(url)
+                    else:
+                        self._park(url)
+                    continue
+                # 停放与处理中的URL都计入frontier在途数，为0即全部完成
+                exhausted = frontier.active == 0
+            if exhausted:
+                for _ in range(workers):
+                    await self._ready.put(None)
+                return
+            # 等待：在途请求完成 / 最近的令牌恢复
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=soonest if soonest is not None else 1.0)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self, frontier, workers: int):
+        try:
+            await self._dispatch(frontier, workers)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 派发异常时通知worker退出；停放的URL仍为在途状态，--resume 时恢复
+            logger.error(f"❌ 主机调度异常，批量任务提前结束：{str(e)}")
+            for _ in range(workers):
+                await self._ready.put(None)
+
+    def start(self, frontier, workers: int):
+        self._ready = asyncio.Queue(maxsize=1)
+        self._task = asyncio.create_task(self._run(frontier, workers))
+
+    async def next(self) -> Optional[str]:
+        """取下一个已获得派发许可的URL；全部完成时返回None"""
+        return await self._ready.get()
+
+    def release(self, url: str, elapsed: float, http_status: Optional[int], ok: bool):
+        """爬取结束：归还host并发名额，按延迟与状态码调整该host的并发上限"""
+        state = self._hosts.get(host_of(url))
+        if state is None:
+            return
+        throttled = http_status == _THROTTLE_STATUS or (http_status == _OVERLOAD_STATUS and not ok)
+        before = state.limit
+        state.observe(elapsed, throttled)
+        if throttled:
+            metrics.inc("host_throttled", host_of(url))
+            logger.warning(f"⚠️ [{host_of(url)}] 源站限流（{http_status}），并发上限 {before}→{state.limit}，暂停 {HOST_BACKOFF}s")
+        self._wake.set()
+
+    async def close(self):
+        for task in [self._task, *self._robots_tasks.values()]:
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+import gzip
+import json
+import time
+import shutil
+import asyncio
+import sqlite3
+from pathlib import Path
+from typing import Iterator, List, Optional, Set
+from config import (
+    RESULT_SINKS, RESULT_JSONL_PATH, RESULT_ARCHIVE_PATH, RESULT_SQLITE_PATH,
+    RESULT_QUEUE_SIZE, RESULT_BATCH_SIZE
+)
+from core.content import ContentBody
+import logging
+
+# zstd为可选依赖，未安装时归档降级为gzip
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger("cf_crawler.sink")
+
+class ResultSink:
+    """结果输出接口：write/flush/close 均在写入线程中调用，不阻塞事件循环
+
+    record 字段：url, ok, http_status, cf_status, error, timings, ts, hash, truncated, body, data（结构化提取结果）
+    body 为 ContentBody（分块缓冲的源码），sink 应按块读取，避免整页载入内存
+    duplicate 为 True 时表示相同内容本次运行已写过，sink 只需记录元数据
+    """
+    name = "base"
+
+    def write(self, record: dict, duplicate: bool):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    @classmethod
+    def resolve_path(cls, path: str) -> str:
+        """实际写入的文件路径"""
+        return path
+
+    @classmethod
+    def merge(cls, sources: List[str], dest: str):
+        """把多个分片（多进程模式）的输出合并到dest，默认按字节追加"""
+        Path(dest).parent.mkdir(parents=True, exist_ok=True)
+        with open(dest, "ab") as out:
+            for source in sources:
+                if Path(source).exists():
+                    with open(source, "rb") as f:
+                        shutil.copyfileobj(f, out, 1024 * 1024)
+
+def _json_line(record: dict, duplicate: bool) -> Iterator[str]:
+    """按块生成一行JSON记录，源码作为html字段逐块转义输出"""
+    head = json.dumps({k: v for k, v in record.items() if k != "body"}, ensure_ascii=False)
+    body: Optional[ContentBody] = record.get("body")
+    if body is None or duplicate:
+        yield head[:-1] + ', "html": null}\n'
+        return
+    yield head[:-1] + ', "html": "'
+    for chunk in body.iter_text():
+        yield json.dumps(chunk, ensure_ascii=False)[1:-1]
+    yield '"}\n'
+
+class JsonlSink(ResultSink):
+    """JSONL记录：每行一条，重复内容只记录哈希"""
+    name = "jsonl"
+
+    def __init__(self, path: str = RESULT_JSONL_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, record: dict, duplicate: bool):
+        for part in _json_line(record, duplicate):
+            self._file.write(part)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class ArchiveSink(ResultSink):
+    """压缩归档：zstd（已安装zstandard时）或gzip压缩的JSONL流，追加写入"""
+    name = "archive"
+
+    def __init__(self, path: str = RESULT_ARCHIVE_PATH):
+        path = self.resolve_path(path)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        if zstandard is not None:
+            self._raw = open(path, "ab")
+            self._file = zstandard.ZstdCompressor(level=6).stream_writer(self._raw)
+        else:
+            self._raw = None
+            self._file = gzip.open(path, "ab", compresslevel=6)
+
+    @classmethod
+    def resolve_path(cls, path: str) -> str:
+        return str(Path(path).with_suffix(".zst")) if zstandard is not None else path
+
+    # gzip成员/zstd帧首尾拼接仍是合法的压缩流，沿用按字节追加合并
+
+    def write(self, record: dict, duplicate: bool):
+        for part in _json_line(record, duplicate):
+            self._file.write(part.encode("utf-8", "surrogatepass"))
+
+    def flush(self):
+        if self._raw is None:
+            self._file.flush()
+        else:
+            self._file.flush(zstandard.FLUSH_FRAME)
+            self._raw.flush()
+
+    def close(self):
+        self._file.close()
+
+class SqliteSink(ResultSink):
+    """SQLite：pages表记录每次爬取，bodies表按内容哈希去重存储源码（跨运行去重）"""
+    name = "sqlite"
+
+    def __init__(self, path: str = RESULT_SQLITE_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # 写入线程由asyncio.to_thread调度，可能跨线程，但同一时刻只有一个写入者
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS bodies (
+                hash TEXT PRIMARY KEY,
+                html BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                url TEXT NOT NULL,
+                ok INTEGER NOT NULL,
+                http_status INTEGER,
+                cf_status TEXT,
+                error TEXT,
+                timings TEXT,
+                hash TEXT,
+                ts REAL NOT NULL,
+                data TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_pages_url ON pages(url);
+        """)
+        # 旧版数据库无data列
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(pages)")}
+        if "data" not in columns:
+            self._conn.execute("ALTER TABLE pages ADD COLUMN data TEXT")
+
+    def _write_body(self, body: ContentBody):
+        """源码按UTF-8字节存储；支持blobopen（Python 3.11+）时预分配后分块写入"""
+        if not hasattr(self._conn, "blobopen"):
+            self._conn.execute(
+                "INSERT OR IGNORE INTO bodies(hash, html) VALUES (?, ?)",
+                (body.hash, b"".join(body.iter_bytes()))
+            )
+            return
+        cur = self._conn.execute(
+            "INSERT OR IGNORE INTO bodies(hash, html) VALUES (?, zeroblob(?))", (body.hash, body.size)
+        )
+        if cur.rowcount != 1 or not body.size:
+            return
+        with self._conn.blobopen("bodies", "html", cur.lastrowid) as blob:
+            for data in body.iter_bytes():
+                blob.write(data)
+
+    def write(self, record: dict, duplicate: bool):
+        body: Optional[ContentBody] = record.get("body")
+        if body is not None and not duplicate:
+            self._write_body(body)
+        self._conn.execute(
+            "INSERT INTO pages(url, ok, http_status, cf_status, error, timings, hash, ts, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                record["url"], int(record.get("ok", False)), record.get("http_status"),
+                record.get("cf_status"), record.get("error"),
+                json.dumps(record.get("timings") or {}), record.get("hash"), record["ts"],
+                json.dumps(record["data"], ensure_ascii=False) if record.get("data") is not None else None
+            )
+        )
+
+    def flush(self):
+        self._conn.commit()
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+    @classmethod
+    def merge(cls, sources: List[str], dest: str):
+        """逐个ATTACH分片库：源码按哈希去重，爬取记录全部追加"""
+        target = cls(dest)
+        try:
+            for source in sources:
+                if not Path(source).exists():
+                    continue
+                target._conn.execute("ATTACH DATABASE ? AS shard", (source,))
+                try:
+                    with target._conn:
+                        target._conn.execute("INSERT OR IGNORE INTO bodies(hash, html) SELECT hash, html FROM shard.bodies")
+                        target._conn.execute(
+                            "INSERT INTO pages(url, ok, http_status, cf_status, error, timings, hash, ts, data) "
+                            "SELECT url, ok, http_status, cf_status, error, timings, hash, ts, data FROM shard.pages"
+                        )
+                finally:
+                    target._conn.execute("DETACH DATABASE shard")
+        finally:
+            target.close()
+
+SINK_TYPES = {cls.name: cls for cls in (JsonlSink, ArchiveSink, SqliteSink)}
+
+class SinkWriter:
+    """写后队列：爬取协程只负责入队，后台任务批量出队后在线程中分块写盘
+
+    队列有上限，写盘跟不上时 put 会等待（背压），内存中最多滞留 queue_size 条记录
+    """
+    def __init__(self, sinks: List[ResultSink], queue_size: int = RESULT_QUEUE_SIZE,
+                 batch_size: int = RESULT_BATCH_SIZE):
+        self.sinks = sinks
+        self.batch_size = max(1, batch_size)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self._seen: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.duplicates = 0
+
+    @classmethod
+    def from_config(cls, names: Optional[List[str]] = None) -> "SinkWriter":
+        sinks = []
+        for name in names or RESULT_SINKS:
+            sink_cls = SINK_TYPES.get(name)
+            if sink_cls is None:
+                logger.warning(f"⚠️ 未知结果输出类型 {name}，已跳过")
+                continue
+            sinks.append(sink_cls())
+        logger.info(f"结果输出：{', '.join(s.name for s in sinks) or '无'}")
+        return cls(sinks)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def put(self, record: dict):
+        """提交一条结果（队列满时等待）；html字符串会转为分块缓冲"""
+        record.setdefault("ts", time.time())
+        html = record.pop("html", None)
+        if isinstance(html, str) and record.get("body") is None:
+            record["body"] = ContentBody.from_text(html)
+        await self._queue.put(record)
+
+    async def _run(self):
+        while True:
+            record = await self._queue.get()
+            if record is None:
+                return
+            batch = [record]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                logger.error(f"❌ 结果写入失败（{len(batch)}条）：{str(e)}")
+            if stop:
+                return
+
+    def _write_batch(self, batch: List[dict]):
+        try:
+            for record in batch:
+                body: Optional[ContentBody] = record.get("body")
+                duplicate = False
+                if body is not None:
+                    record["hash"] = body.hash
+                    record["truncated"] = body.truncated
+                    duplicate = body.hash in self._seen
+                    self._seen.add(body.hash)
+                else:
+                    record.setdefault("hash", None)
+                for sink in self.sinks:
+                    sink.write(record, duplicate)
+                self.written += 1
+                self.duplicates += duplicate
+            for sink in self.sinks:
+                sink.flush()
+        finally:
+            # 写完即释放源码缓冲（含临时文件）
+            for record in batch:
+                if record.get("body") is not None:
+                    record["body"].close()
+
+    async def close(self):
+        """写完队列中剩余结果后关闭所有sink"""
+        if self._task is not None:
+            await self._queue.put(None)
+            await self._task
+            self._task = None
+        for sink in self.sinks:
+            try:
+                await asyncio.to_thread(sink.close)
+            except Exception as e:
+                logger.warning(f"⚠️ 关闭结果输出 {sink.name} 异常：{str(e)}")
+        logger.info(f"✅ 结果写入完成：共 {self.written} 条，重复内容 {self.duplicates} 条仅记录哈希")
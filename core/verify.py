@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+import html
+import time
+import asyncio
+from typing import Dict, Optional
+from aiohttp import web
+from playwright.async_api import Page
+from config import (
+    VERIFY_PORT, VERIFY_TIMEOUT, VERIFY_MAX_PARKED, VERIFY_LIST_INTERVAL, BATCH_URL_TIMEOUT, CF_MAX_WAIT
+)
+from core.metrics import metrics, host_of
+from core.retry import url_deadline
+import logging
+
+logger = logging.getLogger("cf_crawler.verify")
+
+# 挂起结果：人工完成 / 页面自行跳转 / 人工跳过 / 超时 / 挂起数已满 / 单URL剩余时间耗尽
+DONE = "done"
+CHANGED = "changed"
+SKIPPED = "skipped"
+TIMEOUT = "timeout"
+FULL = "full"
+EXPIRED = "expired"
+
+# 结束挂起后仍需重新检测、提取源码与保存Cookie，挂起时按单URL剩余时间预留（秒）
+_URL_RESERVE = 15.0
+
+_PAGE_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><meta http-equiv="refresh" content="5">
+<title>待人工验证（{count}）</title>
+<style>body{{font-family:sans-serif;margin:2em}}td,th{{padding:4px 10px;text-align:left}}form{{display:inline}}</style>
+</head><body>
+<h2>待人工验证页面：{count} 个</h2>
+<p>在浏览器窗口中完成Turnstile验证后点击“已完成”，页面将继续爬取；点击“跳过”则该URL记为失败，不再重试。</p>
+<table><tr><th>#</th><th>URL</th><th>已等待</th><th>剩余</th><th></th></tr>
+{rows}
+</table></body></html>
+"""
+
+_ROW_HTML = """<tr><td>{id}</td><td>{url}</td><td>{waited}s</td><td>{left}s</td><td>
+<a href="/shot/{id}" target="_blank">截图</a>
+<form method="post" action="/done/{id}"><button>已完成</button></form>
+<form method="post" action="/skip/{id}"><button>跳过</button></form></td></tr>"""
+
+class _Parked:
+    def __init__(self, pid: int, page: Page, url: str, timeout: float):
+        self.id = pid
+        self.page = page
+        self.url = url
+        self.timeout = timeout
+        self.since = time.monotonic()
+        self.outcome: Optional[str] = None
+        self.event = asyncio.Event()
+
+class VerifyQueue:
+    """人工验证队列：需要人工处理的页面挂起等待，不占用线程池，其余worker照常爬取
+
+    待验证页面通过本地网页（或日志列表）展示，操作员标记完成/跳过后恢复；
+    页面自行跳转（在浏览器窗口中直接完成验证）同样恢复，超时未处理则释放页面与并发名额
+    """
+    def __init__(self, port: int = VERIFY_PORT, timeout: float = VERIFY_TIMEOUT,
+                 max_parked: int = VERIFY_MAX_PARKED):
+        self.port = port
+        # 挂起发生在单URL总超时（BATCH_URL_TIMEOUT）之内，需留出导航与CF检测的时间，
+        # 否则挂起页总是先被整体超时取消，走不到按验证超时释放并重试的流程
+        budget = max(0.0, BATCH_URL_TIMEOUT - CF_MAX_WAIT)
+        if timeout > budget:
+            logger.warning(f"⚠️ 人工验证超时 {timeout:.0f}s 超过单URL超时可用的 {budget:.0f}s"
+                           f"（BATCH_URL_TIMEOUT - CF_MAX_WAIT），已下调为 {budget:.0f}s")
+            timeout = budget
+        self.timeout = timeout
+        self.max_parked = max_parked
+        self._parked: Dict[int, _Parked] = {}
+        self._next_id = 1
+        self._started = False
+        self._runner = None
+        self._list_task: Optional[asyncio.Task] = None
+        self.address: Optional[str] = None
+
+    async def _start(self):
+        """首次有页面挂起时才启动本地网页与日志列表（多数批次不需要人工验证，不占用端口）"""
+        self._started = True
+        if self.port:
+            try:
+                app = web.Application()
+                app.router.add_get("/", self._handle_index)
+                app.router.add_get("/list.json", self._handle_list)
+                app.router.add_get("/shot/{id}", self._handle_shot)
+                app.router.add_post("/done/{id}", self._handle_done)
+                app.router.add_post("/skip/{id}", self._handle_skip)
+                self._runner = web.AppRunner(app, access_log=None)
+                await self._runner.setup()
+                await web.TCPSite(self._runner, "127.0.0.1", self.port).start()
+                self.address = f"http://127.0.0.1:{self.port}/"
+                logger.info(f"🧑 人工验证页面已启动：{self.address}")
+            except Exception as e:
+                logger.warning(f"⚠️ 人工验证页面启动失败，仅在日志中列出待验证页面：{str(e)}")
+                if self._runner is not None:
+                    await self._runner.cleanup()
+                self._runner = None
+        if VERIFY_LIST_INTERVAL > 0:
+            self._list_task = asyncio.create_task(self._list_loop())
+
+    def _hint(self, pid: int) -> str:
+        if self.address:
+            return f"打开 {self.address} 处理，或执行 curl -X POST {self.address}done/{pid}"
+        return "在浏览器窗口中完成验证后页面跳转即自动继续"
+
+    async def park(self, page: Page, url: str, changed: asyncio.Event) -> str:
+        """挂起页面直到人工完成/跳过、页面自行跳转（changed 置位）或超时，返回挂起结果
+
+        超时取 VERIFY_TIMEOUT 与单URL剩余时间（扣除预留）中较小者；因剩余时间不足而结束时返回 EXPIRED
+        """
+        if len(self._parked) >= self.max_parked:
+            logger.warning(f"⚠️ [{url}] 待人工验证页面已达上限 {self.max_parked}，不再挂起")
+            metrics.inc("verify", host_of(url), FULL)
+            return FULL
+        timeout = self.timeout
+        deadline = url_deadline.get()
+        limited = deadline is not None and deadline - time.monotonic() - _URL_RESERVE < timeout
+        if limited:
+            timeout = deadline - time.monotonic() - _URL_RESERVE
+            if timeout <= 0:
+                logger.warning(f"⚠️ [{url}] 单URL剩余时间不足，不再挂起")
+                metrics.inc("verify", host_of(url), EXPIRED)
+                return EXPIRED
+        entry = _Parked(self._next_id, page, url, timeout)
+        self._next_id += 1
+        self._parked[entry.id] = entry
+        if not self._started:
+            await self._start()
+        logger.warning(f"🧑 [{url}] 需要人工完成Turnstile验证，已挂起为 #{entry.id}（{timeout:.0f}s后超时）：{self._hint(entry.id)}")
+        waiters = [asyncio.create_task(entry.event.wait()), asyncio.create_task(changed.wait())]
+        try:
+            await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in waiters:
+                task.cancel()
+            await asyncio.gather(*waiters, return_exceptions=True)
+            self._parked.pop(entry.id, None)
+        outcome = entry.outcome or (CHANGED if changed.is_set() else EXPIRED if limited else TIMEOUT)
+        waited = time.monotonic() - entry.since
+        metrics.inc("verify", host_of(url), outcome)
+        metrics.observe("verify_wait", waited, host_of(url), outcome)
+        if outcome in (TIMEOUT, EXPIRED):
+            logger.error(f"❌ [{url}] #{entry.id} 超过{timeout:.0f}秒未完成人工验证，释放页面")
+        else:
+            logger.info(f"🧑 [{url}] #{entry.id} 结束挂起（{outcome}），等待 {waited:.0f}s")
+        return outcome
+
+    def is_parked(self, page: Page) -> bool:
+        return any(entry.page is page for entry in self._parked.values())
+
+    def resolve(self, pid: int, outcome: str) -> bool:
+        """操作员标记挂起页面（DONE / SKIPPED），页面不存在或已结束时返回False"""
+        entry = self._parked.get(pid)
+        if entry is None or entry.event.is_set():
+            return False
+        entry.outcome = outcome
+        entry.event.set()
+        return True
+
+    def pending(self) -> list:
+        now = time.monotonic()
+        return [
+            {"id": e.id, "url": e.url, "waited": round(now - e.since), "left": max(0, round(e.timeout - (now - e.since)))}
+            for e in self._parked.values()
+        ]
+
+    async def _list_loop(self):
+        while True:
+            await asyncio.sleep(VERIFY_LIST_INTERVAL)
+            items = self.pending()
+            if items:
+                lines = "\n".join(f"  #{i['id']} {i['url']}（已等待{i['waited']}s，剩余{i['left']}s）" for i in items)
+                logger.warning(f"🧑 待人工验证页面 {len(items)} 个：\n{lines}\n  {self._hint(items[0]['id'])}")
+
+    def _entry(self, request: web.Request) -> Optional[_Parked]:
+        try:
+            return self._parked.get(int(request.match_info["id"]))
+        except ValueError:
+            return None
+
+    async def _handle_index(self, request: web.Request) -> web.Response:
+        items = self.pending()
+        rows = "\n".join(
+            _ROW_HTML.format(id=i["id"], url=html.escape(i["url"]), waited=i["waited"], left=i["left"]) for i in items
+        )
+        return web.Response(text=_PAGE_HTML.format(count=len(items), rows=rows), content_type="text/html", charset="utf-8")
+
+    async def _handle_list(self, request: web.Request) -> web.Response:
+        return web.json_response(self.pending())
+
+    async def _handle_shot(self, request: web.Request) -> web.Response:
+        entry = self._entry(request)
+        if entry is None:
+            raise web.HTTPNotFound(text="页面已结束挂起")
+        try:
+            data = await entry.page.screenshot(type="png")
+        except Exception as e:
+            raise web.HTTPInternalServerError(text=f"截图失败：{str(e)}")
+        return web.Response(body=data, content_type="image/png")
+
+    async def _resolve(self, request: web.Request, outcome: str) -> web.Response:
+        entry = self._entry(request)
+        if entry is None or not self.resolve(entry.id, outcome):
+            raise web.HTTPNotFound(text="页面已结束挂起")
+        # 表单提交返回列表页，curl等调用同样得到303
+        raise web.HTTPSeeOther("/")
+
+    async def _handle_done(self, request: web.Request) -> web.Response:
+        return await self._resolve(request, DONE)
+
+    async def _handle_skip(self, request: web.Request) -> web.Response:
+        return await self._resolve(request, SKIPPED)
+
+    async def close(self):
+        # 仍在挂起的页面按跳过处理
+        for pid in list(self._parked):
+            self.resolve(pid, SKIPPED)
+        if self._list_task is not None:
+            self._list_task.cancel()
+            try:
+                await self._list_task
+            except asyncio.CancelledError:
+                pass
+            self._list_task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""守护进程模式：浏览器只启动一次，通过本地HTTP/Unix socket接收爬取任务
+
+接口：
+  POST /crawl   {"urls": [...], "stream": false, "include_html": true}
+                stream=true 时按完成顺序逐行返回NDJSON，否则全部完成后返回JSON数组
+  GET  /health  运行状态
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import logging
+from typing import List
+from aiohttp import web
+from main import crawl_record
+from core.runtime import CrawlerRuntime
+from config import CONCURRENCY, DAEMON_HOST, DAEMON_PORT, DAEMON_SOCKET, DAEMON_HTML_MAX_CHARS, REVISIT_ENABLE
+
+logger = logging.getLogger("cf_crawler.daemon")
+
+class CrawlDaemon:
+    def __init__(self, concurrency: int = CONCURRENCY):
+        self.runtime = CrawlerRuntime(concurrency, incremental=REVISIT_ENABLE)
+        # 所有任务共享的并发上限
+        self._sem = asyncio.Semaphore(max(1, concurrency))
+        self.started = time.time()
+        self.in_flight = 0
+        self.completed = 0
+
+    async def start(self) -> bool:
+        return await self.runtime.start()
+
+    async def close(self):
+        await self.runtime.close()
+
+    async def _crawl(self, url: str, include_html: bool) -> dict:
+        async with self._sem:
+            self.in_flight += 1
+            try:
+                runtime = self.runtime
+                record = await crawl_record(runtime.browser_core, runtime.cookie_mgr, runtime.cf_handler, url,
+                                            revisit=runtime.revisit)
+            finally:
+                self.in_flight -= 1
+        self.completed += 1
+        # 源码缓冲写盘后即释放，需要返回源码时先行读出：
+        # 在线程中按块读取（大页面缓冲在临时文件中，不阻塞其他任务），最多读取 DAEMON_HTML_MAX_CHARS 字符
+        body = record.get("body")
+        html = None
+        truncated = False
+        if include_html and body is not None:
+            limit = DAEMON_HTML_MAX_CHARS
+            html = await asyncio.to_thread(body.read_text, limit + 1 if limit else 0)
+            truncated = bool(limit) and len(html) > limit
+            html = html[:limit] if truncated else html
+        if not record.get("unchanged"):
+            await self.runtime.output.put(record)
+        response = {k: v for k, v in record.items() if k != "body"}
+        if include_html:
+            response["html"] = html
+            response["html_truncated"] = truncated
+        return response
+
+    @staticmethod
+    def _parse_urls(payload) -> List[str]:
+        if not isinstance(payload, dict):
+            raise ValueError("请求体必须是JSON对象")
+        urls = payload.get("urls")
+        if isinstance(payload.get("url"), str):
+            urls = [payload["url"]]
+        if not isinstance(urls, list) or not urls:
+            raise ValueError("需要提供 urls 列表或 url 字段")
+        bad = [u for u in urls if not isinstance(u, str) or not u.startswith(("http://", "https://"))]
+        if bad:
+            raise ValueError(f"URL格式错误，必须以http://或https://开头：{bad[:3]}")
+        return urls
+
+    async def handle_crawl(self, request: web.Request) -> web.StreamResponse:
+        try:
+            payload = await request.json()
+            urls = self._parse_urls(payload)
+        except (ValueError, json.JSONDecodeError) as e:
+            return web.json_response({"error": str(e)}, status=400)
+        include_html = bool(payload.get("include_html", True))
+        tasks = [asyncio.create_task(self._crawl(u, include_html)) for u in urls]
+        logger.info(f"收到任务：{len(urls)} 个URL，stream={bool(payload.get('stream'))}")
+        try:
+            if not payload.get("stream"):
+                return web.json_response(await asyncio.gather(*tasks), dumps=lambda o: json.dumps(o, ensure_ascii=False))
+            # 流式返回：每完成一个URL写一行NDJSON
+            response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson; charset=utf-8"})
+            await response.prepare(request)
+            for done in asyncio.as_completed(tasks):
+                record = await done
+                await response.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+            await response.write_eof()
+            return response
+        finally:
+            # 客户端断开时取消尚未完成的URL
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "status": "ok",
+            "uptime": round(time.time() - self.started, 1),
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+        })
+
+    def build_app(self) -> web.Application:
+        app = web.Application(client_max_size=16 * 1024 * 1024)
+        app.router.add_post("/crawl", self.handle_crawl)
+        app.router.add_get("/health", self.handle_health)
+        return app
+
+async def serve(host: str, port: int, socket_path: str, concurrency: int):
+    daemon = CrawlDaemon(concurrency)
+    if not await daemon.start():
+        logger.critical("❌ 浏览器初始化失败，守护进程退出")
+        await daemon.close()
+        return
+    runner = web.AppRunner(daemon.build_app(), access_log=None)
+    await runner.setup()
+    try:
+        if socket_path:
+            await web.UnixSite(runner, socket_path).start()
+            logger.info(f"✅ 守护进程已就绪，监听 unix:{socket_path}")
+        else:
+            await web.TCPSite(runner, host, port).start()
+            logger.info(f"✅ 守护进程已就绪，监听 http://{host}:{port}")
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await daemon.close()
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Cloudflare Bypass Crawler Pro - 守护进程模式")
+    parser.add_argument("--host", default=DAEMON_HOST, help=f"监听地址（默认{DAEMON_HOST}）")
+    parser.add_argument("--port", type=int, default=DAEMON_PORT, help=f"监听端口（默认{DAEMON_PORT}）")
+    parser.add_argument("--socket", default=DAEMON_SOCKET, help="改为监听Unix socket路径")
+    parser.add_argument("-c", "--concurrency", type=int, default=CONCURRENCY, help=f"并发数（默认{CONCURRENCY}）")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = _parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.socket, args.concurrency))
+    except KeyboardInterrupt:
+        logger.info("⚠️ 守护进程已停止")
+    except Exception as e:
+        logger.critical(f"❌ 守护进程异常退出：{str(e)}")
+        sys.exit(1)
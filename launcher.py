@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""多进程分片模式：N个worker进程各自持有BrowserCore/CFHandler/CookieManager，按host分片领取URL
+
+同一host的URL固定交给同一个进程，CF会话状态不跨进程；各分片输出与指标在结束时合并为一份
+用法：
+  python launcher.py -f urls.txt -w 4 -c 4
+"""
+import os
+import sys
+import json
+import zlib
+import asyncio
+import argparse
+import logging
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import urlparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+
+# 注意：spawn模式下子进程会重新导入本模块，顶层不能导入core/main（需先改写分片路径配置）
+import config
+from config import (
+    CONCURRENCY, CRAWL_MAX_DEPTH, REVISIT_ENABLE, TIER_ENABLE, WORKER_PROCESSES, SHARD_DIR,
+    RESULT_SINKS, METRICS_JSON_PATH, BATCH_REPORT_PATH, REVISIT_PATH, COOKIE_DIR
+)
+
+logger = logging.getLogger("cf_crawler.launcher")
+
+# 各结果输出对应的路径配置项
+_SINK_PATHS: Dict[str, str] = {
+    "jsonl": "RESULT_JSONL_PATH",
+    "archive": "RESULT_ARCHIVE_PATH",
+    "sqlite": "RESULT_SQLITE_PATH",
+}
+
+def shard_of(url: str, shards: int) -> int:
+    """按host稳定分片（crc32，与进程/运行无关，--resume时分片不变）"""
+    host = (urlparse(url).hostname or "").lower()
+    return zlib.crc32(host.encode("utf-8")) % shards
+
+def _shard_dir(shard: int) -> Path:
+    return Path(SHARD_DIR) / str(shard)
+
+def _shard_path(shard: int, path: str) -> str:
+    return str(_shard_dir(shard) / Path(path).name)
+
+def _run_shard(shard: int, urls: List[str], options: dict) -> dict:
+    """worker进程入口：把结果输出/指标/任务队列改写到分片目录后再导入爬虫模块"""
+    for attr in _SINK_PATHS.values():
+        setattr(config, attr, _shard_path(shard, getattr(config, attr)))
+    config.METRICS_PORT = 0
+    config.METRICS_JSON_PATH = _shard_path(shard, METRICS_JSON_PATH)
+    # 分片按host划分，抓取方式/增量校验信息/CF会话Cookie都只涉及本分片的host，
+    # 各自使用独立的SQLite文件，避免多进程写同一个库时因锁冲突丢失写入
+    config.TIER_STATE_PATH = str(_shard_dir(shard) / "tiers.json")
+    config.REVISIT_PATH = _shard_path(shard, REVISIT_PATH)
+    config.COOKIE_DIR = _shard_path(shard, COOKIE_DIR)
+    # 各分片的人工验证页面使用不同端口
+    if config.VERIFY_PORT:
+        config.VERIFY_PORT += shard
+    try:
+        return asyncio.run(_shard_main(shard, urls, options))
+    except KeyboardInterrupt:
+        return {"shard": shard, "results": [], "stats": {}, "error": "用户手动终止"}
+
+async def _shard_main(shard: int, urls: List[str], options: dict) -> dict:
+    from main import run_batch
+    from core.frontier import Frontier
+    from core.links import LinkScope, normalize_url
+    from core.scheduler import HostScheduler
+    from core.runtime import CrawlerRuntime
+
+    shard_logger = logging.getLogger(f"cf_crawler.shard-{shard}")
+    frontier = Frontier(str(_shard_dir(shard) / "frontier.db"))
+    if options["fresh"]:
+        frontier.reset()
+    scope = None
+    if options["depth"] > 0:
+        urls = [normalize_url(u) or u for u in urls]
+        scope = LinkScope(urls + frontier.seeds(), options["depth"])
+    await frontier.add(urls)
+    await frontier.flush()
+    shard_logger.info(f"分片 {shard} 启动：任务队列 {frontier.stats()}")
+
+    runtime = CrawlerRuntime(options["concurrency"], incremental=options["incremental"],
+                             tiered=options["tiered"], frontier=frontier)
+    try:
+        if not await runtime.start():
+            return {"shard": shard, "results": [], "stats": {}, "error": "浏览器初始化失败"}
+        results = await run_batch(runtime.browser_core, runtime.cookie_mgr, runtime.cf_handler, frontier,
+                                  runtime.output, options["concurrency"], scope, runtime.revisit,
+                                  HostScheduler() if config.HOST_SCHEDULE else None, fetcher=runtime.fetcher)
+        await frontier.flush()
+        return {"shard": shard, "results": results, "stats": frontier.stats(), "error": None}
+    finally:
+        await runtime.close()
+
+def merge_outputs(shards: int):
+    """合并各分片的结果输出与指标快照，合并后删除分片输出（任务队列保留，用于断点续爬）"""
+    from core.sink import SINK_TYPES
+    from core.metrics import MetricsRegistry
+
+    for name in RESULT_SINKS:
+        sink_cls = SINK_TYPES.get(name)
+        if sink_cls is None:
+            continue
+        dest = sink_cls.resolve_path(getattr(config, _SINK_PATHS[name]))
+        sources = [_shard_path(i, dest) for i in range(shards)]
+        try:
+            sink_cls.merge(sources, dest)
+            for source in sources:
+                for suffix in ("", "-wal", "-shm"):
+                    Path(source + suffix).unlink(missing_ok=True)
+            logger.info(f"✅ 已合并 {name} 输出到 {dest}")
+        except Exception as e:
+            logger.error(f"❌ 合并 {name} 输出失败（分片文件已保留）：{str(e)}")
+
+    registry = MetricsRegistry()
+    merged = 0
+    for i in range(shards):
+        path = Path(_shard_path(i, METRICS_JSON_PATH))
+        if not path.exists():
+            continue
+        try:
+            registry.merge(json.loads(path.read_text(encoding="utf-8")))
+            path.unlink()
+            merged += 1
+        except Exception as e:
+            logger.warning(f"⚠️ 分片 {i} 指标合并失败：{str(e)}")
+    if merged and METRICS_JSON_PATH:
+        Path(METRICS_JSON_PATH).parent.mkdir(parents=True, exist_ok=True)
+        Path(METRICS_JSON_PATH).write_text(json.dumps(registry.snapshot(), ensure_ascii=False), encoding="utf-8")
+        logger.info(f"✅ 已合并 {merged} 个分片的指标到 {METRICS_JSON_PATH}")
+
+def launch(urls: List[str], workers: int, options: dict) -> List[dict]:
+    """按host分片后启动worker进程，等待全部结束并合并输出"""
+    buckets: List[List[str]] = [[] for _ in range(workers)]
+    for url in urls:
+        buckets[shard_of(url, workers)].append(url)
+    active = [i for i in range(workers) if buckets[i] or options["resume"]]
+    logger.info(f"多进程模式：{workers} 个分片，" + "，".join(f"分片{i}:{len(buckets[i])}" for i in active))
+
+    outcomes: List[dict] = []
+    # spawn：每个worker是干净的解释器，不继承父进程的事件循环/浏览器句柄
+    ctx = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, len(active)), mp_context=ctx) as pool:
+            futures = {pool.submit(_run_shard, i, buckets[i], options): i for i in active}
+            for future in as_completed(futures):
+                shard = futures[future]
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    logger.error(f"❌ 分片 {shard} 进程异常退出：{str(e)}")
+                    continue
+                if outcome["error"]:
+                    logger.error(f"❌ 分片 {shard} 失败：{outcome['error']}")
+                else:
+                    logger.info(f"✅ 分片 {shard} 完成：{outcome['stats']}")
+                outcomes.append(outcome)
+    finally:
+        merge_outputs(workers)
+    return outcomes
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Cloudflare Bypass Crawler Pro - 多进程分片模式")
+    parser.add_argument("-f", "--url-file", help="URL列表文件（每行一个），传 - 从stdin读取")
+    parser.add_argument("-w", "--workers", type=int, default=WORKER_PROCESSES, help="worker进程数（默认按CPU核数）")
+    parser.add_argument("-c", "--concurrency", type=int, default=CONCURRENCY, help=f"每个进程的并发数（默认{CONCURRENCY}）")
+    parser.add_argument("--depth", type=int, default=CRAWL_MAX_DEPTH, help="递归爬取同站链接的深度")
+    parser.add_argument("--incremental", action="store_true", default=REVISIT_ENABLE, help="增量爬取")
+    parser.add_argument("--tiered", action="store_true", default=TIER_ENABLE, help="分级抓取：先用HTTP请求，需要时才使用浏览器")
+    parser.add_argument("--resume", action="store_true", help="不读取URL列表，各分片继续上次中断的任务")
+    parser.add_argument("--fresh", action="store_true", help="清空各分片任务队列后重新开始")
+    return parser.parse_args()
+
+def main():
+    from main import load_urls
+
+    args = _parse_args()
+    if not args.url_file and not args.resume:
+        logger.error("❌ 需要 -f 指定URL列表，或使用 --resume 继续上次任务")
+        return
+    urls: List[str] = []
+    if args.url_file:
+        try:
+            urls = load_urls(args.url_file)
+        except OSError as e:
+            logger.error(f"❌ 读取URL列表失败：{str(e)}")
+            return
+    workers = args.workers if args.workers > 0 else max(1, os.cpu_count() or 1)
+    options = {
+        "concurrency": args.concurrency,
+        "depth": args.depth,
+        "incremental": args.incremental,
+        "tiered": args.tiered,
+        "fresh": args.fresh,
+        "resume": args.resume,
+    }
+    outcomes = launch(urls, workers, options)
+    results = [r for o in outcomes for r in o["results"]]
+    ok = sum(1 for r in results if r["ok"])
+    if args.depth <= 0:
+        with open(BATCH_REPORT_PATH, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        logger.info(f"✅ 逐URL结果已保存到 {BATCH_REPORT_PATH}")
+    print("\n" + "="*80)
+    print(f"✅ 多进程爬取完成：{len(outcomes)}/{workers} 个分片正常结束，本次成功 {ok}，失败 {len(results) - ok}")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        logger.info("⚠️ 用户手动终止程序")
+    except Exception as e:
+        logger.critical(f"❌ 程序异常退出：{str(e)}")
+        sys.exit(1)
@@ -1,12 +1,31 @@
 # -*- coding: utf-8 -*-
 import sys
+import json
+import time
 import asyncio
+import argparse
 import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from core.browser import BrowserCore
-from core.proxy import ProxyPool
 from core.cookie import CookieManager
-from core.cf_handler import CFHandler
-from config import MAX_RETRY, LOG_LEVEL
+from core.cf_handler import CFHandler, CFStatus
+from core.human import HumanEmulator
+from core.content import extract_content
+from core.metrics import metrics, host_of
+from core.frontier import Frontier
+from core.links import LinkScope, extract_links, normalize_url
+from core.revisit import RevisitStore
+from core.scheduler import HostScheduler
+from core.capture import ResponseCapture
+from core.fetcher import TieredFetcher
+from core.runtime import CrawlerRuntime
+from core.retry import (
+    breaker, classify, retry_policy, backoff_delay, url_deadline,
+    CrawlError, NavigationTimeout, BlockedError, ChallengeTimeout, CircuitOpenError
+)
+from config import MAX_RETRY, LOG_LEVEL, CONCURRENCY, BATCH_URL_TIMEOUT, BATCH_REPORT_PATH, FRONTIER_PATH, CRAWL_MAX_DEPTH, REVISIT_ENABLE, HOST_SCHEDULE, PROFILE_ENABLE, CAPTURE_PATTERNS, CAPTURE_EXPECT, CAPTURE_TIMEOUT, TIER_ENABLE
 
 # 配置日志（开源友好，输出到控制台）
 logging.basicConfig(
@@ -24,73 +43,467 @@ if sys.platform == 'win32':
     except (AttributeError, DeprecationWarning):
         asyncio.set_event_loop_policy(asyncio.DefaultEventLoopPolicy())
 
-async def crawl_once(browser_core: BrowserCore, cookie_mgr: CookieManager, cf_handler: CFHandler, url: str) -> str:
-    """单次爬取逻辑（保留原有核心逻辑，补充异常捕获）"""
+async def _revisit_check(revisit: RevisitStore, url: str, validator, headers, body) -> bool:
+    """记录本次校验信息，源码哈希与上次相同时返回True（调用方丢弃源码）"""
+    unchanged = validator is not None and validator.hash == body.hash
+    await revisit.put(url, headers.get("etag"), headers.get("last-modified"), body.hash)
+    if unchanged:
+        revisit.unchanged += 1
+        metrics.inc("unchanged", host_of(url), "same_hash")
+    return unchanged
+
+async def _fetch_http(fetcher: TieredFetcher, url: str, collect_links: bool,
+                      revisit: Optional[RevisitStore]) -> Optional[dict]:
+    """分级抓取的HTTP层，需要浏览器时返回None"""
+    validator = await revisit.get(url) if revisit is not None else None
+    result = await fetcher.fetch(url, collect_links, validator)
+    if result is None:
+        return None
+    headers = result.pop("headers")
+    if result["unchanged"]:
+        if revisit is not None:
+            revisit.unchanged += 1
+        metrics.inc("unchanged", host_of(url), "not_modified")
+    elif revisit is not None:
+        if await _revisit_check(revisit, url, validator, headers if result["http_status"] == 200 else {}, result["body"]):
+            result["body"].close()
+            result["body"] = None
+            result["unchanged"] = True
+    return result
+
+async def _navigate(page, url: str, timings: dict):
+    """导航到目标URL（等待DOMContentLoaded），记录耗时；超时转为可分类的 NavigationTimeout"""
+    with metrics.timer("navigate", host_of(url)) as t:
+        try:
+            response = await page.goto(url, wait_until="domcontentloaded")
+        except PlaywrightTimeoutError as e:
+            raise NavigationTimeout(f"页面导航超时：{str(e).splitlines()[0]}") from e
+    timings["navigate"] = round(t.elapsed, 3)
+    return response
+
+def _raise_for_cf(status: CFStatus, response):
+    """CF处理未放行时抛出对应错误：仍停留在挑战页为挑战超时，其余为封禁（均带上导航响应状态码）"""
+    if status in (CFStatus.FIVE_SECOND, CFStatus.TURNSTILE):
+        raise ChallengeTimeout(f"CF验证超时未放行，当前状态：{status.value}", response.status if response else None)
+    if status != CFStatus.NORMAL:
+        raise BlockedError(f"CF验证未通过，当前状态：{status.value}", response.status if response else None)
+
+async def _capture_page(browser_core: BrowserCore, cookie_mgr: CookieManager, cf_handler: CFHandler, page,
+                        url: str, capture: ResponseCapture) -> dict:
+    """接口捕获：命中的响应边到边写入结果输出，收到预期数量即结束，跳过行为仿真与源码提取
+
+    CF检测与等待并行进行：接口先返回则直接结束；页面是验证页时接口要等放行后才会请求
+    """
+    timings = {}
+    host = host_of(url)
+    pending = capture.attach(page, url)
+    try:
+        response = await _navigate(page, url, timings)
+        status: Optional[CFStatus] = None
+        with metrics.timer("capture", host) as t:
+            waiter = asyncio.create_task(pending.done.wait())
+            checker = asyncio.create_task(cf_handler.handle(page))
+            try:
+                deadline = time.monotonic() + CAPTURE_TIMEOUT
+                was_parked = False
+                while not waiter.done():
+                    if checker.done() and status is None:
+                        status = checker.result()
+                        _raise_for_cf(status, response)
+                    now = time.monotonic()
+                    parked = cf_handler.verify.is_parked(page)
+                    if parked or was_parked:
+                        # 等待人工验证期间不计入捕获超时，结束挂起后重新计时（挂起本身有 VERIFY_TIMEOUT）
+                        deadline = now + CAPTURE_TIMEOUT
+                    elif now >= deadline:
+                        break
+                    was_parked = parked
+                    waiting = {waiter} if checker.done() else {waiter, checker}
+                    await asyncio.wait(waiting, timeout=1.0 if parked else deadline - now,
+                                       return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for task in (waiter, checker):
+                    task.cancel()
+                await asyncio.gather(waiter, checker, return_exceptions=True)
+            t.outcome = "complete" if pending.done.is_set() else "timeout"
+        timings["capture"] = round(t.elapsed, 3)
+    finally:
+        # 页面归还前写完已命中的响应
+        await pending.close()
+    if not pending.count:
+        raise CrawlError(f"{CAPTURE_TIMEOUT}秒内未捕获到匹配的接口响应", response.status if response else None)
+    if capture.expect and pending.count < capture.expect:
+        logger.warning(f"⚠️ [{url}] 只捕获到 {pending.count}/{capture.expect} 个接口响应")
+    with metrics.timer("cookie_save", host):
+        await cookie_mgr.save_cookies(page.context, url)
+    return {
+        "body": None,
+        "http_status": response.status if response else None,
+        "cf_status": status.value if status is not None else None,
+        "timings": timings,
+        "blocked": browser_core.route_stats(page).as_dict(),
+        "links": None,
+        "unchanged": False,
+        "profile": await browser_core.profile(page),
+        "captured": pending.count,
+    }
+
+async def crawl_once(browser_core: BrowserCore, cookie_mgr: CookieManager, cf_handler: CFHandler, url: str,
+                     collect_links: bool = False, revisit: Optional[RevisitStore] = None,
+                     capture: Optional[ResponseCapture] = None, fetcher: Optional[TieredFetcher] = None) -> dict:
+    """单次爬取逻辑（从预热页面池租借页面，用完归还复用），返回源码及各阶段耗时
+
+    collect_links 时附带页面链接；revisit 不为空时按上次的校验信息发条件请求，
+    源站返回304或源码哈希未变时标记 unchanged，不返回源码；
+    capture 不为空时为接口捕获模式，命中的接口响应直接写入结果输出，不返回源码；
+    fetcher 不为空时先尝试轻量HTTP请求，需要浏览器时才租借页面
+    """
+    timings = {}
+    host = host_of(url)
     try:
-        page = await browser_core.new_page()
-        # 应用CF绕过处理
-        await cf_handler.bypass(page, url)
-        # 获取页面源码
-        source = await page.content()
-        # 保存Cookie
-        await cookie_mgr.save_cookies(page.context.cookies())
-        await page.close()
-        return source
+        if fetcher is not None and capture is None:
+            result = await _fetch_http(fetcher, url, collect_links, revisit)
+            if result is not None:
+                return result
+        async with browser_core.lease_page() as page:
+            # 导航前加载已保存的CF会话，复访时跳过重新验证
+            await cookie_mgr.load_cookies(page.context, url)
+            if capture is not None:
+                return await _capture_page(browser_core, cookie_mgr, cf_handler, page, url, capture)
+            validator = await revisit.get(url) if revisit is not None else None
+            if validator is not None:
+                await browser_core.set_conditional_headers(page, validator.headers())
+            response = await _navigate(page, url, timings)
+            if validator is not None and response is not None and response.status == 304:
+                # 未修改：跳过行为仿真、CF处理与源码提取
+                revisit.unchanged += 1
+                metrics.inc("unchanged", host, "not_modified")
+                return {"body": None, "http_status": 304, "cf_status": None, "timings": timings,
+                        "blocked": browser_core.route_stats(page).as_dict(), "links": None, "unchanged": True}
+            # 行为仿真 + CF分级处理
+            with metrics.timer("cf_handle", host) as t:
+                await HumanEmulator.emulate(page)
+                status = await cf_handler.handle(page)
+                t.outcome = status.value
+            timings["cf"] = round(t.elapsed, 3)
+            _raise_for_cf(status, response)
+            # 获取页面源码
+            with metrics.timer("content", host) as t:
+                body = await extract_content(page)
+            timings["content"] = round(t.elapsed, 3)
+            links = None
+            if collect_links:
+                with metrics.timer("links", host) as t:
+                    links = await extract_links(page)
+                timings["links"] = round(t.elapsed, 3)
+            unchanged = False
+            if revisit is not None:
+                # 只有直接返回200的页面才记录校验头（CF过渡页的响应头不代表真实页面）
+                headers = response.headers if response is not None and response.status == 200 else {}
+                unchanged = await _revisit_check(revisit, url, validator, headers, body)
+                if unchanged:
+                    body.close()
+                    body = None
+            stats = browser_core.route_stats(page)
+            if stats.blocked:
+                logger.info(f"🚫 [{url}] 已拦截 {stats.blocked}/{stats.requests} 个请求，约节省 {stats.blocked_bytes // 1024}KB")
+                metrics.inc("blocked_requests", host, value=stats.blocked)
+            # 保存Cookie
+            with metrics.timer("cookie_save", host):
+                await cookie_mgr.save_cookies(page.context, url)
+            profile = await browser_core.profile(page)
+            return {
+                "body": body,
+                "http_status": response.status if response else None,
+                "cf_status": status.value,
+                "timings": timings,
+                "blocked": stats.as_dict(),
+                "links": links,
+                "unchanged": unchanged,
+                "profile": profile,
+            }
     except Exception as e:
         logger.error(f"❌ 单次爬取失败：{str(e)}")
         raise e
 
+async def crawl_url(browser_core: BrowserCore, cookie_mgr: CookieManager, cf_handler: CFHandler, url: str,
+                    collect_links: bool = False, revisit: Optional[RevisitStore] = None,
+                    capture: Optional[ResponseCapture] = None, fetcher: Optional[TieredFetcher] = None) -> dict:
+    """按错误类型重试爬取单个URL（各类型独立的次数上限与退避抖动），全部失败时抛出最后一次异常
+
+    总尝试次数不超过MAX_RETRY；host熔断时不占用浏览器，直接抛出CircuitOpenError
+    """
+    host = host_of(url)
+    last_error: Optional[Exception] = None
+    attempts: Dict[str, int] = {}
+    for retry in range(1, MAX_RETRY + 1):
+        if not breaker.allow(host):
+            raise CircuitOpenError(f"{host} 连续失败已熔断，暂不爬取", breaker.retry_after(host))
+        logger.info(f"[{url}] 第 {retry}/{MAX_RETRY} 次尝试")
+        try:
+            result = await crawl_once(browser_core, cookie_mgr, cf_handler, url, collect_links, revisit, capture, fetcher)
+            if result["unchanged"] or result.get("captured") or result["body"].size:
+                breaker.record(host, True)
+                result["attempts"] = retry
+                return result
+            result["body"].close()
+            raise CrawlError("页面源码为空", result["http_status"])
+        except asyncio.CancelledError:
+            breaker.record(host, None)
+            raise
+        except Exception as e:
+            last_error = e
+            kind = classify(e)
+            # 浏览器崩溃/人工验证中止与目标host无关，不计入熔断
+            breaker.record(host, None if kind in ("browser_crash", "verify_aborted") else False)
+            attempts[kind] = attempts.get(kind, 0) + 1
+            limit = retry_policy(kind)[0]
+            if attempts[kind] >= limit or retry == MAX_RETRY:
+                logger.error(f"❌ [{url}] 第{retry}次尝试失败（{kind}），不再重试：{str(e)}")
+                break
+            delay = backoff_delay(kind, attempts[kind])
+            metrics.inc("retry", host, kind)
+            logger.error(f"❌ [{url}] 第{retry}次尝试失败（{kind}），{delay:.1f}s后重试：{str(e)}")
+            await asyncio.sleep(delay)
+    raise last_error
+
+async def crawl_record(browser_core: BrowserCore, cookie_mgr: CookieManager, cf_handler: CFHandler, url: str,
+                       collect_links: bool = False, revisit: Optional[RevisitStore] = None,
+                       capture: Optional[ResponseCapture] = None, fetcher: Optional[TieredFetcher] = None) -> dict:
+    """爬取单个URL并整理为结果记录（失败不抛异常，记录错误信息）"""
+    start = time.monotonic()
+    record = {"url": url, "ok": False, "error": None, "body": None}
+    token = url_deadline.set(time.monotonic() + BATCH_URL_TIMEOUT)
+    try:
+        # 单URL超时兜底，慢页面不拖住整批任务
+        result = await asyncio.wait_for(
+            crawl_url(browser_core, cookie_mgr, cf_handler, url, collect_links, revisit, capture, fetcher),
+            timeout=BATCH_URL_TIMEOUT
+        )
+        record.update(result, ok=True)
+    except asyncio.TimeoutError:
+        record["error"] = f"超过{BATCH_URL_TIMEOUT}秒未完成"
+        record["error_kind"] = "url_timeout"
+    except Exception as e:
+        record["error"] = str(e) or e.__class__.__name__
+        record["error_kind"] = classify(e)
+        # 失败时同样带上导航响应状态码（503/429拦截页），调度器据此对该host退避
+        record["http_status"] = getattr(e, "http_status", None)
+        if isinstance(e, CircuitOpenError):
+            record["retry_after"] = e.retry_after
+    finally:
+        url_deadline.reset(token)
+    record["elapsed"] = round(time.monotonic() - start, 2)
+    metrics.observe("crawl_total", record["elapsed"], host_of(url), "ok" if record["ok"] else "error")
+    return record
+
+def load_urls(path: str) -> List[str]:
+    """从文件读取URL列表（path为 - 时读取stdin），忽略空行/注释/非法URL并去重"""
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        lines = Path(path).read_text(encoding="utf-8").splitlines()
+    urls: List[str] = []
+    seen = set()
+    for line in lines:
+        url = line.strip()
+        if not url or url.startswith("#"):
+            continue
+        if not url.startswith(("http://", "https://")):
+            logger.warning(f"⚠️ 跳过非法URL：{url}")
+            continue
+        if url not in seen:
+            seen.add(url)
+            urls.append(url)
+    return urls
+
+async def run_batch(browser_core: BrowserCore, cookie_mgr: CookieManager, cf_handler: CFHandler,
+                    frontier, writer, concurrency: int = CONCURRENCY,
+                    scope: Optional[LinkScope] = None, revisit: Optional[RevisitStore] = None,
+                    scheduler: Optional[HostScheduler] = None,
+                    capture: Optional[ResponseCapture] = None,
+                    fetcher: Optional[TieredFetcher] = None) -> List[dict]:
+    """有界并发批量爬取：N个worker共享同一个BrowserCore，从任务队列领取URL，结果流式交给写后队列并回写任务状态
+
+    frontier 为 Frontier（SQLite持久化，可中断恢复）或 MemoryFrontier（仅内存）
+    writer 为 SinkWriter 或包装它的 ExtractionStage（均提供 put）
+    scope 不为空时递归爬取：页面内提取的链接经范围过滤/去重后加入任务队列；
+    此时URL规模不可预知，逐URL汇总不在内存中保留（状态以任务队列为准）
+    revisit 不为空时增量爬取：未变化的页面不写入结果输出
+    scheduler 不为空时按host限速派发，单个host受限时优先爬取其他host
+    capture 不为空时为接口捕获模式，页面记录只保留状态，接口响应由捕获器逐条写入
+    fetcher 不为空时分级抓取：不需要浏览器的页面直接由HTTP请求完成
+    """
+    results: List[dict] = []
+    done = 0
+
+    async def worker(worker_id: int):
+        nonlocal done
+        while True:
+            url = await (scheduler.next() if scheduler is not None else frontier.next())
+            if url is None:
+                return
+            record = await crawl_record(browser_core, cookie_mgr, cf_handler, url, scope is not None, revisit, capture, fetcher)
+            if record.get("error_kind") == "circuit_open":
+                # host熔断中URL未被爬取：任务队列在冷却结束后重新派发，本次不计入结果
+                if scheduler is not None:
+                    scheduler.release(url, record["elapsed"], None, False)
+                await frontier.complete(url, False, record["error"], "circuit_open", record["retry_after"])
+                logger.info(f"⏸️ [worker-{worker_id}] {url} 所属host熔断中，{record['retry_after']:.0f}s后重新派发")
+                continue
+            links = record.pop("links", None)
+            if links:
+                depth = frontier.depth_of(url)
+                found = scope.admit(links, depth)
+                if found:
+                    await frontier.add(found, depth + 1)
+                record["new_links"] = len(found)
+            # 源码只进写入队列，汇总中不保留
+            if not record.get("unchanged"):
+                await writer.put(record)
+            if scheduler is not None:
+                scheduler.release(url, record["elapsed"], record.get("http_status"), record["ok"])
+            await frontier.complete(url, record["ok"], record["error"], record.get("error_kind"))
+            if scope is None:
+                results.append({k: v for k, v in record.items() if k != "body"})
+            done += 1
+            if record.get("unchanged"):
+                logger.info(f"✅ [worker-{worker_id}] (已完成{done}) {url} 未变化，耗时{record['elapsed']}s")
+            elif record.get("captured"):
+                logger.info(f"✅ [worker-{worker_id}] (已完成{done}) {url} 捕获 {record['captured']} 个接口响应，耗时{record['elapsed']}s")
+            elif record["ok"]:
+                logger.info(f"✅ [worker-{worker_id}] (已完成{done}) {url} 成功，耗时{record['elapsed']}s")
+            else:
+                logger.error(f"❌ [worker-{worker_id}] (已完成{done}) {url} 失败：{record['error']}")
+
+    workers = max(1, concurrency)
+    logger.info(f"批量模式启动：并发 {workers}" + ("，按host限速派发" if scheduler is not None else ""))
+    if scheduler is not None:
+        scheduler.start(frontier, workers)
+    try:
+        await asyncio.gather(*(worker(i) for i in range(1, workers + 1)))
+    finally:
+        if scheduler is not None:
+            await scheduler.close()
+    return results
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Cloudflare Bypass Crawler Pro")
+    parser.add_argument("-f", "--url-file", help="批量模式：URL列表文件（每行一个），传 - 从stdin读取")
+    parser.add_argument("-c", "--concurrency", type=int, default=CONCURRENCY, help=f"批量模式并发数（默认{CONCURRENCY}）")
+    parser.add_argument("--frontier", default=FRONTIER_PATH, help=f"批量模式任务队列路径（默认{FRONTIER_PATH}）")
+    parser.add_argument("--resume", action="store_true", help="不读取URL列表，继续上次中断的批量任务")
+    parser.add_argument("--depth", type=int, default=CRAWL_MAX_DEPTH, help=f"批量模式递归爬取同站链接的深度（默认{CRAWL_MAX_DEPTH}，不递归）")
+    parser.add_argument("--incremental", action="store_true", default=REVISIT_ENABLE,
+                        help="增量爬取：带条件请求头复访，未变化的页面跳过提取与输出")
+    parser.add_argument("--profile", action="store_true", default=PROFILE_ENABLE,
+                        help="采集每次爬取的CDP性能指标与网络摘要，失败/慢页面保存HAR")
+    parser.add_argument("--capture", action="append", default=list(CAPTURE_PATTERNS), metavar="REGEX",
+                        help="接口捕获模式：只保存URL匹配该正则的JSON响应（可重复指定），不等待渲染")
+    parser.add_argument("--expect", type=int, default=CAPTURE_EXPECT,
+                        help=f"接口捕获模式每页捕获到多少个响应后结束（默认{CAPTURE_EXPECT}，0表示等到超时）")
+    parser.add_argument("--tiered", action="store_true", default=TIER_ENABLE,
+                        help="分级抓取：先用HTTP请求，命中CF特征或页面依赖JS时才使用浏览器")
+    parser.add_argument("--fresh", action="store_true", help="清空任务队列后重新开始（默认已完成的URL不再爬取）")
+    return parser.parse_args()
+
 async def main():
     """主函数（开源友好，交互清晰）"""
+    args = _parse_args()
     print("="*80)
     print("      Cloudflare Bypass Crawler Pro - 工业级绕过版")
     print("      支持CF 5秒盾/Turnstile/深度指纹/IP封禁检测")
     print("="*80 + "\n")
 
-    # 获取目标URL
-    url = input("请输入目标URL（含https://）：").strip()
-    if not url.startswith(("http://", "https://")):
-        logger.error("❌ URL格式错误，必须以http://或https://开头")
-        return
+    # 获取目标URL（批量模式从文件/stdin读取，--resume 时直接使用已有任务队列）
+    urls: List[str] = []
+    batch = bool(args.url_file or args.resume)
+    if args.url_file:
+        try:
+            urls = load_urls(args.url_file)
+        except OSError as e:
+            logger.error(f"❌ 读取URL列表失败：{str(e)}")
+            return
+        if not urls:
+            logger.error("❌ URL列表为空")
+            return
+    elif not args.resume:
+        url = input("请输入目标URL（含https://）：").strip()
+        if not url.startswith(("http://", "https://")):
+            logger.error("❌ URL格式错误，必须以http://或https://开头")
+            return
+        urls = [url]
+
+    frontier: Optional[Frontier] = None
+    scope: Optional[LinkScope] = None
+    if batch:
+        frontier = Frontier(args.frontier)
+        if args.fresh:
+            frontier.reset()
+        if args.depth > 0:
+            # 初始URL同样规范化，与页面中指回它们的链接按同一形式去重
+            urls = [normalize_url(u) or u for u in urls]
+            scope = LinkScope(urls + frontier.seeds(), args.depth)
+            logger.info(f"递归爬取：深度 {args.depth}，同站规则 {scope.same_site}")
+        await frontier.add(urls)
+        await frontier.flush()
+        logger.info(f"任务队列 {args.frontier}：{frontier.stats()}")
 
     # 初始化核心组件
     logger.info("初始化核心组件...")
-    proxy_pool = ProxyPool()
-    browser_core = BrowserCore(proxy_pool)
-    cookie_mgr = CookieManager()
-    cf_handler = CFHandler()
+    runtime = CrawlerRuntime(args.concurrency if batch else 1, args.profile, args.incremental, args.tiered, frontier)
+    browser_core, cookie_mgr, cf_handler = runtime.browser_core, runtime.cookie_mgr, runtime.cf_handler
+    revisit, fetcher = runtime.revisit, runtime.fetcher
 
     # 初始化浏览器
-    if not await browser_core.init():
+    if not await runtime.start():
         logger.critical("❌ 浏览器初始化失败，程序退出")
+        await runtime.close()
         return
 
-    # 多轮重试爬取
-    source = None
-    for retry in range(1, MAX_RETRY + 1):
-        logger.info(f"第 {retry}/{MAX_RETRY} 次尝试")
-        try:
-            source = await crawl_once(browser_core, cookie_mgr, cf_handler, url)
-            if source:
-                logger.info("✅ 爬取成功！")
-                break
-        except Exception as e:
-            logger.error(f"❌ 第{retry}次尝试失败：{str(e)}")
-            if retry == MAX_RETRY:
-                logger.critical("❌ 所有重试均失败，程序退出")
-
-    # 输出结果（可选：保存到文件）
-    if source:
-        print("\n" + "="*80)
-        print("✅ 爬取成功，页面源码前500字符预览：")
-        print(source[:500] + "..." if len(source) > 500 else source)
-        # 可选：保存源码到文件
-        with open("crawl_result.html", "w", encoding="utf-8") as f:
-            f.write(source)
-        logger.info("✅ 爬取结果已保存到 crawl_result.html")
-
-    # 释放资源
-    await browser_core.close()
+    # 配置了提取规则时，结果先经进程池结构化提取再写入
+    output = runtime.output
+    # 接口响应不是HTML，不经结构化提取直接写入
+    capture = ResponseCapture(runtime.writer, args.capture, expect=args.expect) if args.capture else None
+    if capture is not None:
+        logger.info(f"接口捕获模式：{args.capture}，每页 {args.expect or '直到超时'} 个响应")
+    try:
+        if frontier is not None:
+            scheduler = HostScheduler() if HOST_SCHEDULE else None
+            results = await run_batch(browser_core, cookie_mgr, cf_handler, frontier, output,
+                                      args.concurrency, scope, revisit, scheduler, capture, fetcher)
+            await frontier.flush()
+            print("\n" + "="*80)
+            if scope is None:
+                ok = sum(1 for r in results if r["ok"])
+                with open(BATCH_REPORT_PATH, "w", encoding="utf-8") as f:
+                    json.dump(results, f, ensure_ascii=False, indent=2)
+                print(f"✅ 批量爬取完成：本次成功 {ok}/{len(results)}，失败 {len(results) - ok}")
+                logger.info(f"✅ 逐URL结果已保存到 {BATCH_REPORT_PATH}")
+            else:
+                print(f"✅ 递归爬取完成，已发现URL约 {scope.seen.count} 个")
+            print(f"   任务队列状态：{frontier.stats()}")
+            return
+
+        # 单URL多轮重试爬取
+        record = await crawl_record(browser_core, cookie_mgr, cf_handler, urls[0], revisit=revisit,
+                                    capture=capture, fetcher=fetcher)
+        if not record["ok"]:
+            logger.critical(f"❌ 所有重试均失败，程序退出：{record['error']}")
+        elif record.get("unchanged"):
+            logger.info("✅ 页面自上次爬取以来未变化，跳过输出")
+            return
+        elif record.get("captured"):
+            logger.info(f"✅ 已捕获 {record['captured']} 个接口响应")
+        else:
+            logger.info("✅ 爬取成功！")
+            preview = record["body"].preview(501)
+            print("\n" + "="*80)
+            print("✅ 爬取成功，页面源码前500字符预览：")
+            print(preview[:500] + "..." if len(preview) > 500 else preview)
+        await output.put(record)
+    finally:
+        await runtime.close()
 
 if __name__ == "__main__":
     try:
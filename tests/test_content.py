@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import json
+import shutil
+import asyncio
+import hashlib
+import subprocess
+import pytest
+
+pytest.importorskip("playwright")
+from core.content import ContentBody, extract_content
+
+_NODE = shutil.which("node")
+
+class _NodeHandle:
+    """用node执行页面侧JS的句柄替身：与浏览器一样按UTF-16下标切片，结果经JSON回传"""
+    def __init__(self, html: str):
+        self.html = html
+
+    async def evaluate(self, js: str, arg=None):
+        script = (
+            "let data = '';"
+            "process.stdin.on('data', c => data += c);"
+            "process.stdin.on('end', () => {"
+            "  const [html, arg] = JSON.parse(data);"
+            f"  const fn = {js};"
+            "  process.stdout.write(JSON.stringify(fn(html, arg)));"
+            "});"
+        )
+        out = subprocess.run([_NODE, "-e", script], input=json.dumps([self.html, arg]).encode(),
+                             capture_output=True, check=True).stdout
+        return json.loads(out)
+
+    async def dispose(self):
+        pass
+
+class _Page:
+    def __init__(self, html: str):
+        self.html = html
+
+    async def evaluate_handle(self, js: str):
+        return _NodeHandle(self.html)
+
+@pytest.mark.skipif(_NODE is None, reason="需要node执行页面侧JS")
+@pytest.mark.parametrize("chunk_chars", [4, 5, 6])
+def test_emoji_on_chunk_boundary(chunk_chars):
+    # "aaa😀b"：😀在UTF-16中占两个单元（下标3、4），块大小4时边界正好落在代理对中间
+    html = "aaa\U0001F600b" * 3
+    body = asyncio.run(extract_content(_Page(html), max_chars=0, chunk_chars=chunk_chars))
+    try:
+        assert body.read_text() == html
+        assert body.hash == hashlib.sha256(html.encode("utf-8")).hexdigest()
+        # 严格UTF-8编码（JsonlSink写入方式）不应失败
+        body.read_text().encode("utf-8")
+    finally:
+        body.close()
+
+@pytest.mark.skipif(_NODE is None, reason="需要node执行页面侧JS")
+def test_truncation_does_not_split_surrogate_pair():
+    html = "aaa\U0001F600bbbb"
+    body = asyncio.run(extract_content(_Page(html), max_chars=4, chunk_chars=2))
+    try:
+        # 截断位置落在代理对中间时保留完整字符
+        assert body.truncated
+        assert body.read_text() == "aaa\U0001F600"
+    finally:
+        body.close()
+
+def test_read_text_stops_at_limit():
+    body = ContentBody.from_text("\u4e2d" * 10)
+    try:
+        # 按块读取时多字节字符不被截断，读够字符数即停止
+        assert body.read_text(3) == "\u4e2d" * 3
+        assert body.read_text(0) == "\u4e2d" * 10
+        assert body.read_text(100) == "\u4e2d" * 10
+    finally:
+        body.close()
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("playwright")
+from daemon import CrawlDaemon
+
+@pytest.mark.parametrize("payload", [["https://example.com"], "https://example.com", 1, None])
+def test_non_object_payload_is_rejected(payload):
+    with pytest.raises(ValueError):
+        CrawlDaemon._parse_urls(payload)
+
+def test_urls_are_validated():
+    assert CrawlDaemon._parse_urls({"url": "https://example.com"}) == ["https://example.com"]
+    with pytest.raises(ValueError):
+        CrawlDaemon._parse_urls({"urls": ["ftp://example.com"]})
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("playwright")
+from core.fetcher import TieredFetcher
+
+_PAGE = ("<html><head><title>ok</title></head><body><p>" + "text " * 100 + "</p></body></html>").encode()
+
+class _Content:
+    async def iter_chunked(self, size):
+        yield _PAGE
+
+class _Response:
+    status = 200
+    charset = "utf-8"
+    url = "https://example.com/"
+    headers = {"content-type": "text/html; charset=utf-8"}
+    content = _Content()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+class _Session:
+    closed = False
+
+    def __init__(self):
+        self.proxies = []
+
+    def get(self, url, headers, proxy):
+        self.proxies.append(proxy)
+        return _Response()
+
+class _Pool:
+    enable = True
+
+    def __init__(self, proxy: str):
+        self.proxies = [proxy]
+        self.calls = 0
+
+    async def get_valid_proxy(self):
+        self.calls += 1
+        return self.proxies[0]
+
+def _fetcher(tmp_path, proxy: str):
+    pool = _Pool(proxy)
+    fetcher = TieredFetcher(pool, state_path=str(tmp_path / "tiers.json"))
+    session = _Session()
+    fetcher._session_get = lambda: session
+    return fetcher, pool, session
+
+def test_proxy_is_picked_once_per_host(tmp_path):
+    fetcher, pool, session = _fetcher(tmp_path, "http://127.0.0.1:8080")
+
+    async def run():
+        for path in ("a", "b", "c"):
+            result = await fetcher.fetch(f"https://example.com/{path}")
+            result["body"].close()
+
+    asyncio.run(run())
+    assert pool.calls == 1
+    assert session.proxies == ["http://127.0.0.1:8080"] * 3
+
+def test_socks_proxy_skips_http_tier(tmp_path):
+    fetcher, pool, session = _fetcher(tmp_path, "socks5://127.0.0.1:1080")
+
+    async def run():
+        return [await fetcher.fetch(f"https://example.com/{path}") for path in ("a", "b")]
+
+    assert asyncio.run(run()) == [None, None]
+    assert session.proxies == []
+    assert fetcher.escalated == 2
+    assert pool.calls == 1
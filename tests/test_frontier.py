@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+import time
+import asyncio
+import sqlite3
+from config import FRONTIER_MAX_ATTEMPTS
+from core.frontier import Frontier, MemoryFrontier, DONE, FAILED, IN_FLIGHT, PENDING
+
+URL = "https://example.com/page"
+
+def _state(frontier: Frontier, url: str):
+    return frontier._conn.execute("SELECT state, retries, last_error FROM jobs WHERE url = ?", (url,)).fetchone()
+
+def test_verify_aborted_is_not_requeued(tmp_path):
+    assert FRONTIER_MAX_ATTEMPTS > 1
+
+    async def run():
+        frontier = Frontier(str(tmp_path / "frontier.db"))
+        await frontier.add([URL])
+        assert await frontier.next() == URL
+        await frontier.complete(URL, False, "Turnstile人工验证已被跳过", "verify_aborted")
+        # 同一次运行中不会再次领取（否则验证页会被再次挂起）
+        assert await frontier.next() is None
+        row = _state(frontier, URL)
+        await frontier.close()
+        return row
+
+    assert asyncio.run(run()) == (FAILED, 1, "Turnstile人工验证已被跳过")
+
+def test_other_failure_is_requeued(tmp_path):
+    async def run():
+        frontier = Frontier(str(tmp_path / "frontier.db"))
+        await frontier.add([URL])
+        claimed = []
+        while (url := await frontier.next()) is not None:
+            claimed.append(url)
+            await frontier.complete(url, False, "页面导航超时", "navigation_timeout")
+        row = _state(frontier, URL)
+        await frontier.close()
+        return claimed, row
+
+    claimed, row = asyncio.run(run())
+    assert claimed == [URL] * FRONTIER_MAX_ATTEMPTS
+    assert row[:2] == (FAILED, FRONTIER_MAX_ATTEMPTS)
+
+def test_circuit_open_is_deferred_without_using_attempts(tmp_path):
+    async def run():
+        frontier = Frontier(str(tmp_path / "frontier.db"))
+        await frontier.add([URL])
+        assert await frontier.next() == URL
+        await frontier.complete(URL, False, "熔断中", "circuit_open", 0.2)
+        # 延后期间仍计入在途数，不会提前判定批次结束
+        assert frontier.active == 1
+        assert await frontier.poll() is None
+        start = time.monotonic()
+        assert await frontier.next() == URL
+        waited = time.monotonic() - start
+        # 再次熔断后中断：退回pending，尝试次数不变
+        await frontier.complete(URL, False, "熔断中", "circuit_open", 60)
+        await frontier.close()
+        reopened = Frontier(str(tmp_path / "frontier.db"))
+        row = _state(reopened, URL)
+        reopened._conn.close()
+        return waited, row
+
+    waited, row = asyncio.run(run())
+    assert waited >= 0.15
+    assert row[:2] == (PENDING, 0)
+
+def test_claim_in_order_and_ignore_duplicates(tmp_path):
+    urls = [f"https://example.com/{i}" for i in range(5)]
+
+    async def run():
+        frontier = Frontier(str(tmp_path / "frontier.db"))
+        await frontier.add(urls)
+        await frontier.add(urls[:2])
+        await frontier.add(["https://example.com/deep"], depth=1)
+        claimed = []
+        while (url := await frontier.next()) is not None:
+            claimed.append((url, frontier.depth_of(url)))
+            await frontier.complete(url, True)
+        stats = frontier.stats()
+        seeds = frontier.seeds()
+        await frontier.close()
+        return claimed, stats, seeds
+
+    claimed, stats, seeds = asyncio.run(run())
+    assert claimed == [(url, 0) for url in urls] + [("https://example.com/deep", 1)]
+    assert stats == {DONE: 6}
+    assert seeds == urls
+
+def test_resume_after_interrupt(tmp_path):
+    path = str(tmp_path / "frontier.db")
+    urls = [f"https://example.com/{i}" for i in range(3)]
+
+    async def interrupted():
+        frontier = Frontier(path)
+        await frontier.add(urls)
+        first = await frontier.next()
+        await frontier.complete(first, True)
+        # 第二个URL爬取中途中断：连接直接关闭，数据库中仍为in_flight
+        await frontier.next()
+        await frontier.flush()
+        frontier._conn.close()
+        return first
+
+    async def resumed():
+        frontier = Frontier(path)
+        remaining = []
+        while (url := await frontier.next()) is not None:
+            remaining.append(url)
+            await frontier.complete(url, True)
+        await frontier.close()
+        return remaining
+
+    first = asyncio.run(interrupted())
+    conn = sqlite3.connect(path)
+    states = sorted(state for (state,) in conn.execute("SELECT state FROM jobs"))
+    conn.close()
+    assert states == [DONE, IN_FLIGHT, IN_FLIGHT]
+    # 重新打开时在途任务（含已领取未开始的）恢复为pending
+    assert asyncio.run(resumed()) == [u for u in urls if u != first]
+
+def test_close_returns_unstarted_claims_to_pending(tmp_path):
+    urls = [f"https://example.com/{i}" for i in range(3)]
+
+    async def run():
+        frontier = Frontier(str(tmp_path / "frontier.db"))
+        await frontier.add(urls)
+        # 按批领取：取出一个后其余留在本地缓存
+        url = await frontier.next()
+        await frontier.complete(url, True)
+        await frontier.close()
+        reopened = Frontier(str(tmp_path / "frontier.db"))
+        stats = reopened.stats()
+        reopened._conn.close()
+        return stats
+
+    assert asyncio.run(run()) == {DONE: 1, PENDING: 2}
+
+def test_memory_frontier_waits_for_links_from_active_urls():
+    async def run():
+        frontier = MemoryFrontier(["https://example.com/", "https://example.com/"])
+        url = await frontier.next()
+        waiter = asyncio.create_task(frontier.next())
+        await asyncio.sleep(0.01)
+        # 在途URL发现新链接前，队列空但不结束
+        assert not waiter.done()
+        await frontier.add(["https://example.com/a"], depth=1)
+        await frontier.complete(url, True)
+        found = await waiter
+        depth = frontier.depth_of(found)
+        await frontier.complete(found, True)
+        return url, found, depth, await frontier.next()
+
+    assert asyncio.run(run()) == ("https://example.com/", "https://example.com/a", 1, None)
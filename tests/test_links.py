@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+pytest.importorskip("playwright")
+from core.links import BloomFilter, LinkScope, normalize_url
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTPS://Example.COM:443/a?b=2&a=1#top", "https://example.com/a?a=1&b=2"),
+    ("http://example.com:80", "http://example.com/"),
+    ("http://example.com:8080/x", "http://example.com:8080/x"),
+    ("https://user:pw@Example.com/", "https://user:pw@example.com/"),
+    ("https://example.com/?q=&a=1", "https://example.com/?a=1&q="),
+    ("mailto:someone@example.com", None),
+    ("javascript:void(0)", None),
+    ("https://example.com:99999/", None),
+])
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
+
+def test_bloom_filter_membership_and_error_rate():
+    bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+    items = [f"https://example.com/{i}" for i in range(10_000)]
+    for item in items:
+        bloom.add(item)
+    # 新元素可能被误判为已存在，此时不计数
+    assert len(items) * 0.98 < bloom.count <= len(items)
+    # 已加入的元素没有漏判
+    assert all(item in bloom for item in items)
+    assert all(bloom.add(item) for item in items[:100])
+    false_positives = sum(f"https://other.com/{i}" in bloom for i in range(10_000))
+    assert false_positives / 10_000 < 0.02
+
+def test_scope_filters_site_depth_and_duplicates():
+    scope = LinkScope(["https://www.example.com/"], max_depth=2, same_site="domain")
+    links = [
+        "HTTPS://WWW.example.com:443/#top",  # 与种子规范化后相同
+        "https://example.com/",              # 去掉www.后同站
+        "https://blog.example.com/post#c",   # 子域名同站
+        "https://blog.example.com/post",     # 去掉片段后重复
+        "https://other.com/",                # 站外
+        "ftp://example.com/file",
+    ]
+    assert scope.admit(links, 0) == ["https://example.com/", "https://blog.example.com/post"]
+    assert scope.admit(["https://example.com/deeper"], 2) == []
+
+def test_scope_host_mode():
+    scope = LinkScope(["https://www.example.com/"], max_depth=1, same_site="host")
+    assert scope.admit(["https://blog.example.com/", "https://www.example.com/a"], 0) == ["https://www.example.com/a"]
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+pytest.importorskip("aiohttp")
+from core.metrics import MetricsRegistry, BUCKETS, host_of
+
+def _registry() -> MetricsRegistry:
+    registry = MetricsRegistry()
+    registry.enable = True
+    return registry
+
+def test_snapshot_buckets_are_not_cumulative():
+    registry = _registry()
+    registry.observe("navigate", 0.03, "a.com")
+    registry.observe("navigate", 0.04, "a.com")
+    registry.observe("navigate", 120.0, "a.com")
+    registry.inc("retry", "a.com", "blocked", value=2)
+    snapshot = registry.snapshot()
+    (hist,) = snapshot["histograms"]
+    assert hist["counts"][BUCKETS.index(0.05)] == 2
+    assert hist["counts"][-1] == 1
+    assert (hist["count"], hist["sum"]) == (3, pytest.approx(120.07))
+    assert snapshot["counters"] == [{"name": "retry", "host": "a.com", "outcome": "blocked", "value": 2}]
+
+def test_prometheus_buckets_are_cumulative_and_labels_escaped():
+    registry = _registry()
+    registry.observe("navigate", 0.03, 'a"b', "ok")
+    registry.observe("navigate", 0.2, 'a"b', "ok")
+    text = registry.render_prometheus()
+    assert 'cf_crawler_phase_seconds_bucket{phase="navigate",host="a\\"b",outcome="ok",le="0.05"} 1' in text
+    assert 'cf_crawler_phase_seconds_bucket{phase="navigate",host="a\\"b",outcome="ok",le="0.25"} 2' in text
+    assert 'cf_crawler_phase_seconds_bucket{phase="navigate",host="a\\"b",outcome="ok",le="+Inf"} 2' in text
+    assert 'cf_crawler_phase_seconds_count{phase="navigate",host="a\\"b",outcome="ok"} 2' in text
+
+def test_disabled_registry_records_nothing():
+    registry = _registry()
+    registry.enable = False
+    registry.observe("navigate", 1.0)
+    registry.inc("retry")
+    assert registry.snapshot()["histograms"] == registry.snapshot()["counters"] == []
+
+def test_host_of():
+    assert host_of("https://Example.com:8443/a?b") == "example.com"
+    assert host_of("not a url") == "-"
+
+def test_merge_sums_snapshots():
+    shard = _registry()
+    shard.observe("navigate", 0.03, "a.com")
+    shard.inc("retry", "a.com", "blocked")
+    registry = _registry()
+    registry.observe("navigate", 0.04, "a.com")
+    registry.observe("navigate", 1.5, "b.com")
+    registry.merge(shard.snapshot())
+    registry.merge(shard.snapshot())
+    snapshot = registry.snapshot()
+    hists = {h["host"]: h for h in snapshot["histograms"]}
+    assert hists["a.com"]["counts"][BUCKETS.index(0.05)] == 3
+    assert (hists["a.com"]["count"], hists["a.com"]["sum"]) == (3, pytest.approx(0.1))
+    assert hists["b.com"]["count"] == 1
+    assert snapshot["counters"] == [{"name": "retry", "host": "a.com", "outcome": "blocked", "value": 2}]
+
+def test_merge_rejects_mismatched_buckets():
+    snapshot = _registry().snapshot()
+    snapshot["buckets"] = list(BUCKETS)[:-1]
+    with pytest.raises(ValueError):
+        _registry().merge(snapshot)
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+import random
+import pytest
+
+pytest.importorskip("aiohttp")
+from core.proxy import ProxyPool, ProxyStat, _AliasTable
+
+def test_alias_table_samples_by_weight():
+    random.seed(7)
+    items = ["a", "b", "c", "d"]
+    weights = [1.0, 2.0, 3.0, 4.0]
+    table = _AliasTable(items, weights)
+    n = 100_000
+    counts = dict.fromkeys(items, 0)
+    for _ in range(n):
+        counts[table.sample()] += 1
+    for item, weight in zip(items, weights):
+        assert counts[item] / n == pytest.approx(weight / sum(weights), abs=0.01)
+
+def test_single_item_table():
+    table = _AliasTable(["only"], [0.3])
+    assert {table.sample() for _ in range(100)} == {"only"}
+
+def test_rebuild_keeps_only_healthy_proxies():
+    pool = ProxyPool.__new__(ProxyPool)
+    pool.proxies = ["http://a:1", "http://b:1", "http://c:1"]
+    pool.stats = {p: ProxyStat() for p in pool.proxies}
+    pool.stats["http://a:1"].update(True, 0.2)
+    pool.stats["http://b:1"].update(False, 4.0)
+    # c 未检测过（无延迟），不进入可用集合
+    pool._rebuild()
+    assert {pool._table.sample() for _ in range(200)} == {"http://a:1"}
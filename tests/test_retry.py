@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import random
+import asyncio
+import pytest
+
+pytest.importorskip("playwright")
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from config import RETRY_POLICY
+from core.retry import (
+    CircuitBreaker, BlockedError, VerificationAborted, _PROBE_RECHECK, backoff_delay, classify, retry_policy,
+)
+
+HOST = "example.com"
+
+def _tripped(cooldown: float) -> CircuitBreaker:
+    breaker = CircuitBreaker(threshold=2, cooldown=cooldown)
+    for _ in range(2):
+        breaker.record(HOST, False)
+    return breaker
+
+def test_retry_after_covers_cooldown_then_probe():
+    breaker = _tripped(60)
+    assert not breaker.allow(HOST)
+    assert breaker.retry_after(HOST) == pytest.approx(60, abs=1)
+
+    breaker = _tripped(0)
+    # 冷却结束：放行一个探测请求，其余请求按复查间隔等待
+    assert breaker.allow(HOST)
+    assert not breaker.allow(HOST)
+    assert breaker.retry_after(HOST) == _PROBE_RECHECK
+
+@pytest.mark.parametrize("exc, kind", [
+    (BlockedError("403"), "blocked"),
+    (VerificationAborted("已跳过"), "verify_aborted"),
+    (PlaywrightTimeoutError("Timeout 30000ms exceeded"), "navigation_timeout"),
+    (asyncio.TimeoutError(), "navigation_timeout"),
+    (RuntimeError("Target closed"), "browser_crash"),
+    (RuntimeError("net::ERR_TIMED_OUT at https://example.com/"), "navigation_timeout"),
+    (ValueError("boom"), "other"),
+])
+def test_classify(exc, kind):
+    assert classify(exc) == kind
+
+def test_unknown_kind_uses_other_policy():
+    assert retry_policy("no_such_kind") == RETRY_POLICY["other"]
+
+def test_backoff_delay_stays_within_capped_window():
+    random.seed(0)
+    _, base, cap = retry_policy("navigation_timeout")
+    for attempt in range(1, 8):
+        limit = min(cap, base * 2 ** (attempt - 1))
+        delays = [backoff_delay("navigation_timeout", attempt) for _ in range(200)]
+        assert all(0 <= d <= limit for d in delays)
+        # 全抖动：取值分散在整个区间内
+        assert max(delays) > limit / 2
+
+def test_half_open_probe_success_resets():
+    breaker = _tripped(0)
+    assert breaker.allow(HOST)
+    breaker.record(HOST, True)
+    assert breaker.allow(HOST) and breaker.allow(HOST)
+    assert breaker.retry_after(HOST) == 0.0
+
+def test_half_open_probe_failure_reopens():
+    breaker = _tripped(0)
+    assert breaker.allow(HOST)
+    breaker.cooldown = 60
+    breaker.record(HOST, False)
+    assert not breaker.allow(HOST)
+    assert breaker.retry_after(HOST) == pytest.approx(60, abs=1)
+
+def test_unrelated_probe_result_releases_probe_slot():
+    breaker = _tripped(0)
+    assert breaker.allow(HOST)
+    # 浏览器崩溃等与host无关的结果：不计失败，只释放探测名额
+    breaker.record(HOST, None)
+    assert breaker.allow(HOST)
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import time
+import asyncio
+import pytest
+
+pytest.importorskip("aiohttp")
+from config import HOST_MIN_IN_FLIGHT, HOST_BACKOFF
+from core.scheduler import HostScheduler
+
+URL = "https://example.com/page"
+
+def _dispatched(scheduler: HostScheduler, limit: int):
+    state = scheduler._state(URL)
+    state.robots_pending = False
+    state.limit = limit
+    state.take()
+    return state
+
+def test_failed_503_backs_off_host():
+    scheduler = HostScheduler()
+    state = _dispatched(scheduler, 4)
+    scheduler.release(URL, 1.0, 503, False)
+    assert state.limit == max(HOST_MIN_IN_FLIGHT, 2)
+    assert state.tokens == 0
+    # 暂停期间不再派发该host
+    assert state.wait_time(time.monotonic()) == pytest.approx(HOST_BACKOFF, abs=1.0)
+
+def test_successful_503_page_is_not_throttle():
+    scheduler = HostScheduler()
+    state = _dispatched(scheduler, 4)
+    scheduler.release(URL, 1.0, 503, True)
+    assert state.limit == 4
+    assert state.wait_time(time.monotonic()) == 0
+
+def test_blocked_failure_record_carries_status(monkeypatch):
+    pytest.importorskip("playwright")
+    import main
+    from core.retry import BlockedError
+
+    async def blocked(*args, **kwargs):
+        raise BlockedError("CF验证未通过，当前状态：unknown", 503)
+
+    monkeypatch.setattr(main, "crawl_url", blocked)
+    record = asyncio.run(main.crawl_record(None, None, None, URL))
+    assert not record["ok"]
+    assert record["error_kind"] == "blocked"
+    assert record["http_status"] == 503
+
+    scheduler = HostScheduler()
+    state = _dispatched(scheduler, 4)
+    scheduler.release(URL, record["elapsed"], record.get("http_status"), record["ok"])
+    assert state.limit < 4
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import json
+import asyncio
+import sqlite3
+import pytest
+
+pytest.importorskip("playwright")
+from core.content import ContentBody
+from core.sink import SinkWriter, JsonlSink, SqliteSink
+
+HTML = "<html><body>你好</body></html>"
+
+def _record(url: str, html: str) -> dict:
+    return {"url": url, "ok": True, "error": None, "body": ContentBody.from_text(html)}
+
+def _write(sinks, records):
+    async def run():
+        writer = SinkWriter(sinks)
+        writer.start()
+        for record in records:
+            await writer.put(record)
+        await writer.close()
+        return writer
+
+    return asyncio.run(run())
+
+def test_duplicate_body_is_written_once(tmp_path):
+    jsonl = tmp_path / "results.jsonl"
+    db = tmp_path / "results.db"
+    records = [_record("https://a.com/", HTML), _record("https://b.com/", HTML), _record("https://c.com/", HTML + " ")]
+    writer = _write([JsonlSink(str(jsonl)), SqliteSink(str(db))], records)
+    assert (writer.written, writer.duplicates) == (3, 1)
+
+    lines = [json.loads(line) for line in jsonl.read_text(encoding="utf-8").splitlines()]
+    assert [line["html"] for line in lines] == [HTML, None, HTML + " "]
+    # 重复内容仍记录哈希，可据此找到已写过的源码
+    assert lines[0]["hash"] == lines[1]["hash"] != lines[2]["hash"]
+
+    conn = sqlite3.connect(str(db))
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0] == 3
+        assert conn.execute("SELECT COUNT(*) FROM bodies").fetchone()[0] == 2
+        assert conn.execute("SELECT html FROM bodies WHERE hash = ?", (lines[0]["hash"],)).fetchone()[0] == HTML.encode()
+    finally:
+        conn.close()
+
+def test_body_is_released_after_write(tmp_path):
+    record = _record("https://a.com/", HTML)
+    body = record["body"]
+    _write([JsonlSink(str(tmp_path / "results.jsonl"))], [record])
+    assert body._spool.closed
+
+def test_sqlite_merge_dedups_bodies_across_shards(tmp_path):
+    shards = [str(tmp_path / f"shard{i}.db") for i in range(2)]
+    _write([SqliteSink(shards[0])], [_record("https://a.com/", HTML), _record("https://b.com/", HTML + " ")])
+    _write([SqliteSink(shards[1])], [_record("https://c.com/", HTML)])
+    dest = str(tmp_path / "results.db")
+    SqliteSink.merge(shards + [str(tmp_path / "missing.db")], dest)
+
+    conn = sqlite3.connect(dest)
+    try:
+        urls = sorted(url for (url,) in conn.execute("SELECT url FROM pages"))
+        assert urls == ["https://a.com/", "https://b.com/", "https://c.com/"]
+        assert conn.execute("SELECT COUNT(*) FROM bodies").fetchone()[0] == 2
+    finally:
+        conn.close()
+
+def test_jsonl_merge_appends_shards(tmp_path):
+    shards = [tmp_path / f"shard{i}.jsonl" for i in range(2)]
+    for i, shard in enumerate(shards):
+        _write([JsonlSink(str(shard))], [_record(f"https://{i}.com/", HTML)])
+    dest = tmp_path / "results.jsonl"
+    dest.write_text('{"url": "old"}\n', encoding="utf-8")
+    JsonlSink.merge([str(s) for s in shards], str(dest))
+    urls = [json.loads(line)["url"] for line in dest.read_text(encoding="utf-8").splitlines()]
+    assert urls == ["old", "https://0.com/", "https://1.com/"]
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import time
+import asyncio
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("playwright")
+from config import BATCH_URL_TIMEOUT, CF_MAX_WAIT
+from core.cf_handler import CFHandler
+from core.verify import VerifyQueue, SKIPPED, _URL_RESERVE
+from core.retry import VerificationAborted, classify, retry_policy, url_deadline
+
+class _TurnstilePage:
+    """始终停留在Turnstile验证页的页面替身"""
+    url = "https://example.com/"
+
+    def on(self, event, handler):
+        pass
+
+    def remove_listener(self, event, handler):
+        pass
+
+    async def wait_for_load_state(self, *args, **kwargs):
+        pass
+
+    async def evaluate(self, js, args):
+        return {"title": "", "markers": [0], "html": ""}
+
+def test_timeout_clamped_below_url_budget():
+    queue = VerifyQueue(port=0, timeout=BATCH_URL_TIMEOUT * 2)
+    assert queue.timeout == BATCH_URL_TIMEOUT - CF_MAX_WAIT
+
+@pytest.mark.parametrize("max_parked", [0, 1])
+def test_skipped_or_full_is_not_retried(max_parked):
+    async def run():
+        handler = CFHandler(VerifyQueue(port=0, timeout=5, max_parked=max_parked))
+        task = asyncio.create_task(handler.handle(_TurnstilePage()))
+        await asyncio.sleep(0.05)
+        handler.verify.resolve(1, SKIPPED)
+        try:
+            with pytest.raises(VerificationAborted) as info:
+                await task
+        finally:
+            await handler.close()
+        return info.value
+
+    error = asyncio.run(run())
+    assert retry_policy(classify(error))[0] == 1
+
+def test_park_is_limited_by_url_deadline():
+    async def run():
+        handler = CFHandler(VerifyQueue(port=0, timeout=60))
+        # 单URL剩余时间只够预留部分：挂起很快结束并记为中止，而不是等到整体超时被取消
+        url_deadline.set(time.monotonic() + _URL_RESERVE + 0.2)
+        start = time.monotonic()
+        try:
+            with pytest.raises(VerificationAborted):
+                await handler.handle(_TurnstilePage())
+        finally:
+            await handler.close()
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) < 5